@@ -0,0 +1,112 @@
+"""
+Benchmarks for droplet construction and saving.
+
+Run with pytest-benchmark, which is not needed for the unit tests:
+
+    pytest benchmarks/bench_*.py --benchmark-autosave
+    pytest benchmarks/bench_*.py --benchmark-compare
+
+Each benchmark times the build, then builds once more with a
+`BuildProfiler` and stores the per-stage timings and tracemalloc peaks in
+the `extra_info` of the saved results, so memory can be compared across
+runs alongside time.
+"""
+import pytest
+import mbuild
+
+pytest.importorskip('pytest_benchmark')
+
+from dropletbuilder.dropletbuilder import Droplet
+from dropletbuilder.substrate import SubstrateCache
+from dropletbuilder.utils.io_tools import get_fn
+from dropletbuilder.utils.profiling import BuildProfiler
+from dropletbuilder.utils.writers import save_droplet
+
+
+RADII = [1, 3, 5, 8]
+ANGLES = [30, 90, 150]
+SHEET_SIZES = [10, 25, 50, 100]
+
+
+@pytest.fixture(autouse=True)
+def initdir(tmpdir):
+    tmpdir.chdir()
+
+
+@pytest.fixture(scope='module')
+def water():
+    return mbuild.load(get_fn('tip3p.mol2'))
+
+
+def gold_lattice():
+    lattice_spacing = [0.40788, 0.40788, 0.40788]
+    lattice_vector = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+    gold_locations = [[0., 0., 0.], [.5, .5, 0.], [.5, 0., .5], [0, .5, .5]]
+    return mbuild.Lattice(
+        lattice_spacing=lattice_spacing,
+        lattice_vectors=lattice_vector,
+        lattice_points={'Au': gold_locations})
+
+
+def substrate_kwargs(substrate):
+    if substrate == 'gold':
+        return {'lattice': gold_lattice(),
+                'lattice_compound': mbuild.Compound(name='Au')}
+    return {}
+
+
+def record_profile(benchmark, **kwargs):
+    """
+    Builds one more droplet with profiling on and stores its stages
+    """
+    droplet = Droplet(profile=BuildProfiler(), **kwargs)
+    stats = droplet.build_stats
+    benchmark.extra_info['n_particles'] = droplet.n_particles
+    benchmark.extra_info['peak_bytes'] = stats['peak_bytes']
+    benchmark.extra_info['stages'] = stats['stages']
+    return droplet
+
+
+def run_build(benchmark, **kwargs):
+    # A fresh cache per build keeps substrate construction in the timings
+    def build():
+        return Droplet(substrate_cache=SubstrateCache(), **kwargs)
+    benchmark.pedantic(build, rounds=3, iterations=1)
+    record_profile(benchmark, substrate_cache=SubstrateCache(), **kwargs)
+
+
+@pytest.mark.parametrize('substrate', ['graphene', 'gold'])
+@pytest.mark.parametrize('angle', ANGLES)
+@pytest.mark.parametrize('radius', RADII)
+def test_build_droplet(benchmark, water, radius, angle, substrate):
+    benchmark.group = 'build-{}'.format(substrate)
+    run_build(benchmark, radius=radius, angle=angle, fluid=water,
+              density=997, **substrate_kwargs(substrate))
+
+
+@pytest.mark.parametrize('substrate', ['graphene', 'gold'])
+@pytest.mark.parametrize('size', SHEET_SIZES)
+def test_build_sheet_size(benchmark, water, size, substrate):
+    benchmark.group = 'sheet-{}'.format(substrate)
+    run_build(benchmark, radius=1, fluid=water, density=997, x=size, y=size,
+              **substrate_kwargs(substrate))
+
+
+@pytest.mark.parametrize('writer', ['mbuild', 'streaming'])
+@pytest.mark.parametrize('size', SHEET_SIZES)
+def test_save_gro(benchmark, water, size, writer):
+    benchmark.group = 'save-gro-{}'.format(writer)
+    droplet = Droplet(radius=1, fluid=water, density=997, x=size, y=size)
+    if writer == 'mbuild':
+        def save():
+            droplet.save('droplet.gro', overwrite=True)
+    else:
+        def save():
+            save_droplet(droplet, 'droplet.gro')
+    benchmark.pedantic(save, rounds=3, iterations=1)
+
+    profiler = BuildProfiler()
+    with profiler.stage('save'):
+        save()
+    benchmark.extra_info['n_particles'] = droplet.n_particles
+    benchmark.extra_info['peak_bytes'] = profiler.stages[0]['peak_bytes']
@@ -0,0 +1,27 @@
+"""
+Benchmarks for the time to import the package in a fresh interpreter.
+
+`import dropletbuilder` should not load mbuild, so it is compared against
+importing `Droplet`, which does.
+"""
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+
+IMPORTS = {
+    'package': 'import dropletbuilder',
+    'build_large_droplet': 'from dropletbuilder import build_large_droplet',
+    'Droplet': 'from dropletbuilder import Droplet',
+}
+
+
+@pytest.mark.parametrize('name', sorted(IMPORTS))
+def test_import_time(benchmark, name):
+    benchmark.group = 'import'
+    benchmark.pedantic(subprocess.check_call,
+                       args=([sys.executable, '-c', IMPORTS[name]],),
+                       rounds=5, iterations=1)
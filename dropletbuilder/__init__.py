@@ -2,6 +2,48 @@
 dropletbuilder
 Droplet on graphene builder
 """
+import importlib
+import sys
 
-# Add imports here
-from dropletbuilder.dropletbuilder import Droplet
+__version__ = '0.0.0'
+
+# Public names and the modules they live in. They are imported on first
+# access, so that `import dropletbuilder` does not load mbuild and its
+# dependencies until a droplet is actually built.
+_LAZY_IMPORTS = {
+    'Droplet': 'dropletbuilder.dropletbuilder',
+    'build_droplets': 'dropletbuilder.batch',
+    'DropletFactory': 'dropletbuilder.factory',
+    'FluidLibrary': 'dropletbuilder.fluid',
+    'FluidTemplate': 'dropletbuilder.fluid',
+    'build_large_droplet': 'dropletbuilder.large',
+    'BuildService': 'dropletbuilder.service',
+    'build_droplet_async': 'dropletbuilder.service',
+    'SubstrateCache': 'dropletbuilder.substrate',
+    'BuildProfiler': 'dropletbuilder.utils.profiling',
+    'open_binary': 'dropletbuilder.utils.binary',
+    'DropletSystem': 'dropletbuilder.system',
+    'DropletCache': 'dropletbuilder.system',
+    'build_droplet_system': 'dropletbuilder.system',
+}
+
+__all__ = sorted(_LAZY_IMPORTS)
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
+
+
+# Module __getattr__ needs Python 3.7, import everything up front before that
+if sys.version_info < (3, 7):
+    for _name in _LAZY_IMPORTS:
+        __getattr__(_name)
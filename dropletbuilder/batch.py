@@ -0,0 +1,197 @@
+import hashlib
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+# Droplet keyword arguments shared by every build run in this process,
+# set once per worker by `_init_worker`
+_SHARED = dict()
+
+
+def expand_grid(param_grid):
+    """
+    Expands a parameter grid into a list of parameter dicts.
+
+    Parameters
+    ----------
+    param_grid : dict of lists or list of dicts
+        a dict maps each `Droplet` keyword argument to the values to sweep
+        and is expanded to every combination; a list of dicts is used as is
+
+    Returns
+    -------
+    tasks : list of dict
+    """
+    if isinstance(param_grid, dict):
+        keys = sorted(param_grid)
+        return [dict(zip(keys, values)) for values in
+                itertools.product(*(param_grid[key] for key in keys))]
+    return [dict(params) for params in param_grid]
+
+
+def _encode_param(value):
+    # Compounds and lattices are hashed by content, so that seeds do not
+    # change between runs with their address
+    if hasattr(value, 'particles'):
+        from dropletbuilder.fluid import compound_checksum
+        return compound_checksum(value)
+    if hasattr(value, 'lattice_points'):
+        from dropletbuilder.substrate import lattice_payload
+        return lattice_payload(value.lattice_spacing, value.angles,
+                               value.lattice_vectors, value.lattice_points)
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError('Cannot derive a seed from a {}, set seed in the '
+                    'parameters instead'.format(type(value).__name__))
+
+
+def task_seed(params, seed=12345):
+    """
+    Random seed of the build with parameters `params`.
+
+    The seed is a hash of the base `seed` and the build's own parameters,
+    so a build packs the same droplet however the grid is ordered or
+    extended, and in every run. Compounds and lattices are hashed by
+    content, other values that are not JSON serializable raise a
+    TypeError. A 'seed' in `params` is used as is.
+
+    Returns
+    -------
+    seed : int
+        non-negative and below 2**31
+    """
+    if 'seed' in params:
+        return params['seed']
+    payload = json.dumps([seed, params], sort_keys=True, default=_encode_param)
+    digest = hashlib.sha1(payload.encode()).digest()
+    return int.from_bytes(digest[:4], 'little') % 2 ** 31
+
+
+def save_atomic(compound, filename, **kwargs):
+    """
+    Saves a compound under a temporary name and moves it into place, so that
+    an interrupted build never leaves a partial file that a resumed build
+    would skip.
+
+    Formats the streaming writers handle, see `save_droplet`, are written
+    with them unless a force field is given. Other formats, or any format
+    with a force field, are saved with `mbuild.Compound.save`, which is
+    passed `kwargs`.
+    """
+    from dropletbuilder.utils.writers import STREAMED_EXTENSIONS, save_droplet
+
+    head, tail = os.path.split(filename)
+    tmp_filename = os.path.join(head, '.{}.{}'.format(os.getpid(), tail))
+    forcefield = (kwargs.get('forcefield_files') is not None or
+                  kwargs.get('forcefield_name') is not None)
+    if (not forcefield and
+            os.path.splitext(filename)[1].lower() in STREAMED_EXTENSIONS):
+        save_droplet(compound, tmp_filename)
+    else:
+        compound.save(tmp_filename, overwrite=True, **kwargs)
+    os.replace(tmp_filename, filename)
+
+
+def _init_worker(shared):
+    _SHARED.clear()
+    _SHARED.update(shared)
+
+
+def _build_task(params, filename, seed):
+    # Imported here so that mbuild is only loaded by processes that build
+    from dropletbuilder.dropletbuilder import Droplet
+
+    start = time.time()
+    kwargs = dict(_SHARED)
+    kwargs.update(params)
+    kwargs['seed'] = seed
+    droplet = Droplet(**kwargs)
+    save_atomic(droplet, filename, combine='all')
+    return time.time() - start, droplet.n_particles
+
+
+def _record(row, result):
+    try:
+        row['seconds'], row['n_particles'] = result()
+        row['status'] = 'built'
+    except Exception as e:
+        row['status'] = 'failed'
+        row['error'] = repr(e)
+
+
+def build_droplets(param_grid, filename='droplet_{index}.gro', n_workers=None,
+                   seed=12345, resume=True, **shared):
+    """
+    Builds and saves a sweep of droplets across a process pool.
+
+    Parameters
+    ----------
+    param_grid : dict of lists or list of dicts
+        `Droplet` keyword arguments varied between builds, see `expand_grid`
+    filename : str, default = 'droplet_{index}.gro'
+        output file of each build, formatted with the build's parameters
+        and its `index` in the expanded grid, see `save_atomic`
+    n_workers : int, default = None
+        number of worker processes, defaults to the number of CPUs; builds
+        run in this process if 1
+    seed : int, default = 12345
+        base random seed, each build packs with a seed derived from it and
+        the build's parameters, see `task_seed`, unless `param_grid` sets
+        'seed' itself
+    resume : bool, default = True
+        skip builds whose output file already exists
+    **shared
+        `Droplet` keyword arguments common to every build, such as `fluid`
+        or `lattice`, sent to each worker once rather than with every build
+
+    Returns
+    -------
+    summary : list of dict
+        one row per build, in grid order, with the build's `index`,
+        parameters, `filename`, `status` ('built', 'skipped' or 'failed'),
+        wall time in `seconds`, `n_particles` and any `error`
+    """
+    tasks = expand_grid(param_grid)
+    summary = []
+    for index, params in enumerate(tasks):
+        row = dict(params)
+        row.update(index=index, filename=filename.format(index=index, **params),
+                   status='skipped', seconds=0.0, n_particles=None, error=None)
+        summary.append(row)
+    pending = [row for row in summary
+               if not (resume and os.path.exists(row['filename']))]
+
+    if n_workers == 1:
+        _init_worker(shared)
+        for row in pending:
+            _record(row, lambda: _build_task(
+                tasks[row['index']], row['filename'],
+                task_seed(tasks[row['index']], seed)))
+        return summary
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(shared,)) as executor:
+        futures = {
+            executor.submit(_build_task, tasks[row['index']], row['filename'],
+                            task_seed(tasks[row['index']], seed)): row
+            for row in pending}
+        for future in as_completed(futures):
+            _record(futures[future], future.result)
+    return summary
+
+
+def format_summary(summary):
+    """
+    Formats the summary returned by `build_droplets` as a text table
+    """
+    lines = ['{:>5}  {:<8}  {:>9}  {:>11}  {}'.format(
+        'index', 'status', 'seconds', 'n_particles', 'filename')]
+    for row in summary:
+        lines.append('{:>5}  {:<8}  {:>9.2f}  {:>11}  {}'.format(
+            row['index'], row['status'], row['seconds'],
+            '' if row['n_particles'] is None else row['n_particles'],
+            row['filename']))
+    return '\n'.join(lines)
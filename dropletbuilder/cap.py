@@ -0,0 +1,453 @@
+import itertools
+import os
+from collections import OrderedDict
+
+import mbuild
+import numpy as np
+from mbuild.packing import (PACKMOL, PACKMOL_HEADER, PACKMOL_CONSTRAIN,
+                            _check_packmol, _create_topology, _new_xyz_file,
+                            _run_packmol)
+
+PACKMOL_STRUCTURE = """
+structure {0}
+    number {1:d}
+{2}    {3}
+end structure
+"""
+PACKMOL_SPHERE = "    inside sphere {0:.3f} {1:.3f} {2:.3f} {3:.3f}\n"
+# Cylinder from (x, y, z) along the y axis, with a radius and a length
+PACKMOL_CYLINDER = (
+    "    inside cylinder {0:.3f} {1:.3f} {2:.3f} 0. 1. 0. {3:.3f} {4:.3f}\n")
+PACKMOL_OVER_PLANE = "    over plane 0. 0. 1. {0:.3f}\n"
+
+
+def molecule_counts(compound):
+    """
+    Helper function to get the number of particles in each child (molecule)
+    of a compound, in the order the particles appear in `compound.xyz`
+    """
+    return np.fromiter((child.n_particles for child in compound.children),
+                       dtype=int, count=len(compound.children))
+
+
+def molecule_min_z(xyz, counts):
+    """
+    Minimum z coordinate of every molecule in a batched particle array.
+
+    Parameters
+    ----------
+    xyz : np.ndarray, shape=(n, 3)
+        particle coordinates, grouped by molecule
+    counts : np.ndarray, shape=(m,)
+        number of particles in each molecule, sums to n
+
+    Returns
+    -------
+    min_z : np.ndarray, shape=(m,)
+    """
+    counts = np.asarray(counts, dtype=int)
+    if len(counts) == 0:
+        return np.zeros(0)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.minimum.reduceat(np.asarray(xyz)[:, 2], starts)
+
+
+def select_cap(xyz, counts, cut):
+    """
+    Mask of the molecules that lie entirely at or above z = `cut`.
+
+    Parameters
+    ----------
+    xyz : np.ndarray, shape=(n, 3)
+        particle coordinates, grouped by molecule
+    counts : np.ndarray, shape=(m,)
+        number of particles in each molecule
+    cut : float
+        z coordinate of the bottom of the cap in nm
+
+    Returns
+    -------
+    keep : np.ndarray of bool, shape=(m,)
+    """
+    return molecule_min_z(xyz, counts) >= cut
+
+
+def keep_molecules(compound, keep):
+    """
+    Drops the molecules of `compound` not selected by `keep` in one pass
+    over its children, labels and bond graph, rather than removing them one
+    by one, since `mbuild.Compound.remove` rescans the whole hierarchy for
+    every removed molecule. Kept molecules are neither cloned nor moved.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        filled fluid, one child per molecule, modified in place
+    keep : np.ndarray of bool, shape=(m,)
+        mask of the molecules to keep
+
+    Returns
+    -------
+    trimmed : mbuild.Compound
+        `compound` itself, holding only the kept molecules
+    n_kept : int
+        number of molecules kept
+    n_dropped : int
+        number of molecules dropped
+    """
+    from mbuild.bond_graph import BondGraph
+
+    children = list(compound.children)
+    if np.all(keep):
+        return compound, len(children), 0
+
+    kept = [child for child, k in zip(children, keep) if k]
+    dropped = set(child for child, k in zip(children, keep) if not k)
+    dropped_particles = set(particle for child in dropped
+                            for particle in child.particles())
+
+    bond_graph = compound.root.bond_graph
+    if bond_graph is not None:
+        kept_graph = BondGraph()
+        for particle in bond_graph.nodes_iter():
+            if particle in dropped_particles:
+                continue
+            for neighbor in bond_graph.neighbors_iter(particle):
+                kept_graph.add_edge(particle, neighbor)
+        compound.root.bond_graph = kept_graph
+
+    # Numbered labels such as 'Compound[3]' are renumbered from the lists
+    # they index, so that later additions do not clash with them
+    lists = {label: [part for part in parts if part not in dropped]
+             for label, parts in compound.labels.items()
+             if isinstance(parts, list)}
+    labels = OrderedDict()
+    for label, part in compound.labels.items():
+        base, _, index = label.rpartition('[')
+        if label in lists:
+            labels[label] = lists[label]
+            for i, part in enumerate(lists[label]):
+                labels['{}[{:d}]'.format(label, i)] = part
+        elif not (index[:-1].isdigit() and base in lists) and \
+                part not in dropped:
+            labels[label] = part
+    compound.labels = labels
+    compound.children = type(compound.children)(kept)
+    for child in dropped:
+        child.parent = None
+        child.referrers.discard(compound)
+
+    return compound, len(kept), len(dropped)
+
+
+def gather_xyz(compounds, n_particles=None):
+    """
+    Copies the particle positions of several compounds, in order, into one
+    preallocated array in a single pass over their particles, rather than
+    building `compound.xyz` for each and joining them.
+
+    Parameters
+    ----------
+    compounds : list of mbuild.Compound
+    n_particles : int, default = None
+        total number of particles, counted if not given
+
+    Returns
+    -------
+    xyz : np.ndarray, shape=(n_particles, 3)
+    """
+    if n_particles is None:
+        n_particles = sum(compound.n_particles for compound in compounds)
+    xyz = np.empty((n_particles, 3))
+    particles = itertools.chain.from_iterable(
+        compound.particles() for compound in compounds)
+    n = 0
+    for n, particle in enumerate(itertools.islice(particles, n_particles),
+                                 1):
+        xyz[n - 1] = particle.pos
+    if n != n_particles or next(particles, None) is not None:
+        raise ValueError('Compounds do not hold {} particles'.format(
+            n_particles))
+    return xyz
+
+
+def scatter_xyz(compounds, xyz):
+    """
+    Sets the particle positions of several compounds from one array in a
+    single pass, the inverse of `gather_xyz`.
+
+    Each particle keeps a view of its row of `xyz` rather than a copy, as
+    with `mbuild.Compound.xyz`, so the positions share one buffer.
+    """
+    particles = itertools.chain.from_iterable(
+        compound.particles() for compound in compounds)
+    for particle, row in zip(particles, xyz):
+        particle.pos = row
+
+
+def trim_cap(compound, cut):
+    """
+    Trims a filled compound in place down to the molecules lying above
+    z = `cut`, see `keep_molecules`.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        filled fluid, one child per molecule
+    cut : float
+        z coordinate of the bottom of the cap in nm
+
+    Returns
+    -------
+    trimmed : mbuild.Compound
+        `compound` itself, trimmed in place to the kept molecules
+    n_kept : int
+        number of molecules kept
+    n_dropped : int
+        number of molecules dropped
+    """
+    keep = select_cap(compound.xyz, molecule_counts(compound), cut)
+    return keep_molecules(compound, keep)
+
+
+def get_cap_volume(radius, cut, center_z):
+    """
+    Volume of the part of a sphere lying above z = `cut`
+
+    Parameters
+    ----------
+    radius : float
+        radius of the sphere in nm
+    cut : float
+        z coordinate of the bottom of the cap in nm
+    center_z : float
+        z coordinate of the centre of the sphere in nm
+    """
+    cap_height = np.clip(center_z + radius - cut, 0, 2 * radius)
+    return np.pi * cap_height ** 2 * (3 * radius - cap_height) / 3
+
+
+def get_compound_mass(compound):
+    """
+    Helper function to get the mass of a compound in amu
+    """
+    return np.sum([a.mass for a in compound.to_parmed().atoms])
+
+
+def get_segment_area(radius, cut, center_z):
+    """
+    Area of the part of a circle in the xz plane lying above z = `cut`
+
+    Parameters
+    ----------
+    radius : float
+        radius of the circle in nm
+    cut : float
+        z coordinate of the bottom of the segment in nm
+    center_z : float
+        z coordinate of the centre of the circle in nm
+    """
+    segment_height = np.clip(center_z + radius - cut, 0, 2 * radius)
+    return (radius ** 2 * np.arccos((radius - segment_height) / radius) -
+            (radius - segment_height) *
+            np.sqrt(2 * radius * segment_height - segment_height ** 2))
+
+
+def _count_compounds(compound, density, compound_ratio, volume):
+    """
+    Number of each compound that fills `volume` nm^3 at `density` kg/m^3
+    """
+    if len(compound) == 1:
+        compound_ratio = [1]
+    elif compound_ratio is None or len(compound_ratio) != len(compound):
+        raise ValueError(
+            'Determining `n_compounds` from `density` for more than ' +
+            'one compound requires a `compound_ratio` of equal length')
+    prototype_mass = sum(
+        r * get_compound_mass(c) for c, r in zip(compound, compound_ratio))
+    # Conversion from kg/m^3 / amu * nm^3 to dimensionless units
+    n_prototypes = int(density / prototype_mass * volume * .60224)
+    return [int(n_prototypes * r) for r in compound_ratio]
+
+
+def _pack(compound, n_compounds, region, overlap, seed, fix_orientation,
+          temp_file):
+    """
+    Packs `n_compounds` of each compound into a region with PACKMOL.
+
+    Parameters
+    ----------
+    compound : list of mbuild.Compound
+    n_compounds : list of int
+    region : str
+        PACKMOL constraints of the region, in angstroms
+    overlap, seed, fix_orientation, temp_file
+        see `fill_cap`
+
+    Returns
+    -------
+    filled : mbuild.Compound
+    """
+    if len(compound) != len(n_compounds):
+        raise ValueError(
+            '`compound` and `n_compounds` must be of equal length.')
+
+    filled_xyz = _new_xyz_file()
+    compound_xyz_list = list()
+    try:
+        input_text = PACKMOL_HEADER.format(overlap * 10, filled_xyz.name, seed)
+        for comp, m_compounds, rotate in zip(
+                compound, n_compounds, fix_orientation):
+            compound_xyz = _new_xyz_file()
+            compound_xyz_list.append(compound_xyz)
+
+            comp.save(compound_xyz.name, overwrite=True)
+            input_text += PACKMOL_STRUCTURE.format(
+                compound_xyz.name, int(m_compounds), region,
+                PACKMOL_CONSTRAIN if rotate else '')
+        _run_packmol(input_text, filled_xyz, temp_file)
+
+        filled = mbuild.Compound()
+        filled = _create_topology(filled, compound, n_compounds)
+        filled.update_coordinates(filled_xyz.name, update_port_locations=False)
+    finally:
+        for file_handle in compound_xyz_list:
+            file_handle.close()
+            os.unlink(file_handle.name)
+        filled_xyz.close()
+        os.unlink(filled_xyz.name)
+    return filled
+
+
+def _fill_args(compound, n_compounds, density, fix_orientation):
+    arg_count = 2 - [n_compounds, density].count(None)
+    if arg_count != 1:
+        raise ValueError(
+            'Exactly 1 of `n_compounds` and `density` must be specified. ' +
+            '{} were given.'.format(arg_count))
+    if not isinstance(compound, (list, set)):
+        compound = [compound]
+    if n_compounds is not None and not isinstance(n_compounds, (list, set)):
+        n_compounds = [n_compounds]
+    if not isinstance(fix_orientation, (list, set)):
+        fix_orientation = [fix_orientation] * len(compound)
+    return list(compound), n_compounds, fix_orientation
+
+
+def fill_cap(compound, sphere, cut, n_compounds=None, density=None,
+             overlap=0.2, seed=12345, edge=0.2, compound_ratio=None,
+             fix_orientation=False, temp_file=None):
+    """
+    Fill the part of a sphere above z = `cut` with a compound using packmol.
+
+    Mirrors `mbuild.fill_sphere`, but adds an `over plane` constraint so that
+    PACKMOL only places molecules in the spherical cap, and sizes
+    `n_compounds` from the cap volume rather than the whole sphere. Packing
+    cost then scales with the molecules kept in the droplet.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound or list of mbuild.Compound
+        compounds to fill the cap with
+    sphere : list, units nm
+        sphere coordinates in the form [x_center, y_center, z_center, radius]
+    cut : float
+        z coordinate of the bottom of the cap in nm
+    n_compounds : int or list of int
+        number of compounds to put in the cap
+    density : float, units kg/m^3
+        target density for the cap
+    overlap : float, units nm, default=0.2
+        minimum separation between atoms of different molecules
+    seed : int, default=12345
+        random seed to be passed to PACKMOL
+    edge : float, units nm, default=0.2
+        buffer at the curved edge of the sphere to not place molecules
+    compound_ratio : list, default=None
+        ratio of number of each compound to be put in the cap, only used
+        when `density` is given with more than one compound
+    fix_orientation : bool or list of bools
+        specify that compounds should not be rotated when filling the cap
+    temp_file : str, default=None
+        file name to write PACKMOL's raw output to
+
+    Returns
+    -------
+    filled : mbuild.Compound
+    """
+    _check_packmol(PACKMOL)
+
+    compound, n_compounds, fix_orientation = _fill_args(
+        compound, n_compounds, density, fix_orientation)
+    if len(sphere) != 4:
+        raise ValueError('`sphere` must be a list of len 4')
+
+    radius = sphere[3] - edge
+    if n_compounds is None:
+        n_compounds = _count_compounds(
+            compound, density, compound_ratio,
+            get_cap_volume(radius, cut, sphere[2]))
+
+    # In angstroms for packmol.
+    center = np.multiply(sphere[:3], 10)
+    region = (PACKMOL_SPHERE.format(center[0], center[1], center[2],
+                                    radius * 10) +
+              PACKMOL_OVER_PLANE.format(cut * 10))
+    return _pack(compound, n_compounds, region, overlap, seed,
+                 fix_orientation, temp_file)
+
+
+def fill_cylinder(compound, cylinder, length, cut=None, n_compounds=None,
+                  density=None, overlap=0.2, seed=12345, edge=0.2,
+                  compound_ratio=None, fix_orientation=False,
+                  temp_file=None):
+    """
+    Fill a cylinder along the y axis, or the part of it above z = `cut`,
+    with a compound using packmol.
+
+    The cylinder spans y from 0 to `length` less `edge`, so that it can be
+    made periodic in y without molecules overlapping across the boundary.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound or list of mbuild.Compound
+        compounds to fill the cylinder with
+    cylinder : list, units nm
+        cylinder coordinates in the form [x_center, z_center, radius]
+    length : float, units nm
+        periodic length of the cylinder along y
+    cut : float, default = None
+        z coordinate of the bottom of the filled segment in nm, the whole
+        cylinder is filled if None
+    n_compounds, density, overlap, seed, edge, compound_ratio,
+    fix_orientation, temp_file
+        see `fill_cap`
+
+    Returns
+    -------
+    filled : mbuild.Compound
+    """
+    _check_packmol(PACKMOL)
+
+    compound, n_compounds, fix_orientation = _fill_args(
+        compound, n_compounds, density, fix_orientation)
+    if len(cylinder) != 3:
+        raise ValueError('`cylinder` must be a list of len 3')
+
+    radius = cylinder[2] - edge
+    if n_compounds is None:
+        if cut is None:
+            area = np.pi * radius ** 2
+        else:
+            area = get_segment_area(radius, cut, cylinder[1])
+        n_compounds = _count_compounds(
+            compound, density, compound_ratio, area * (length - edge))
+
+    # In angstroms for packmol.
+    region = PACKMOL_CYLINDER.format(
+        cylinder[0] * 10, 0, cylinder[1] * 10, radius * 10,
+        (length - edge) * 10)
+    if cut is not None:
+        region += PACKMOL_OVER_PLANE.format(cut * 10)
+    return _pack(compound, n_compounds, region, overlap, seed,
+                 fix_orientation, temp_file)
@@ -0,0 +1,310 @@
+"""
+Command line entry point, builds the droplet systems listed in a spec file.
+
+A spec is a JSON or YAML mapping with a list of `systems` and optional
+`defaults` shared by every system::
+
+    {
+        "defaults": {"fluid": "tip3p.mol2", "density": 997, "radius": 2},
+        "systems": [
+            {"angle": 60, "output": "water_60.gro"},
+            {"angle": 120, "output": ["water_120.gro", "water_120.top"],
+             "forcefield_files": ["graphene.xml", "tip3p.xml"]}
+        ]
+    }
+
+Each system takes the `Droplet` keyword arguments plus
+
+- `fluid`: structure file of the fluid, or a list of them for a mixture
+- `fluid_name`: name given to the fluid compound, or a list of names
+- `lattice`: mapping with `lattice_spacing`, `lattice_points` and
+  optionally `lattice_vectors`, built on a compound named after the one
+  key of `lattice_points`; graphene if left out
+- `template_dir`: directory of the `FluidLibrary` used with
+  `fill_mode: template`
+- `output`: file, or list of files, the system is saved to; .gro, .xyz,
+  .lammps, .data and .drop files are written by the streaming writers,
+  see `save_droplet`
+- `forcefield_files`, `forcefield_name`: force field applied when saving,
+  as in `mbuild.Compound.save`, which then saves every output
+
+Relative paths are taken from the directory of the spec file. Fluid and
+force field files that are not found there are looked up in the files
+shipped with dropletbuilder, such as 'tip3p.mol2'.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dropletbuilder.batch import format_summary, save_atomic
+
+# Spec keys handled here rather than passed on to `Droplet`
+SPEC_KEYS = ('fluid', 'fluid_name', 'lattice', 'template_dir', 'output',
+             'forcefield_files', 'forcefield_name')
+
+# Extensions mbuild writes itself, the rest are saved through parmed
+MBUILD_FORMATS = ('.hoomdxml', '.gsd', '.xyz', '.lammps', '.lmp', '.par',
+                  '.mcf', '.json')
+
+# Fluids and fluid libraries loaded by this process, reused across systems
+_FLUIDS = dict()
+_LIBRARIES = dict()
+
+
+def load_spec(filename):
+    """
+    Reads a spec file and merges its defaults into each system.
+
+    Parameters
+    ----------
+    filename : str
+        JSON spec, or YAML if the name ends in '.yaml' or '.yml'
+
+    Returns
+    -------
+    systems : list of dict
+    """
+    with open(filename) as f:
+        if filename.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(
+                    'PyYAML is required to read YAML specs, install it or '
+                    'write the spec as JSON')
+            spec = yaml.safe_load(f)
+        else:
+            spec = json.load(f)
+
+    if isinstance(spec, list):
+        spec = {'systems': spec}
+    if not isinstance(spec, dict) or not spec.get('systems'):
+        raise ValueError('Spec {} lists no systems'.format(filename))
+
+    systems = []
+    for index, system in enumerate(spec['systems']):
+        merged = dict(spec.get('defaults', {}))
+        merged.update(system)
+        if not merged.get('output'):
+            raise ValueError('System {} of {} has no output'.format(
+                index, filename))
+        if not merged.get('fluid'):
+            raise ValueError('System {} of {} has no fluid'.format(
+                index, filename))
+        if isinstance(merged['output'], str):
+            merged['output'] = [merged['output']]
+        systems.append(merged)
+    return systems
+
+
+def _resolve(path, root, shipped=False):
+    path = os.path.join(root, os.path.expanduser(path))
+    if shipped and not os.path.exists(path):
+        from dropletbuilder.utils.io_tools import get_fn
+        return get_fn(os.path.basename(path))
+    return path
+
+
+def _load_fluid(path, name):
+    import mbuild
+
+    key = (path, name)
+    if key not in _FLUIDS:
+        fluid = mbuild.load(path)
+        if name is not None:
+            fluid.name = name
+        _FLUIDS[key] = fluid
+    return _FLUIDS[key]
+
+
+def system_kwargs(system, root='.'):
+    """
+    Converts a spec system into `Droplet` keyword arguments, loading its
+    fluid files and building its lattice.
+
+    Fluids and fluid libraries are cached in the process, so systems that
+    share them reuse the same compounds and templates.
+
+    Parameters
+    ----------
+    system : dict
+        one system of a spec, see `load_spec`
+    root : str, default = '.'
+        directory relative paths are taken from
+
+    Returns
+    -------
+    kwargs : dict
+    """
+    import mbuild
+
+    kwargs = {key: value for key, value in system.items()
+              if key not in SPEC_KEYS}
+
+    fluid, name = system['fluid'], system.get('fluid_name')
+    if isinstance(fluid, (list, tuple)):
+        names = name if isinstance(name, (list, tuple)) else [name] * len(
+            fluid)
+        kwargs['fluid'] = [_load_fluid(_resolve(path, root, shipped=True), n)
+                           for path, n in zip(fluid, names)]
+    else:
+        kwargs['fluid'] = _load_fluid(_resolve(fluid, root, shipped=True),
+                                      name)
+
+    lattice = system.get('lattice')
+    if lattice is not None:
+        if len(lattice['lattice_points']) != 1:
+            raise ValueError(
+                'lattice_points of a spec lattice must have exactly one key')
+        kwargs['lattice'] = mbuild.Lattice(
+            lattice_spacing=lattice['lattice_spacing'],
+            lattice_vectors=lattice.get('lattice_vectors'),
+            lattice_points=lattice['lattice_points'])
+        kwargs['lattice_compound'] = mbuild.Compound(
+            name=list(lattice['lattice_points'])[0])
+
+    template_dir = system.get('template_dir')
+    if template_dir is not None:
+        from dropletbuilder.fluid import FluidLibrary
+
+        template_dir = _resolve(template_dir, root)
+        if template_dir not in _LIBRARIES:
+            _LIBRARIES[template_dir] = FluidLibrary(template_dir=template_dir)
+        kwargs['fluid_library'] = _LIBRARIES[template_dir]
+    return kwargs
+
+
+def build_system(system, root='.'):
+    """
+    Builds one spec system and saves it to each of its outputs.
+
+    Returns
+    -------
+    seconds : float
+        wall time of the build and saves
+    n_particles : int
+    """
+    from dropletbuilder.dropletbuilder import Droplet
+
+    start = time.time()
+    droplet = Droplet(**system_kwargs(system, root))
+
+    save_kwargs = dict()
+    if system.get('forcefield_files') is not None:
+        files = system['forcefield_files']
+        if isinstance(files, str):
+            files = [files]
+        save_kwargs['forcefield_files'] = [
+            _resolve(path, root, shipped=True) for path in files]
+    if system.get('forcefield_name') is not None:
+        save_kwargs['forcefield_name'] = system['forcefield_name']
+    for filename in system['output']:
+        # Streamed unless a force field is applied, see `save_atomic`
+        if not filename.endswith(MBUILD_FORMATS):
+            # Saved through parmed, as one structure like in the examples
+            save_atomic(droplet, _resolve(filename, root), combine='all',
+                        **save_kwargs)
+        else:
+            save_atomic(droplet, _resolve(filename, root), **save_kwargs)
+    return time.time() - start, droplet.n_particles
+
+
+def _record(row, result):
+    try:
+        row['seconds'], row['n_particles'] = result()
+        row['status'] = 'built'
+    except Exception as e:
+        row['status'] = 'failed'
+        row['error'] = repr(e)
+
+
+def build_spec(filename, n_workers=1, resume=True, callback=None):
+    """
+    Builds every system of a spec file.
+
+    Parameters
+    ----------
+    filename : str
+        spec file, see `load_spec`
+    n_workers : int, default = 1
+        number of worker processes, systems are built one after the other
+        in this process if 1
+    resume : bool, default = True
+        skip systems whose outputs all exist
+    callback : callable, default = None
+        called with the summary row of each system as it finishes
+
+    Returns
+    -------
+    summary : list of dict
+        one row per system, in spec order, as returned by `build_droplets`
+        with `filename` the first output
+    """
+    systems = load_spec(filename)
+    root = os.path.dirname(os.path.abspath(filename))
+
+    summary = []
+    for index, system in enumerate(systems):
+        summary.append(dict(index=index, filename=system['output'][0],
+                            status='skipped', seconds=0.0, n_particles=None,
+                            error=None))
+    pending = [
+        row for row, system in zip(summary, systems)
+        if not (resume and all(os.path.exists(_resolve(path, root))
+                               for path in system['output']))]
+
+    if n_workers == 1:
+        for row in pending:
+            _record(row, lambda: build_system(systems[row['index']], root))
+            if callback is not None:
+                callback(row)
+        return summary
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(build_system, systems[row['index']], root):
+                   row for row in pending}
+        for future in as_completed(futures):
+            row = futures[future]
+            _record(row, future.result)
+            if callback is not None:
+                callback(row)
+    return summary
+
+
+def main(argv=None):
+    """
+    Runs the `dropletbuilder` console script, returns the exit status
+    """
+    parser = argparse.ArgumentParser(
+        prog='dropletbuilder',
+        description='Build droplet systems listed in a JSON or YAML spec.')
+    parser.add_argument('spec', help='spec file listing the systems to build')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of systems built in parallel')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='rebuild systems whose outputs already exist')
+    args = parser.parse_args(argv)
+
+    def report(row):
+        print('{} {} in {:.2f} s{}'.format(
+            row['filename'], row['status'], row['seconds'],
+            '' if row['error'] is None else ': ' + row['error']),
+            flush=True)
+
+    start = time.time()
+    try:
+        summary = build_spec(args.spec, n_workers=args.jobs,
+                             resume=not args.force, callback=report)
+    except (IOError, ImportError, ValueError) as e:
+        print('dropletbuilder: error: {}'.format(e), file=sys.stderr)
+        return 2
+    print(format_summary(summary))
+    print('Total {:.2f} s'.format(time.time() - start))
+    return int(any(row['status'] == 'failed' for row in summary))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,12 +1,27 @@
+import copy
+
 import mbuild
 import numpy as np
 
+from dropletbuilder.cap import (fill_cap, fill_cylinder, gather_xyz,
+                                get_cap_volume, get_segment_area,
+                                scatter_xyz, trim_cap)
+from dropletbuilder.fluid import FLUID_LIBRARY
+from dropletbuilder.geometry import (check_droplet_params, get_contact_radius,
+                                     get_cut_height, get_height)
+from dropletbuilder.mixture import mixture_counts, trim_mixture
+from dropletbuilder.overlap import resolve_overlap
+from dropletbuilder.substrate import (SUBSTRATE_CACHE, droplet_substrate,
+                                      frozen_sites)
+from dropletbuilder.system import DropletSystem, droplet_key
+from dropletbuilder.utils.profiling import BuildProfiler, NullProfiler
 
-def get_height(r, theta):
-    """
-    Helper function to get the height of a spherical cap
-    """
-    return r - r * np.cos(theta * np.pi / 180)
+
+# Attributes of a Droplet stored with it in a DropletCache
+BUILD_ATTRIBUTES = ('surface_height', 'n_molecules_kept',
+                    'n_molecules_dropped', 'composition',
+                    'min_substrate_distance', 'n_molecules_overlapping',
+                    'n_sites_frozen')
 
 
 class Droplet(mbuild.Compound):
@@ -22,136 +37,308 @@ class Droplet(mbuild.Compound):
     fluid : mbuild.Compound or list of mbuild.Compound
         compounds to fill the droplet with
     density: float or list of float
-        target density for the droplet in kg/m^3
+        target density for the droplet in kg/m^3, or for a list of fluids
+        the partial density of each, i.e. its mass per volume of mixture
     lattice: mbuild.Lattice
-        lattice to build droplet on
+        lattice to build droplet on, any triclinic lattice whose first two
+        lattice vectors lie in the xy plane
     lattice_compound: mbuild.Compound
         compound to build lattice with
     x : float
         dimension of graphene sheet in x direction in nm
     y : float
         dimension of graphene sheet in y direction in nm
-    NOTE: length of `fluid` must match length of `density`
+    fill_mode : str, default = 'sphere'
+        'sphere' fills the whole sphere and trims it down to the cap, 'cap'
+        packs only the cap volume so cost scales with the molecules kept,
+        'template' carves the cap from a tiled, pre-packed cube of fluid,
+        and likewise for the cylinder if `geometry` is 'cylinder'
+    substrate_cache : SubstrateCache or None, default = SUBSTRATE_CACHE
+        cache the lattice sheet is looked up in and stored to, shared by
+        all droplets by default, pass None to always build the sheet
+    fluid_library : FluidLibrary, default = FLUID_LIBRARY
+        library of packed fluid cubes used when `fill_mode` is 'template'
+    seed : int, default = 12345
+        random seed passed to PACKMOL when packing the fluid, so that the
+        same arguments always build the same droplet
+    overlap : str, default = None
+        check fluid-substrate distances after placing the fluid, 'report'
+        only measures them, 'remove' drops molecules closer than
+        `overlap_cutoff` and 'nudge' raises the fluid until it clears it
+    overlap_cutoff : float, default = 0.2
+        smallest allowed fluid-substrate distance in nm
+    profile : bool or BuildProfiler, default = False
+        record time, memory and particle counts of each build stage in
+        `build_stats`, pass a BuildProfiler to control memory tracing or
+        append the stages to a JSON lines file
+    output_cache : DropletCache, default = None
+        cache of built droplets, keyed by a hash of every argument above
+        and of the fluid and lattice compounds, see `droplet_key`; a cached
+        droplet is rebuilt from its arrays instead of being packed again
+    geometry : str, default = 'sphere'
+        'sphere' builds a spherical cap, 'cylinder' a cylindrical cap along
+        y that spans the periodic y length of the sheet, so that y can be
+        far smaller than radius * 4 and defaults to radius
+    n_layers : int, default = None
+        number of substrate layers, 3 for graphene by default, overrides
+        `depth` for a lattice
+    depth : float, default = 1.5
+        thickness of a lattice substrate in nm, at least one layer
+    freeze_distance : float, default = None
+        substrate sites farther than this from the droplet footprint, in
+        nm laterally, are frozen, see `footprint_distance`
+    freeze_depth : float, default = None
+        substrate sites deeper than this below the top of the substrate,
+        in nm, are frozen
+    frozen : str, default = 'group'
+        'group' puts the frozen sites in an 'FRZ' child, to be held fixed
+        or used as a wall in the simulation, 'remove' leaves them out, to
+        be replaced by an implicit wall
+    NOTE: length of `fluid` must match length of `density`. Mixtures are
+    packed in one PACKMOL run with the molecule count of each species set by
+    its partial density, and after trimming the species are rebalanced to
+    that composition by dropping surplus molecules from the droplet surface
 
     Attributes
     ----------
+    surface_height : float
+        z coordinate of the top of the lattice in nm
+    n_molecules_kept : int
+        number of fluid molecules kept in the spherical cap
+    n_molecules_dropped : int
+        number of fluid molecules trimmed from below the spherical cap, or
+        dropped to rebalance a mixture
+    composition : list of int
+        number of molecules of each fluid compound kept
+    min_substrate_distance : float or None
+        smallest fluid-substrate distance in nm if `overlap` is set
+    n_molecules_overlapping : int or None
+        number of molecules closer than `overlap_cutoff` to the substrate
+        before resolving, if `overlap` is set
+    n_sites_frozen : int
+        number of substrate sites frozen or removed
+    build_stats : dict or None
+        per-stage profile of the build if `profile` is set, see
+        `BuildProfiler.report`. Stages are 'cache' if `output_cache` is
+        set, only 'cache' on a cache hit, 'substrate', 'freeze' if
+        `freeze_distance` or `freeze_depth` is set, 'sheet', 'fill',
+        'trim', 'gather', 'overlap' if `overlap` is set, and 'place'
     see mbuild.Compound
 
     """
 
     def __init__(self, radius=2, angle=90.0, fluid=None, density=None,
-                lattice=None, lattice_compound=None, x=None, y=None):
+                lattice=None, lattice_compound=None, x=None, y=None,
+                fill_mode='sphere', substrate_cache=SUBSTRATE_CACHE,
+                fluid_library=FLUID_LIBRARY, seed=12345, overlap=None,
+                overlap_cutoff=0.2, profile=False, output_cache=None,
+                geometry='sphere', n_layers=None, depth=1.5,
+                freeze_distance=None, freeze_depth=None, frozen='group'):
 
         super(Droplet, self).__init__()
 
-        if fluid is None:
-            raise ValueError('Fluid droplet compounds must be specified')
-        if density is None:
-            raise ValueError('Fluid density must be specified (units kg/m^3)')
+        x, y = check_droplet_params(
+            radius=radius, fluid=fluid, density=density, lattice=lattice,
+            lattice_compound=lattice_compound, x=x, y=y, geometry=geometry)
+        if fill_mode not in ('sphere', 'cap', 'template'):
+            raise ValueError(
+                "fill_mode must be one of 'sphere', 'cap' or 'template'")
+        if fill_mode == 'template' and isinstance(fluid, (list, set)):
+            raise ValueError(
+                "fill_mode 'template' only supports a single fluid compound")
+        if overlap not in (None, 'report', 'remove', 'nudge'):
+            raise ValueError(
+                "overlap must be one of 'report', 'remove' or 'nudge'")
+        if frozen not in ('group', 'remove'):
+            raise ValueError("frozen must be one of 'group' or 'remove'")
+        if n_layers is not None and n_layers < 1:
+            raise ValueError('n_layers must be at least 1')
+        if depth <= 0:
+            raise ValueError('depth must be positive')
+        if ((freeze_distance is not None and freeze_distance < 0) or
+                (freeze_depth is not None and freeze_depth < 0)):
+            raise ValueError(
+                'freeze_distance and freeze_depth must not be negative')
 
-        if x:
-            if x < radius * 4:
-                raise ValueError(
-                    'Dimension x of sheet must be at least radius * 4')
-            elif x > 100:
-                raise ValueError(
-                    'Dimension x of sheet must be less than 100 nm')
+        if profile is True:
+            profiler = BuildProfiler()
+        elif profile:
+            profiler = profile
         else:
-            x = radius * 4
+            profiler = NullProfiler()
 
-        if y:
-            if y < radius * 4:
-                raise ValueError(
-                    'Dimension y of sheet must be at least radius * 4')
-            elif y > 100:
-                raise ValueError(
-                    'Dimension y of sheet must be less than 100 nm')
-        else:
-            y = radius * 4
+        if output_cache is not None:
+            key = droplet_key(
+                radius=radius, angle=angle, fluid=fluid, density=density,
+                lattice=lattice, lattice_compound=lattice_compound, x=x, y=y,
+                fill_mode=fill_mode, seed=seed, fluid_library=fluid_library,
+                overlap=overlap, overlap_cutoff=overlap_cutoff,
+                geometry=geometry, n_layers=n_layers, depth=depth,
+                freeze_distance=freeze_distance, freeze_depth=freeze_depth,
+                frozen=frozen)
+            with profiler.stage('cache', lambda: self.n_particles):
+                system = output_cache.get(key)
+                if system is not None:
+                    system.to_compound(compound=self)
+                    # Copied, so that editing the droplet leaves the cache
+                    for name, value in system.metadata.items():
+                        setattr(self, name, copy.deepcopy(value))
+            if system is not None:
+                self.build_stats = profiler.report()
+                return
 
         # Default to graphene lattice
         if lattice is None:
+            lattice_compound = mbuild.Compound(name='C')
+        with profiler.stage('substrate', lambda: substrate.n_sites):
+            substrate = droplet_substrate(
+                lattice, x, y, n_layers=n_layers, depth=depth,
+                cache=substrate_cache)
 
-            if lattice_compound is not None:
+        cut = get_cut_height(radius, angle)
+        self.n_sites_frozen = 0
+        frozen_substrate = None
+        if freeze_distance is not None or freeze_depth is not None:
+            with profiler.stage('freeze', lambda: self.n_sites_frozen):
+                mask = frozen_sites(
+                    substrate, substrate.periodicity[:2] / 2,
+                    get_contact_radius(radius, cut), distance=freeze_distance,
+                    depth=freeze_depth, geometry=geometry)
+                self.n_sites_frozen = int(np.count_nonzero(mask))
+                if frozen == 'group' and self.n_sites_frozen:
+                    frozen_substrate = substrate.select(mask)
+                substrate = substrate.select(~mask)
+            if substrate.n_sites == 0 and frozen_substrate is None:
                 raise ValueError(
-                    'If Lattice is None, defaults to a Graphene surface. ' +
-                    'In this case, do not specify lattice_compound.'
-                )
+                    'Every substrate site was frozen and removed, lower '
+                    'freeze_distance or freeze_depth or use frozen=\'group\'')
 
-            lattice_compound = mbuild.Compound(name='C')
-            lattice_spacing = [0.2456, 0.2456, 0.335]
-            angles = [90.0, 90.0, 120.0]
-            carbon_locations = [[0, 0, 0], [2 / 3, 1 / 3, 0]]
-            basis = {lattice_compound.name: carbon_locations}
-            lattice = mbuild.Lattice(
-                lattice_spacing=lattice_spacing,
-                angles=angles,
-                lattice_points=basis)
-            compound_dict = {lattice_compound.name: lattice_compound}
-
-            factor = np.cos(np.pi / 6) # fixes non-cubic lattice
-            # Estimate the number of lattice repeat units
-            replicate = [int(x / 0.2456), int(y / 0.2456) * (1 / factor)]
-
-            lat = lattice.populate(
-                compound_dict=compound_dict,
-                x=replicate[0],
-                y=replicate[1],
-                z=3
-            )
-
-            for particle in lat.particles():
-                if particle.xyz[0][0] < 0:
-                    particle.xyz[0][0] += lat.periodicity[0]
-            lat.periodicity[1] *= factor
+        compound_dict = {lattice_compound.name: lattice_compound}
+        with profiler.stage('sheet', lambda: n_substrate):
+            sheet = substrate.to_compound(compound_dict)
+            sheets = [sheet]
+            n_substrate = substrate.n_sites
+            if frozen_substrate is not None:
+                frozen_sheet = frozen_substrate.to_compound(
+                    compound_dict, name='FRZ')
+                sheets.append(frozen_sheet)
+                n_substrate += frozen_substrate.n_sites
+            n_substrate *= lattice_compound.n_particles
+        coords = list(sheet.periodicity)
 
+        sphere_coords = [coords[0] / 2, coords[1] / 2, radius, radius]
+        cylinder = geometry == 'cylinder'
+        mixture = isinstance(fluid, (list, set))
+        if mixture:
+            # Counts in the volume PACKMOL fills, inside the 0.2 nm edge
+            fluid = list(fluid)
+            if cylinder and fill_mode == 'cap':
+                volume = get_segment_area(radius - 0.2, cut, radius) * (
+                    coords[1] - 0.2)
+            elif cylinder:
+                volume = np.pi * (radius - 0.2) ** 2 * (coords[1] - 0.2)
+            elif fill_mode == 'cap':
+                volume = get_cap_volume(radius - 0.2, cut, radius)
+            else:
+                volume = 4 / 3 * np.pi * (radius - 0.2) ** 3
+            counts = mixture_counts(fluid, density, volume)
+            fill_kwargs = {'n_compounds': counts.tolist()}
         else:
-            if lattice_compound is None:
-                raise ValueError('Lattice compounds must be specified')
+            fill_kwargs = {'density': density}
+
+        with profiler.stage('fill', lambda: sphere.n_particles):
+            if cylinder and fill_mode == 'template':
+                sphere = fluid_library.get(fluid, density).fill(
+                    fluid, sphere_coords, cut=cut, cylinder_length=coords[1])
+            elif cylinder:
+                sphere = fill_cylinder(
+                    compound=fluid, cylinder=[coords[0] / 2, radius, radius],
+                    length=coords[1], cut=cut if fill_mode == 'cap' else None,
+                    seed=seed, **fill_kwargs)
+            elif fill_mode == 'cap':
+                sphere = fill_cap(compound=fluid, sphere=sphere_coords,
+                                  cut=cut, seed=seed, **fill_kwargs)
+            elif fill_mode == 'template':
+                sphere = fluid_library.get(fluid, density).fill(
+                    fluid, sphere_coords, cut=cut)
+            else:
+                sphere = mbuild.fill_sphere(
+                    compound=fluid, sphere=sphere_coords, seed=seed,
+                    **fill_kwargs)
 
-            if not np.all(lattice.angles == 90.0):
+        with profiler.stage('trim', lambda: sphere.n_particles):
+            if mixture:
+                (sphere, self.n_molecules_kept, self.n_molecules_dropped,
+                 composition) = trim_mixture(
+                     sphere, cut, counts, sphere_coords[:3],
+                     axis=[0, 1, 0] if cylinder else None)
+                self.composition = composition.tolist()
+            else:
+                sphere, self.n_molecules_kept, self.n_molecules_dropped = \
+                    trim_cap(sphere, cut)
+                self.composition = [self.n_molecules_kept]
+            if self.n_molecules_kept == 0:
                 raise ValueError(
-                    'Currently, only cubic lattices are supported. ' +
-                    'If using Graphene, do not pass in a Lattice.'
-                )
-
-            compound_dict = {lattice_compound.name: lattice_compound}
-            lat = lattice.populate(
-                compound_dict=compound_dict,
-                x=int(x/lattice.lattice_spacing[0]),
-                y=int(y/lattice.lattice_spacing[1]),
-                z=int(1.5/lattice.lattice_spacing[2]))
-
-        sheet = mbuild.clone(lat)
-        self.surface_height = np.max(sheet.xyz, axis=0)[2]
-        coords = list(sheet.periodicity)
+                    'No fluid molecules are left in a cap at {:g} degrees, '
+                    'increase radius or angle'.format(angle))
 
-        height = get_height(radius, angle)
-        sphere_coords = [coords[0] / 2, coords[1] / 2, radius, radius]
-        sphere = mbuild.fill_sphere(
-            compound=fluid, sphere=sphere_coords, density=density)
-
-        to_remove = []
-        for child in sphere.children:
-            for atom_coords in child.xyz:
-                if height > radius:
-                    if atom_coords[2] < height - radius:
-                        to_remove += child
-                        break
-                else:
-                    if atom_coords[2] < height:
-                        to_remove += child
-                        break
-
-        sphere.remove(to_remove)
-
-        sheet.name = 'LAT'
-        sphere.name = 'FLD'
-        sphere.xyz -= [0, 0, np.min(sphere.xyz, axis=0)[2]]
-        sphere.xyz += [0, 0, self.surface_height + 0.3]
-
-        self.add(sheet)
-        self.add(sphere)
-        self.periodicity[0] = sheet.periodicity[0]
-        self.periodicity[1] = sheet.periodicity[1]
-        self.periodicity[2] = radius * 5
+        # Substrate and fluid positions are read once into preallocated
+        # arrays, which the bounds, the overlap check and the final shift all
+        # work on. They are kept apart because the fluid particles keep views
+        # of their rows, and the substrate array is freed after the build.
+        with profiler.stage('gather',
+                            lambda: len(substrate_xyz) + len(fluid_xyz)):
+            substrate_xyz = gather_xyz(sheets, n_particles=n_substrate)
+            fluid_xyz = gather_xyz([sphere])
+            self.surface_height = np.max(substrate_xyz[:, 2])
+            offset = self.surface_height + 0.3 - np.min(fluid_xyz[:, 2])
+
+        self.min_substrate_distance = None
+        self.n_molecules_overlapping = None
+        if overlap is not None:
+            with profiler.stage('overlap', lambda: sphere.n_particles):
+                (sphere, offset, self.min_substrate_distance,
+                 overlapping) = resolve_overlap(
+                     sphere, substrate_xyz, sheet.periodicity, offset=offset,
+                     cutoff=overlap_cutoff, mode=overlap, fluid_xyz=fluid_xyz)
+                self.n_molecules_overlapping = int(np.sum(overlapping))
+                if overlap == 'remove':
+                    if self.n_molecules_overlapping:
+                        fluid_xyz = gather_xyz([sphere])
+                    # Kept molecules stay grouped by species in fill order
+                    species = np.repeat(np.arange(len(self.composition)),
+                                        self.composition)
+                    self.composition = np.bincount(
+                        species[~overlapping],
+                        minlength=len(self.composition)).tolist()
+                    self.n_molecules_kept -= self.n_molecules_overlapping
+                    self.n_molecules_dropped += self.n_molecules_overlapping
+
+        with profiler.stage('place', lambda: self.n_particles):
+            sheet.name = 'LAT'
+            sphere.name = 'FLD'
+            fluid_xyz[:, 2] += offset
+            scatter_xyz([sphere], fluid_xyz)
+
+            self.add(sheet)
+            if frozen_substrate is not None:
+                self.add(frozen_sheet)
+            self.add(sphere)
+            self.periodicity[0] = sheet.periodicity[0]
+            self.periodicity[1] = sheet.periodicity[1]
+            self.periodicity[2] = radius * 5
+
+        if output_cache is not None:
+            output_cache.put(key, self.to_system())
+
+        self.build_stats = profiler.report()
+
+    def to_system(self):
+        """
+        Flattens the droplet into a compact `DropletSystem`, with the build
+        attributes of the droplet in its `metadata`
+        """
+        system = DropletSystem.from_compound(self)
+        system.metadata = {name: getattr(self, name)
+                           for name in BUILD_ATTRIBUTES}
+        return system
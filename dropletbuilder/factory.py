@@ -0,0 +1,140 @@
+import numpy as np
+
+from dropletbuilder.fluid import FLUID_LIBRARY, molecules_to_compound
+from dropletbuilder.geometry import check_droplet_params, get_cut_height
+from dropletbuilder.substrate import SUBSTRATE_CACHE, droplet_substrate
+
+
+class DropletFactory(object):
+    """
+    Builds droplets of one radius at any number of contact angles from a
+    single packing.
+
+    The substrate and the fluid sphere do not depend on the contact angle,
+    only the height of the cut through the sphere does. The factory packs
+    the sphere once and keeps the lowest z coordinate of every molecule
+    sorted, so each `at_angle` call finds the molecules above its cut with
+    a binary search instead of packing again.
+
+    Parameters
+    ----------
+    radius : int, default = 2
+        radius of the droplets in nm
+    fluid : mbuild.Compound
+        compound to fill the droplets with
+    density : float
+        target density for the droplets in kg/m^3
+    lattice, lattice_compound, x, y, substrate_cache, seed
+        see `Droplet`
+    fill_mode : str, default = 'sphere'
+        'sphere' packs the sphere with PACKMOL, 'template' carves it from a
+        tiled, pre-packed cube of fluid
+    fluid_library : FluidLibrary, default = FLUID_LIBRARY
+        library of packed fluid cubes used when `fill_mode` is 'template'
+    NOTE: mixtures and `fill_mode` 'cap' depend on the contact angle, use
+    `Droplet` for them
+
+    Attributes
+    ----------
+    n_molecules : int
+        number of fluid molecules in the packed sphere
+    surface_height : float
+        z coordinate of the top of the lattice in nm
+    """
+
+    def __init__(self, radius=2, fluid=None, density=None, lattice=None,
+                 lattice_compound=None, x=None, y=None, fill_mode='sphere',
+                 substrate_cache=SUBSTRATE_CACHE, fluid_library=FLUID_LIBRARY,
+                 seed=12345):
+        import mbuild
+
+        x, y = check_droplet_params(
+            radius=radius, fluid=fluid, density=density, lattice=lattice,
+            lattice_compound=lattice_compound, x=x, y=y)
+        if fill_mode not in ('sphere', 'template'):
+            raise ValueError("fill_mode must be one of 'sphere' or 'template'")
+        if isinstance(fluid, (list, set)):
+            raise ValueError(
+                'DropletFactory only supports a single fluid compound')
+
+        if lattice is None:
+            lattice_compound = mbuild.Compound(name='C')
+        self._substrate = droplet_substrate(lattice, x, y,
+                                            cache=substrate_cache)
+        self._lattice_compound = lattice_compound
+        self.surface_height = self._substrate.surface_height
+
+        self.radius = radius
+        self.fluid = fluid
+        periodicity = self._substrate.periodicity
+        sphere_coords = [periodicity[0] / 2, periodicity[1] / 2, radius,
+                         radius]
+        if fill_mode == 'template':
+            molecules = fluid_library.get(fluid, density).carve(sphere_coords)
+        else:
+            sphere = mbuild.fill_sphere(compound=fluid, sphere=sphere_coords,
+                                        density=density, seed=seed)
+            molecules = sphere.xyz.reshape(-1, fluid.n_particles, 3)
+        self._molecules = molecules
+
+        # Molecules by their lowest z coordinate, so that the molecules
+        # above any cut are a suffix of `_order`
+        min_z = np.min(molecules[:, :, 2], axis=1) if len(molecules) else \
+            np.zeros(0)
+        self._order = np.argsort(min_z, kind='stable')
+        self._sorted_min_z = min_z[self._order]
+
+    @property
+    def n_molecules(self):
+        return len(self._molecules)
+
+    def select(self, angle):
+        """
+        Indices of the molecules of the packed sphere kept at a contact
+        angle, in packing order
+
+        Returns
+        -------
+        kept : np.ndarray of int
+        """
+        cut = get_cut_height(self.radius, angle)
+        start = np.searchsorted(self._sorted_min_z, cut, side='left')
+        return np.sort(self._order[start:])
+
+    def at_angle(self, angle):
+        """
+        Builds the droplet at contact angle `angle` in degrees.
+
+        Returns
+        -------
+        droplet : mbuild.Compound
+            compound laid out like a `Droplet`, with 'LAT' and 'FLD'
+            children and the `surface_height`, `n_molecules_kept`,
+            `n_molecules_dropped` and `composition` attributes of one
+        """
+        import mbuild
+
+        kept = self.select(angle)
+        sheet = self._substrate.to_compound(
+            {self._lattice_compound.name: self._lattice_compound})
+        sheet.name = 'LAT'
+
+        molecules = self._molecules[kept]
+        if len(kept):
+            offset = self.surface_height + 0.3 - \
+                self._sorted_min_z[self.n_molecules - len(kept)]
+            molecules = molecules + [0, 0, offset]
+        sphere = molecules_to_compound(self.fluid, molecules, name='FLD')
+
+        droplet = mbuild.Compound(name='Droplet')
+        droplet.add(sheet)
+        droplet.add(sphere)
+        droplet.periodicity[0] = sheet.periodicity[0]
+        droplet.periodicity[1] = sheet.periodicity[1]
+        droplet.periodicity[2] = self.radius * 5
+
+        droplet.surface_height = self.surface_height
+        droplet.n_molecules_kept = len(kept)
+        droplet.n_molecules_dropped = self.n_molecules - len(kept)
+        droplet.composition = [len(kept)]
+        return droplet
@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import warnings
+
+import numpy as np
+
+
+def compound_checksum(compound):
+    """
+    Hash of the particle names, internal geometry and bonds of a compound,
+    used to detect fluid templates packed from a different compound
+    """
+    particles = list(compound.particles())
+    index = {particle: i for i, particle in enumerate(particles)}
+    xyz = compound.xyz
+    bonds = sorted(sorted((index[a], index[b])) for a, b in compound.bonds())
+    payload = json.dumps({
+        'name': compound.name,
+        'particles': [particle.name for particle in particles],
+        'xyz': np.round(xyz - xyz[0], 4).tolist(),
+        'bonds': bonds,
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def molecules_to_compound(compound, molecules, name=None):
+    """
+    Builds a compound holding one clone of `compound` per molecule.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        compound to clone for each molecule
+    molecules : np.ndarray, shape=(m, n_particles, 3)
+        particle coordinates of each molecule in nm
+    name : str, default = None
+        name of the returned compound
+
+    Returns
+    -------
+    filled : mbuild.Compound
+    """
+    import mbuild
+
+    filled = mbuild.Compound(name=name)
+    clones = []
+    for xyz in molecules:
+        molecule = mbuild.clone(compound)
+        molecule.xyz = xyz
+        clones.append(molecule)
+    filled.add(clones)
+    return filled
+
+
+class FluidTemplate(object):
+    """
+    A packed cube of fluid that is tiled to cut droplets of any size.
+
+    Parameters
+    ----------
+    xyz : np.ndarray, shape=(n, 3)
+        particle coordinates of the packed cube in nm, grouped by molecule
+    n_particles : int
+        number of particles in each molecule
+    box_length : float
+        edge length of the periodic cube in nm
+    density : float
+        density the cube was packed at in kg/m^3
+    checksum : str
+        `compound_checksum` of the compound the cube was packed from
+    """
+
+    def __init__(self, xyz, n_particles, box_length, density, checksum):
+        self.xyz = np.asarray(xyz, dtype=np.float64)
+        self.n_particles = int(n_particles)
+        self.box_length = float(box_length)
+        self.density = float(density)
+        self.checksum = str(checksum)
+
+    @property
+    def molecules(self):
+        return self.xyz.reshape(-1, self.n_particles, 3)
+
+    @classmethod
+    def pack(cls, compound, density, box_length=3.0, overlap=0.2, seed=12345):
+        """
+        Packs a cube of `compound` at `density` with PACKMOL.
+
+        Molecules are packed `overlap` away from the upper faces of the
+        cube so that tiled copies do not overlap.
+        """
+        import mbuild
+
+        filled = mbuild.fill_box(
+            compound, box=[box_length] * 3, density=density,
+            overlap=overlap, seed=seed, edge=overlap)
+        return cls(filled.xyz, compound.n_particles, box_length, density,
+                   compound_checksum(compound))
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a template saved with `FluidTemplate.save`
+        """
+        with np.load(filename) as data:
+            return cls(data['xyz'], data['n_particles'], data['box_length'],
+                       data['density'], data['checksum'])
+
+    def save(self, filename):
+        """
+        Saves the template as an npz file
+        """
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp_filename, 'wb') as f:
+            np.savez(f, xyz=self.xyz, n_particles=self.n_particles,
+                     box_length=self.box_length, density=self.density,
+                     checksum=self.checksum)
+        os.replace(tmp_filename, filename)
+
+    def iter_carve(self, sphere, cut=None, edge=0.2, cylinder_length=None):
+        """
+        Tiles the template over a sphere and yields the molecules inside it,
+        one layer of tiles along z at a time.
+
+        Parameters
+        ----------
+        sphere : list, units nm
+            sphere coordinates in the form [x_center, y_center, z_center,
+            radius]
+        cut : float, default = None
+            z coordinate below which molecules are dropped
+        edge : float, units nm, default=0.2
+            buffer at the edge of the sphere to not place molecules
+        cylinder_length : float, default = None
+            if given, carves a cylinder of the sphere's radius along the y
+            axis through its centre instead, spanning y from 0 to
+            `cylinder_length` less `edge` so that it can be periodic in y
+
+        Yields
+        ------
+        molecules : np.ndarray, shape=(m, n_particles, 3)
+        """
+        center = np.asarray(sphere[:3], dtype=np.float64)
+        radius = sphere[3] - edge
+        lo = center - radius
+        hi = center + radius
+        # Axes the distance from the centre is measured along
+        axes = [0, 1, 2]
+        if cylinder_length is not None:
+            lo[1], hi[1] = 0, cylinder_length - edge
+            axes = [0, 2]
+        if cut is not None:
+            lo[2] = max(lo[2], cut)
+        if np.any(lo > hi):
+            return
+
+        tiles = [np.arange(np.floor(l / self.box_length) - 1,
+                           np.floor(h / self.box_length) + 1)
+                 for l, h in zip(lo, hi)]
+        xy_offsets = np.stack(np.meshgrid(
+            tiles[0], tiles[1], [0], indexing='ij'), axis=-1).reshape(-1, 3)
+
+        template = self.molecules
+        for z_tile in tiles[2]:
+            offsets = (xy_offsets + [0, 0, z_tile]) * self.box_length
+            layer = (template[np.newaxis] + offsets[:, np.newaxis, np.newaxis])
+            layer = layer.reshape(-1, self.n_particles, 3)
+            dist2 = np.sum((layer - center)[:, :, axes] ** 2, axis=-1)
+            inside = np.all(dist2 <= radius ** 2, axis=-1)
+            if cylinder_length is not None:
+                inside &= np.all((layer[:, :, 1] >= lo[1]) &
+                                 (layer[:, :, 1] <= hi[1]), axis=-1)
+            if cut is not None:
+                inside &= np.min(layer[:, :, 2], axis=-1) >= cut
+            yield layer[inside]
+
+    def carve(self, sphere, cut=None, edge=0.2, cylinder_length=None):
+        """
+        Tiles the template over a sphere and keeps the molecules inside it,
+        see `iter_carve`
+
+        Returns
+        -------
+        molecules : np.ndarray, shape=(m, n_particles, 3)
+        """
+        carved = list(self.iter_carve(sphere, cut=cut, edge=edge,
+                                      cylinder_length=cylinder_length))
+        if not carved:
+            return np.zeros((0, self.n_particles, 3))
+        return np.concatenate(carved)
+
+    def fill(self, compound, sphere, cut=None, edge=0.2,
+             cylinder_length=None):
+        """
+        Carves a sphere, or a cylinder, from the template and builds it
+        from `compound`, see `iter_carve`
+
+        Returns
+        -------
+        filled : mbuild.Compound
+        """
+        if compound_checksum(compound) != self.checksum:
+            raise ValueError(
+                'Fluid template was packed from a different compound')
+        return molecules_to_compound(
+            compound, self.carve(sphere, cut=cut, edge=edge,
+                                 cylinder_length=cylinder_length))
+
+
+class FluidLibrary(object):
+    """
+    Library of packed fluid templates, one per (compound, density) pair.
+
+    Templates are kept in memory and, if `template_dir` is given, stored as
+    npz files so that later processes reuse them instead of packing again.
+    Stored templates are named after the compound, its checksum and the
+    full precision density. One whose contents were packed from a compound
+    with a different checksum, or at a different density, is treated as
+    stale and packed again.
+
+    Parameters
+    ----------
+    template_dir : str, default = None
+        directory templates are stored in, disabled if None
+    box_length : float, default = 3.0
+        edge length of newly packed templates in nm
+    seed : int, default = 12345
+        random seed passed to PACKMOL when packing templates
+    """
+
+    def __init__(self, template_dir=None, box_length=3.0, seed=12345):
+        self.template_dir = template_dir
+        self.box_length = box_length
+        self.seed = seed
+        self._templates = dict()
+
+    def _path(self, compound, density, checksum=None):
+        # The checksum keeps same-named or edited compounds from sharing
+        # one file
+        if checksum is None:
+            checksum = compound_checksum(compound)
+        return os.path.join(self.template_dir, 'fluid-{}-{}-{!r}.npz'.format(
+            compound.name, checksum[:12], float(density)))
+
+    def get(self, compound, density):
+        """
+        Returns the template for `compound` at `density`, loading it from
+        disk or packing it if needed
+
+        Returns
+        -------
+        template : FluidTemplate
+        """
+        checksum = compound_checksum(compound)
+        key = (checksum, float(density))
+        if key in self._templates:
+            return self._templates[key]
+
+        template = None
+        if self.template_dir is not None:
+            path = self._path(compound, density, checksum)
+            if os.path.exists(path):
+                template = FluidTemplate.load(path)
+                if (template.checksum != checksum or
+                        template.density != float(density)):
+                    warnings.warn(
+                        'Fluid template {} is stale and will be packed '
+                        'again'.format(path))
+                    template = None
+        if template is None:
+            template = FluidTemplate.pack(
+                compound, density, box_length=self.box_length, seed=self.seed)
+            if self.template_dir is not None:
+                os.makedirs(self.template_dir, exist_ok=True)
+                template.save(self._path(compound, density, checksum))
+
+        self._templates[key] = template
+        return template
+
+
+FLUID_LIBRARY = FluidLibrary()
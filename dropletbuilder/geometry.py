@@ -0,0 +1,135 @@
+import numpy as np
+
+
+def get_height(r, theta):
+    """
+    Helper function to get the height of a spherical cap
+    """
+    return r - r * np.cos(theta * np.pi / 180)
+
+
+def get_cut_height(r, theta):
+    """
+    Helper function to get the z coordinate below which molecules are trimmed
+    from a sphere of radius r filled about z = r, so that the cap left above
+    it meets the plane at a contact angle of `theta` degrees.
+
+    The cap is `get_height(r, theta)` tall, so the cut falls steadily from
+    2r at 0 degrees, through r at 90 degrees, to 0 at 180 degrees where the
+    whole sphere is kept.
+    """
+    return 2 * r - get_height(r, theta)
+
+
+def get_contact_radius(r, cut):
+    """
+    Helper function to get the radius of the footprint a sphere of radius r
+    filled about z = r leaves on the plane z = `cut`, or the half width of
+    the footprint of a cylinder
+    """
+    return np.sqrt(max(r ** 2 - (cut - r) ** 2, 0))
+
+
+def footprint_distance(xyz, center, contact_radius, periodicity,
+                       geometry='sphere'):
+    """
+    Lateral distance of points from the footprint of a droplet, zero under
+    the droplet and growing outwards from its contact line.
+
+    Parameters
+    ----------
+    xyz : np.ndarray, shape=(n, 3)
+        point coordinates in nm
+    center : array-like
+        x and y coordinates of the droplet axis in nm
+    contact_radius : float
+        radius of the footprint in nm, see `get_contact_radius`
+    periodicity : array-like
+        box lengths in nm, distances take the nearest periodic image in x
+        and y
+    geometry : str, default = 'sphere'
+        'sphere' for a round footprint, 'cylinder' for a strip along y
+
+    Returns
+    -------
+    distance : np.ndarray, shape=(n,)
+    """
+    box = np.asarray(periodicity[:2], dtype=np.float64)
+    offsets = np.asarray(xyz)[:, :2] - np.asarray(center[:2])
+    offsets -= np.round(offsets / box) * box
+    if geometry == 'cylinder':
+        lateral = np.abs(offsets[:, 0])
+    else:
+        lateral = np.hypot(offsets[:, 0], offsets[:, 1])
+    return np.maximum(lateral - contact_radius, 0)
+
+
+def check_droplet_params(radius=2, fluid=None, density=None, lattice=None,
+                         lattice_compound=None, x=None, y=None, max_size=100,
+                         geometry='sphere'):
+    """
+    Checks the droplet and sheet parameters shared by `Droplet` and
+    `build_large_droplet`, without building anything.
+
+    Parameters
+    ----------
+    see `Droplet`
+    max_size : float, default = 100
+        largest sheet dimension allowed in nm, unlimited if None
+    geometry : str, default = 'sphere'
+        'sphere' or 'cylinder', a cylinder is periodic along y so only x
+        has to clear its periodic images
+
+    Returns
+    -------
+    x, y : float
+        dimensions of the sheet in nm, defaulting to radius * 4, or for a
+        cylinder y defaulting to radius
+    """
+    if geometry not in ('sphere', 'cylinder'):
+        raise ValueError("geometry must be one of 'sphere' or 'cylinder'")
+    if fluid is None:
+        raise ValueError('Fluid droplet compounds must be specified')
+    if density is None:
+        raise ValueError('Fluid density must be specified (units kg/m^3)')
+    if isinstance(fluid, (list, set)):
+        if (not isinstance(density, (list, tuple)) or
+                len(density) != len(fluid)):
+            raise ValueError('`fluid` and `density` must be of equal length')
+
+    if x:
+        if x < radius * 4:
+            raise ValueError(
+                'Dimension x of sheet must be at least radius * 4')
+        elif max_size is not None and x > max_size:
+            raise ValueError(
+                'Dimension x of sheet must be less than {:g} nm, '.format(
+                    max_size) +
+                'use build_large_droplet for larger sheets')
+    else:
+        x = radius * 4
+
+    if y:
+        if geometry == 'sphere' and y < radius * 4:
+            raise ValueError(
+                'Dimension y of sheet must be at least radius * 4')
+        elif max_size is not None and y > max_size:
+            raise ValueError(
+                'Dimension y of sheet must be less than {:g} nm, '.format(
+                    max_size) +
+                'use build_large_droplet for larger sheets')
+    elif geometry == 'cylinder':
+        y = radius
+    else:
+        y = radius * 4
+
+    if lattice is None:
+        if lattice_compound is not None:
+            raise ValueError(
+                'If Lattice is None, defaults to a Graphene surface. ' +
+                'In this case, do not specify lattice_compound.'
+            )
+    elif lattice_compound is None:
+        raise ValueError('Lattice compounds must be specified')
+
+    return x, y
@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+
+from dropletbuilder.fluid import FLUID_LIBRARY
+from dropletbuilder.geometry import check_droplet_params
+from dropletbuilder.system import droplet_layout
+from dropletbuilder.utils.binary import BinaryWriter
+from dropletbuilder.utils.writers import CHUNK_SIZE, GroWriter, XyzWriter
+
+
+# Memory model of `build_large_droplet`, in bytes. The fluid cap is held in
+# memory as float64 positions, twice over while the carved layers are
+# joined. The substrate is only ever held one chunk at a time, with its
+# positions, lattice intermediates, names, residue ids and formatted text.
+FLUID_BYTES_PER_ATOM = 48
+CHUNK_BYTES_PER_ATOM = 400
+
+
+def estimate_memory(n_fluid_atoms, chunk_size=CHUNK_SIZE):
+    """
+    Estimated peak memory of `build_large_droplet` in bytes.
+
+    Peak memory does not depend on the size of the sheet, only on the
+    number of fluid atoms in the cap and on the chunk size. For comparison,
+    a `Droplet` holds about a kilobyte per atom of the whole system.
+
+    Parameters
+    ----------
+    n_fluid_atoms : int
+        number of atoms in the droplet
+    chunk_size : int, default = CHUNK_SIZE
+        number of atoms generated and written at a time
+
+    Returns
+    -------
+    n_bytes : int
+    """
+    return int(FLUID_BYTES_PER_ATOM * n_fluid_atoms +
+               CHUNK_BYTES_PER_ATOM * chunk_size)
+
+
+def build_large_droplet(filename, radius=2, angle=90.0, fluid=None,
+                        density=None, lattice=None, lattice_compound=None,
+                        x=None, y=None, n_layers=None, depth=1.5,
+                        fluid_library=FLUID_LIBRARY, chunk_size=CHUNK_SIZE):
+    """
+    Builds a droplet on a lattice of any size straight to a file.
+
+    Unlike `Droplet`, no `mbuild.Compound` is built for the system and the
+    sheet is not limited to 100 nm. The sheet is generated and written a
+    chunk of about `chunk_size` atoms at a time. The droplet is carved from
+    a tiled fluid template, see `droplet_layout`, and held as a position
+    array. Peak memory is therefore set by the droplet and the chunk size
+    and not by the sheet, see `estimate_memory`.
+
+    Parameters
+    ----------
+    filename : str
+        output file, .gro, .xyz or binary .drop, see `open_binary`
+    radius : int, default = 2
+        radius of the droplet in nm
+    angle : float, default = 90.0
+        contact angle of the droplet in degrees
+    fluid : mbuild.Compound
+        compound to fill the droplet with
+    density: float
+        target density for the droplet in kg/m^3
+    lattice: mbuild.Lattice
+        lattice to build droplet on, defaults to graphene
+    lattice_compound: mbuild.Compound
+        compound to build lattice with
+    x : float
+        dimension of the sheet in x direction in nm
+    y : float
+        dimension of the sheet in y direction in nm
+    n_layers : int, default = None
+        number of substrate layers, 3 for graphene by default, overrides
+        `depth` for a lattice
+    depth : float, default = 1.5
+        thickness of a lattice substrate in nm
+    fluid_library : FluidLibrary, default = FLUID_LIBRARY
+        library of packed fluid cubes the droplet is carved from
+    chunk_size : int, default = CHUNK_SIZE
+        approximate number of atoms generated and written at a time
+
+    Returns
+    -------
+    stats : dict
+        'n_particles', 'n_substrate' and 'n_fluid' atoms written,
+        'n_molecules' in the droplet, 'surface_height' and 'periodicity'
+    """
+    x, y = check_droplet_params(
+        radius=radius, fluid=fluid, density=density, lattice=lattice,
+        lattice_compound=lattice_compound, x=x, y=y, max_size=None)
+    if isinstance(fluid, (list, set)):
+        raise ValueError('Large droplets only support a single fluid compound')
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.gro':
+        writer_class = GroWriter
+    elif extension == '.xyz':
+        writer_class = XyzWriter
+    elif extension == '.drop':
+        writer_class = BinaryWriter
+    else:
+        raise ValueError(
+            'Large droplets can only be written to .drop, .gro or .xyz')
+
+    layout = droplet_layout(
+        radius=radius, angle=angle, fluid=fluid, density=density,
+        lattice=lattice, lattice_compound=lattice_compound, x=x, y=y,
+        n_layers=n_layers, depth=depth, fluid_library=fluid_library)
+    sheet = layout['sheet']
+    site_offsets = layout['site']['xyz']
+    site_names = layout['site']['names']
+    site_residue = layout['site_name']
+    n_site_particles = len(site_names)
+    surface_height = layout['surface_height']
+    molecules = layout['molecules']
+    box = layout['box']
+    fluid_names = np.array([particle.name for particle in fluid.particles()])
+
+    n_substrate = sheet.n_sites * n_site_particles
+    n_fluid = molecules.shape[0] * molecules.shape[1]
+
+    sites_per_x = sheet.n_sites // sheet.replicate[0]
+    x_chunk = max(1, chunk_size // (sites_per_x * n_site_particles))
+    residue_id = 0
+    if writer_class is GroWriter:
+        writer = GroWriter(filename, n_substrate + n_fluid, box)
+    elif writer_class is BinaryWriter:
+        names = np.concatenate([site_names, fluid_names,
+                                [site_residue, fluid.name]])
+        writer = BinaryWriter(
+            filename, n_substrate + n_fluid, box,
+            groups=[('LAT', 0, n_substrate),
+                    ('FLD', n_substrate, n_substrate + n_fluid)],
+            metadata={'surface_height': float(surface_height)},
+            name_width=max(len(name) for name in names),
+            residue_width=max(len(name) for name in names))
+    else:
+        writer = XyzWriter(filename, n_substrate + n_fluid)
+    with writer:
+        for _, sites in sheet.iter_positions(x_chunk):
+            xyz = (sites[:, np.newaxis] + site_offsets).reshape(-1, 3)
+            residue_ids = np.repeat(
+                np.arange(residue_id + 1, residue_id + len(sites) + 1),
+                n_site_particles)
+            writer.write(xyz, np.tile(site_names, len(sites)),
+                         np.full(len(xyz), site_residue), residue_ids)
+            residue_id += len(sites)
+
+        molecule_chunk = max(1, chunk_size // len(fluid_names))
+        for start in range(0, len(molecules), molecule_chunk):
+            chunk = molecules[start:start + molecule_chunk]
+            residue_ids = np.repeat(
+                np.arange(residue_id + 1, residue_id + len(chunk) + 1),
+                len(fluid_names))
+            writer.write(chunk.reshape(-1, 3),
+                         np.tile(fluid_names, len(chunk)),
+                         np.full(len(residue_ids), fluid.name), residue_ids)
+            residue_id += len(chunk)
+
+    return {
+        'n_particles': n_substrate + n_fluid,
+        'n_substrate': n_substrate,
+        'n_fluid': n_fluid,
+        'n_molecules': len(molecules),
+        'surface_height': surface_height,
+        'periodicity': box,
+    }
@@ -0,0 +1,149 @@
+import numpy as np
+
+from dropletbuilder.cap import (get_compound_mass, keep_molecules,
+                                molecule_counts, select_cap)
+
+
+def mixture_counts(compounds, densities, volume):
+    """
+    Number of molecules of each species in a volume of a mixture.
+
+    Parameters
+    ----------
+    compounds : list of mbuild.Compound
+        species of the mixture
+    densities : list of float, units kg/m^3
+        partial density of each species, i.e. the mass of that species per
+        volume of mixture, summing to the density of the mixture
+    volume : float, units nm^3
+
+    Returns
+    -------
+    counts : np.ndarray of int, shape=(k,)
+    """
+    if len(compounds) != len(densities):
+        raise ValueError('`fluid` and `density` must be of equal length')
+    masses = np.array([get_compound_mass(c) for c in compounds])
+    # Conversion from kg/m^3 / amu * nm^3 to dimensionless units
+    return (np.asarray(densities, dtype=np.float64) / masses * volume *
+            .60224).astype(int)
+
+
+def molecule_centers(xyz, counts):
+    """
+    Mean position of every molecule in a batched particle array.
+
+    Parameters
+    ----------
+    xyz : np.ndarray, shape=(n, 3)
+        particle coordinates, grouped by molecule
+    counts : np.ndarray, shape=(m,)
+        number of particles in each molecule, sums to n
+
+    Returns
+    -------
+    centers : np.ndarray, shape=(m, 3)
+    """
+    counts = np.asarray(counts, dtype=int)
+    if len(counts) == 0:
+        return np.zeros((0, 3))
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return np.add.reduceat(np.asarray(xyz), starts) / counts[:, np.newaxis]
+
+
+def rebalance(species, keep, targets, distance):
+    """
+    Drops surplus molecules so that the kept molecules match the mole
+    fractions of `targets` as closely as possible.
+
+    Molecules can only be dropped, so the largest droplet with the target
+    composition that fits in the kept molecules is chosen, unless a
+    species has no molecules left at all, in which case nothing is dropped.
+    Of each species, the molecules furthest from the droplet centre are
+    dropped first, which keeps the droplet compact.
+
+    Parameters
+    ----------
+    species : np.ndarray of int, shape=(m,)
+        species index of every molecule
+    keep : np.ndarray of bool, shape=(m,)
+        mask of the molecules kept so far
+    targets : array-like, shape=(k,)
+        requested number of molecules of each species, only their ratios
+        are used
+    distance : np.ndarray, shape=(m,)
+        distance of every molecule from the centre of the droplet
+
+    Returns
+    -------
+    keep : np.ndarray of bool, shape=(m,)
+    """
+    targets = np.asarray(targets, dtype=np.float64)
+    if targets.sum() <= 0:
+        return keep
+    fractions = targets / targets.sum()
+    kept = np.bincount(species[keep], minlength=len(targets))
+    present = fractions > 0
+    total = np.min(kept[present] / fractions[present])
+    if total == 0:
+        return keep
+    wanted = np.minimum(kept, np.round(total * fractions).astype(int))
+
+    # Kept molecules sorted by species, then by distance from the centre
+    order = np.lexsort((distance, species))
+    order = order[keep[order]]
+    ordered_species = species[order]
+    starts = np.searchsorted(ordered_species, np.arange(len(targets)))
+    rank = np.arange(len(order)) - starts[ordered_species]
+
+    balanced = np.zeros_like(keep)
+    balanced[order[rank < wanted[ordered_species]]] = True
+    return balanced
+
+
+def trim_mixture(compound, cut, counts, center, axis=None):
+    """
+    Trims a filled mixture in place down to the molecules lying above
+    z = `cut`, then rebalances the species to the composition it was
+    filled with.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        filled fluid, one child per molecule, `counts[0]` molecules of the
+        first species followed by `counts[1]` of the second, and so on, as
+        PACKMOL places them
+    cut : float
+        z coordinate of the bottom of the cap in nm
+    counts : array-like of int, shape=(k,)
+        number of molecules of each species filled
+    center : array-like, shape=(3,)
+        centre of the droplet in nm
+    axis : array-like, shape=(3,), default = None
+        unit vector of the axis through `center` of a cylindrical droplet,
+        distances to the surface are then measured from the axis
+
+    Returns
+    -------
+    trimmed : mbuild.Compound
+        `compound` itself, trimmed in place to the kept molecules
+    n_kept : int
+        number of molecules kept
+    n_dropped : int
+        number of molecules dropped
+    composition : np.ndarray of int, shape=(k,)
+        number of molecules of each species kept
+    """
+    n_particles = molecule_counts(compound)
+    xyz = compound.xyz
+    species = np.repeat(np.arange(len(counts)), counts)
+    offsets = molecule_centers(xyz, n_particles) - center
+    if axis is not None:
+        offsets -= np.outer(np.dot(offsets, axis), axis)
+    distance = np.linalg.norm(offsets, axis=1)
+
+    keep = select_cap(xyz, n_particles, cut)
+    keep = rebalance(species, keep, counts, distance)
+    trimmed, n_kept, n_dropped = keep_molecules(compound, keep)
+    composition = np.bincount(species[keep], minlength=len(counts))
+    return trimmed, n_kept, n_dropped, composition
@@ -0,0 +1,122 @@
+import numpy as np
+
+from dropletbuilder.cap import keep_molecules, molecule_counts
+
+
+def nearest_distances(xyz, reference_xyz, periodicity):
+    """
+    Distance from every particle to its nearest reference particle, with
+    periodic boundaries in x and y.
+
+    Uses a `scipy.spatial.cKDTree` over the reference particles, so the cost
+    is about O(N log N) rather than O(N * M) for all pairs. z is not
+    periodic; the tree box is made tall enough in z that no periodic image
+    along z is ever nearest.
+
+    Parameters
+    ----------
+    xyz : np.ndarray, shape=(n, 3)
+        particle coordinates in nm
+    reference_xyz : np.ndarray, shape=(m, 3)
+        reference particle coordinates in nm, e.g. the substrate
+    periodicity : array-like
+        box lengths in nm, only the first two are used
+
+    Returns
+    -------
+    distances : np.ndarray, shape=(n,)
+    """
+    from scipy.spatial import cKDTree
+
+    xyz = np.asarray(xyz, dtype=np.float64)
+    reference_xyz = np.asarray(reference_xyz, dtype=np.float64)
+    if len(xyz) == 0:
+        return np.zeros(0)
+    if len(reference_xyz) == 0:
+        return np.full(len(xyz), np.inf)
+
+    z_min = min(np.min(xyz[:, 2]), np.min(reference_xyz[:, 2]))
+    z_max = max(np.max(xyz[:, 2]), np.max(reference_xyz[:, 2]))
+    box = np.array([periodicity[0], periodicity[1],
+                    2 * (z_max - z_min) + 1.0])
+
+    def wrap(positions):
+        wrapped = positions - [0, 0, z_min]
+        wrapped[:, :2] = np.mod(wrapped[:, :2], box[:2])
+        # np.mod can round up to exactly the box length
+        wrapped[:, :2] = np.where(wrapped[:, :2] >= box[:2], 0,
+                                  wrapped[:, :2])
+        return wrapped
+
+    tree = cKDTree(wrap(reference_xyz), boxsize=box)
+    distances, _ = tree.query(wrap(xyz), k=1)
+    return distances
+
+
+def resolve_overlap(fluid, substrate_xyz, periodicity, offset=0.0,
+                    cutoff=0.2, mode='report', fluid_xyz=None):
+    """
+    Checks the distances between a fluid and a substrate before the fluid
+    is shifted into place, and optionally resolves overlaps.
+
+    Parameters
+    ----------
+    fluid : mbuild.Compound
+        fluid, one child per molecule
+    substrate_xyz : np.ndarray, shape=(m, 3)
+        substrate particle coordinates in nm
+    periodicity : array-like
+        box lengths in nm, periodic in the first two
+    offset : float, default = 0.0
+        z shift that will be applied to the fluid in nm
+    cutoff : float, default = 0.2
+        smallest allowed fluid-substrate distance in nm
+    mode : str, default = 'report'
+        'report' only measures, 'remove' drops every molecule with a
+        particle closer than `cutoff`, 'nudge' raises `offset` so that the
+        whole fluid clears `cutoff`
+    fluid_xyz : np.ndarray, shape=(n, 3), default = None
+        particle coordinates of `fluid` in nm, read from it if not given
+
+    Returns
+    -------
+    fluid : mbuild.Compound
+        the fluid, without the overlapping molecules if `mode` is 'remove'
+    offset : float
+        z shift to apply to the fluid, raised if `mode` is 'nudge'
+    min_distance : float
+        smallest fluid-substrate distance in nm, after resolving
+    overlapping : np.ndarray of bool, shape=(k,)
+        mask of the molecules of the input fluid closer than `cutoff`
+    """
+    if mode not in ('report', 'remove', 'nudge'):
+        raise ValueError("overlap must be one of 'report', 'remove' or "
+                         "'nudge'")
+
+    if fluid_xyz is None:
+        fluid_xyz = fluid.xyz
+    counts = molecule_counts(fluid)
+    distances = nearest_distances(fluid_xyz + [0, 0, offset], substrate_xyz,
+                                  periodicity)
+    if len(counts) == 0:
+        return fluid, offset, np.inf, np.zeros(0, dtype=bool)
+
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    molecule_distances = np.minimum.reduceat(distances, starts)
+    overlapping = molecule_distances < cutoff
+    min_distance = np.min(molecule_distances)
+
+    if mode == 'remove' and np.any(overlapping):
+        fluid, _, _ = keep_molecules(fluid, ~overlapping)
+        if np.all(overlapping):
+            min_distance = np.inf
+        else:
+            min_distance = np.min(molecule_distances[~overlapping])
+    elif mode == 'nudge' and min_distance < cutoff:
+        # The nearest pairs are not always straight below each other, so
+        # raise until the nearest distance clears the cutoff
+        while min_distance < cutoff - 1e-6:
+            offset += cutoff - min_distance
+            min_distance = np.min(nearest_distances(
+                fluid_xyz + [0, 0, offset], substrate_xyz, periodicity))
+    return fluid, offset, min_distance, overlapping
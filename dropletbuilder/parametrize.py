@@ -0,0 +1,150 @@
+import hashlib
+import json
+
+
+def topology_key(compound):
+    """
+    Hash of the name, particle names and bonds of a compound, which is all
+    that SMARTS based atom typing depends on; unlike `compound_checksum`
+    it ignores the geometry, so every copy of a molecule shares one key
+    """
+    particles = list(compound.particles())
+    index = {particle: i for i, particle in enumerate(particles)}
+    bonds = sorted(sorted((index[a], index[b])) for a, b in compound.bonds())
+    payload = json.dumps({
+        'name': compound.name,
+        'particles': [particle.name for particle in particles],
+        'bonds': bonds,
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+class TypingCache(object):
+    """
+    Cache of molecules typed with a force field.
+
+    Keyed by the force field, the `topology_key` of the molecule and the
+    keyword arguments of `Forcefield.apply`, so each unique molecule is
+    typed once however many copies of it a droplet holds.
+    """
+
+    def __init__(self):
+        self._typed = dict()
+        # Keeps the force fields alive so that their ids stay unique
+        self._forcefields = dict()
+
+    def get(self, molecule, forcefield, **kwargs):
+        """
+        Returns `molecule` as a `parmed.Structure` typed with `forcefield`,
+        applying the force field only on a miss
+
+        Parameters
+        ----------
+        molecule : mbuild.Compound
+            one molecule, or one lattice site
+        forcefield : foyer.Forcefield
+            force field to apply
+        kwargs : dict
+            passed to `forcefield.apply`
+
+        Returns
+        -------
+        typed : parmed.Structure
+        """
+        key = (id(forcefield), topology_key(molecule),
+               json.dumps(kwargs, sort_keys=True, default=repr))
+        if key not in self._typed:
+            self._forcefields[id(forcefield)] = forcefield
+            self._typed[key] = forcefield.apply(
+                molecule.to_parmed(residues=[molecule.name]), **kwargs)
+        return self._typed[key]
+
+    def clear(self):
+        self._typed.clear()
+        self._forcefields.clear()
+
+    def __len__(self):
+        return len(self._typed)
+
+
+# Cache shared by every `apply_forcefield` call in the process
+TYPING_CACHE = TypingCache()
+
+
+def molecule_runs(compound):
+    """
+    Splits the molecules of a compound into runs of consecutive molecules
+    with the same topology.
+
+    The molecules of a child are its children, e.g. the waters of 'FLD'
+    or the sites of 'LAT', or the child itself if it has none.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        compound whose children are typed separately, e.g. a `Droplet`
+
+    Yields
+    ------
+    child : mbuild.Compound
+        child holding the run
+    molecule : mbuild.Compound
+        first molecule of the run
+    n : int
+        number of molecules in the run
+    """
+    for child in compound.children:
+        molecules = list(child.children) if child.children else [child]
+        start, start_key = 0, topology_key(molecules[0])
+        for i in range(1, len(molecules)):
+            key = topology_key(molecules[i])
+            if key != start_key:
+                yield child, molecules[start], i - start
+                start, start_key = i, key
+        yield child, molecules[start], len(molecules) - start
+
+
+def apply_forcefield(compound, forcefields, cache=TYPING_CACHE, **kwargs):
+    """
+    Types a droplet by applying a force field to one representative of
+    each unique molecule and stamping its parameters onto every copy.
+
+    Equivalent to applying the force field to each child of `compound`
+    and adding the structures, as in the examples, but the SMARTS typing
+    cost no longer grows with the number of molecules. Lattice sites are
+    unbonded, so the unit typed for the lattice is a single site.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        compound to type, e.g. a `Droplet` with 'LAT' and 'FLD' children
+    forcefields : foyer.Forcefield or dict
+        force field for every child, or a dict of them keyed by child name
+    cache : TypingCache, default = TYPING_CACHE
+        cache of typed molecules, shared by all calls by default
+    kwargs : dict
+        passed to `Forcefield.apply`, e.g. `assert_dihedral_params`
+
+    Returns
+    -------
+    structure : parmed.Structure
+        typed structure with the coordinates and box of `compound`
+    """
+    import numpy as np
+    import parmed
+
+    if not isinstance(forcefields, dict):
+        forcefields = {child.name: forcefields for child in compound.children}
+
+    structure = parmed.Structure()
+    for child, molecule, n in molecule_runs(compound):
+        if child.name not in forcefields:
+            raise ValueError(
+                'No force field given for child {}'.format(child.name))
+        typed = cache.get(molecule, forcefields[child.name], **kwargs)
+        structure += typed * n
+
+    structure.coordinates = compound.xyz * 10
+    structure.box = np.concatenate(
+        [np.asarray(compound.periodicity) * 10, [90, 90, 90]])
+    return structure
@@ -0,0 +1,333 @@
+"""
+Asynchronous droplet builds for event loop based applications.
+
+`Droplet` is a blocking, CPU bound constructor. `BuildService` runs builds
+in a bounded process pool instead, fed from a priority queue, so that
+coroutines can await them without stalling the event loop::
+
+    async with BuildService(max_workers=4) as service:
+        system = await service.build(radius=2, fluid=water, density=997)
+
+or, with a service shared by the whole event loop::
+
+    system = await build_droplet_async(radius=2, fluid=water, density=997)
+"""
+import asyncio
+import itertools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Droplet arguments that do not change the droplet built
+_UNKEYED = ('substrate_cache', 'fluid_library', 'output_cache')
+
+# Droplet arguments checked before a request is queued
+_CHECKED = ('radius', 'fluid', 'density', 'lattice', 'lattice_compound', 'x',
+            'y', 'geometry')
+
+# Queue progress records are sent back on, set once per worker process
+_PROGRESS = None
+
+
+def _init_worker(progress):
+    global _PROGRESS
+    _PROGRESS = progress
+
+
+def _build_job(job_id, kwargs, filename):
+    # Imported here so that mbuild is only loaded by processes that build
+    from dropletbuilder.dropletbuilder import Droplet
+    from dropletbuilder.utils.profiling import BuildProfiler
+
+    def report(record):
+        _PROGRESS.put((job_id, record))
+
+    profiler = BuildProfiler(trace_memory=False, callback=report)
+    droplet = Droplet(profile=profiler, **kwargs)
+    with profiler.stage('write', lambda: system.n_particles):
+        system = droplet.to_system()
+        if filename is not None:
+            system.save(filename)
+    return system, profiler.stages
+
+
+def job_key(kwargs, filename=None):
+    """
+    Key under which identical build requests are deduplicated, see
+    `droplet_key`
+    """
+    from dropletbuilder.geometry import check_droplet_params
+    from dropletbuilder.system import droplet_key
+
+    # Fails here, as `Droplet` would, rather than in a worker
+    check_droplet_params(**{name: kwargs[name] for name in _CHECKED
+                            if name in kwargs})
+    options = {name: value for name, value in kwargs.items()
+               if name not in _UNKEYED}
+    return droplet_key(fluid_library=kwargs.get('fluid_library'),
+                       filename=filename, **options)
+
+
+class _Job(object):
+    def __init__(self, job_id, key, kwargs, filename, future):
+        self.id = job_id
+        self.key = key
+        self.kwargs = kwargs
+        self.filename = filename
+        self.future = future
+        self.callbacks = []
+        self.n_waiters = 0
+        self.n_reported = 0
+
+
+class BuildService(object):
+    """
+    Builds droplets in a bounded process pool for coroutines.
+
+    Requests wait in a priority queue and the `max_workers` most urgent run
+    at a time, each in a worker process that keeps its substrate and fluid
+    caches warm between builds. Identical requests that are queued or
+    running at the same time share one build. The service starts with the
+    first request, in the running event loop, and is stopped with `close`
+    or by using it as an async context manager.
+
+    Parameters
+    ----------
+    max_workers : int, default = None
+        number of worker processes, defaults to the number of CPUs
+    max_queued : int, default = 0
+        number of requests waiting to run before `build` blocks until one
+        starts, unbounded if 0
+    """
+
+    def __init__(self, max_workers=None, max_queued=0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queued = max_queued
+        self._loop = None
+        self._jobs = dict()
+        self._jobs_by_id = dict()
+        self._ids = itertools.count()
+
+    def _start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_event_loop()
+        self._queue = asyncio.PriorityQueue(maxsize=self.max_queued)
+        self._progress = multiprocessing.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers, initializer=_init_worker,
+            initargs=(self._progress,))
+        self._workers = [self._loop.create_task(self._work())
+                         for _ in range(self.max_workers)]
+        self._listener = threading.Thread(target=self._listen, daemon=True)
+        self._listener.start()
+
+    @property
+    def n_pending(self):
+        """
+        Number of distinct builds queued or running
+        """
+        return len(self._jobs)
+
+    async def build(self, priority=0, progress=None, filename=None,
+                    **kwargs):
+        """
+        Builds a droplet without blocking the event loop.
+
+        Parameters
+        ----------
+        priority : int, default = 0
+            requests with lower values run first, equal values in the order
+            they were made
+        progress : callable, default = None
+            called in the event loop with the record of each build stage as
+            it finishes, see `BuildProfiler`; the stages are those of
+            `Droplet.build_stats` followed by 'write'
+        filename : str, default = None
+            file the system is also saved to in the worker, see
+            `DropletSystem.save`
+        **kwargs
+            `Droplet` keyword arguments, sent to the worker process, other
+            than `profile`, since the worker profiles every build for
+            `progress`
+
+        Returns
+        -------
+        system : DropletSystem
+            the droplet, with its build attributes in `metadata`
+
+        Cancelling the awaiting task withdraws the request. A build still
+        queued is dropped once no other request shares it; a running build
+        cannot be interrupted and finishes in its worker, but its result is
+        discarded.
+        """
+        if 'profile' in kwargs:
+            raise ValueError('BuildService profiles every build, pass '
+                             'progress to receive its stages')
+        self._start()
+        key = job_key(kwargs, filename)
+        job = self._jobs.get(key)
+        queue = job is None
+        if queue:
+            job = _Job(next(self._ids), key, kwargs, filename,
+                       self._loop.create_future())
+            self._jobs[key] = job
+            self._jobs_by_id[job.id] = job
+        job.n_waiters += 1
+        if progress is not None:
+            job.callbacks.append(progress)
+        try:
+            if queue:
+                await self._queue.put((priority, job.id, job))
+            return await asyncio.shield(job.future)
+        except asyncio.CancelledError:
+            job.n_waiters -= 1
+            if progress is not None:
+                job.callbacks.remove(progress)
+            if job.n_waiters == 0 and not job.future.done():
+                job.future.cancel()
+                self._forget(job)
+            raise
+
+    async def _work(self):
+        while True:
+            _, _, job = await self._queue.get()
+            try:
+                if job.future.done():
+                    # Cancelled while queued
+                    continue
+                try:
+                    system, stages = await self._loop.run_in_executor(
+                        self._executor, _build_job, job.id, job.kwargs,
+                        job.filename)
+                except asyncio.CancelledError:
+                    # The service is closing
+                    job.future.cancel()
+                    raise
+                except Exception as e:
+                    if not job.future.done():
+                        job.future.set_exception(e)
+                else:
+                    # Stages whose progress records are still on their way
+                    for record in stages[job.n_reported:]:
+                        self._report(job.id, record)
+                    if not job.future.done():
+                        job.future.set_result(system)
+            finally:
+                self._forget(job)
+                self._queue.task_done()
+
+    def _forget(self, job):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        self._jobs_by_id.pop(job.id, None)
+
+    def _listen(self):
+        # Forwards progress records from the workers to the event loop
+        while True:
+            message = self._progress.get()
+            if message is None:
+                return
+            try:
+                self._loop.call_soon_threadsafe(self._report, *message)
+            except RuntimeError:
+                # The event loop was closed
+                return
+
+    def _report(self, job_id, record):
+        job = self._jobs_by_id.get(job_id)
+        if job is None:
+            return
+        job.n_reported += 1
+        for callback in list(job.callbacks):
+            callback(record)
+
+    async def close(self):
+        """
+        Stops the workers, cancelling every request still queued
+        """
+        if self._loop is None:
+            return
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for job in list(self._jobs.values()):
+            job.future.cancel()
+            self._forget(job)
+        await self._loop.run_in_executor(None, self._stop_processes)
+        self._loop = None
+
+    def _stop_processes(self):
+        # Blocks until the worker processes and the listener have stopped
+        self._executor.shutdown()
+        self._progress.put(None)
+        self._listener.join()
+        self._progress.close()
+
+    def _close_stopped(self):
+        # Closes a service whose event loop is no longer running, so its
+        # queued and running builds can never be awaited
+        if not self._loop.is_closed():
+            for worker in self._workers:
+                worker.cancel()
+        for job in list(self._jobs.values()):
+            self._forget(job)
+        self._stop_processes()
+        self._loop = None
+
+    async def __aenter__(self):
+        self._start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+# Service shared by `build_droplet_async` calls in one event loop
+_DEFAULT_SERVICE = None
+
+
+def default_service():
+    """
+    Service shared by every `build_droplet_async` call in the running
+    event loop, created on first use with one worker per CPU.
+
+    The service of a previous event loop is closed when it is replaced,
+    so that its worker processes do not outlive it.
+    """
+    global _DEFAULT_SERVICE
+    loop = asyncio.get_event_loop()
+    service = _DEFAULT_SERVICE
+    if service is not None and service._loop not in (None, loop):
+        if service._loop.is_running():
+            # Running in another thread, close it there
+            asyncio.run_coroutine_threadsafe(service.close(), service._loop)
+        else:
+            service._close_stopped()
+        service = None
+    if service is None:
+        _DEFAULT_SERVICE = service = BuildService()
+    return service
+
+
+async def build_droplet_async(priority=0, progress=None, filename=None,
+                              service=None, **kwargs):
+    """
+    Builds a droplet in a worker process without blocking the event loop.
+
+    Parameters
+    ----------
+    priority, progress, filename, **kwargs
+        see `BuildService.build`
+    service : BuildService, default = None
+        service to build with, defaults to `default_service()`
+
+    Returns
+    -------
+    system : DropletSystem
+    """
+    if service is None:
+        service = default_service()
+    return await service.build(priority=priority, progress=progress,
+                               filename=filename, **kwargs)
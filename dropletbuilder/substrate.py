@@ -0,0 +1,570 @@
+import hashlib
+import json
+
+import numpy as np
+
+from dropletbuilder.geometry import footprint_distance
+from dropletbuilder.utils.cache import TieredCache
+
+
+GRAPHENE_SPACING = [0.2456, 0.2456, 0.335]
+GRAPHENE_ANGLES = [90.0, 90.0, 120.0]
+GRAPHENE_BASIS = [[0, 0, 0], [2 / 3, 1 / 3, 0]]
+
+
+def lattice_positions(lattice_spacing, lattice_vectors, lattice_points,
+                      x=1, y=1, z=1, x_start=0):
+    """
+    Cartesian positions of every point of a replicated lattice.
+
+    Generates the same coordinates, in the same order, as
+    `mbuild.Lattice.populate`, but as arrays in one batched operation
+    rather than one `Compound` per lattice point.
+
+    Parameters
+    ----------
+    lattice_spacing : array-like, shape=(3,)
+        lattice spacing in nm
+    lattice_vectors : array-like, shape=(3, 3)
+        lattice vectors, one per row
+    lattice_points : dict
+        fractional coordinates of the basis, keyed by compound name
+    x, y, z : int
+        number of replicates in each direction
+    x_start : int, default = 0
+        first replicate in x direction, so that a sheet can be generated
+        in slices of replicates `x_start` to `x`
+
+    Returns
+    -------
+    names : np.ndarray of str, shape=(n,)
+        basis key of each lattice point
+    xyz : np.ndarray, shape=(n, 3)
+        cartesian coordinates of each lattice point in nm
+    """
+    vectors = np.asarray(lattice_vectors, dtype=np.float64).reshape(3, 3)
+    unit_vecs = vectors / np.linalg.norm(vectors, axis=1)[:, np.newaxis]
+    grid = np.stack(np.meshgrid(
+        np.arange(x_start, x), np.arange(y), np.arange(z), indexing='ij'),
+        axis=-1).reshape(-1, 3)
+
+    names = []
+    frac = []
+    for key, locations in lattice_points.items():
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+        frac.append((locations[:, np.newaxis, :] + grid).reshape(-1, 3))
+        names.append(np.full(len(locations) * len(grid), key))
+
+    xyz = np.dot(np.concatenate(frac), unit_vecs) * lattice_spacing
+    return np.concatenate(names), xyz
+
+
+class Substrate(object):
+    """
+    Lightweight particle table for a lattice sheet.
+
+    Holds the sheet as arrays and only builds an `mbuild.Compound` when
+    `to_compound` is called.
+
+    Parameters
+    ----------
+    names : np.ndarray of str, shape=(n,)
+        compound name of each lattice site
+    xyz : np.ndarray, shape=(n, 3)
+        position of each lattice site in nm
+    periodicity : array-like, shape=(3,)
+        periodic lengths of the sheet in nm
+
+    Attributes
+    ----------
+    surface_height : float
+        z coordinate of the top of the sheet in nm
+    n_sites : int
+        number of lattice sites
+    """
+
+    def __init__(self, names, xyz, periodicity):
+        self.names = np.asarray(names)
+        self.xyz = np.asarray(xyz, dtype=np.float64)
+        self.periodicity = np.asarray(periodicity, dtype=np.float64)
+
+    @property
+    def n_sites(self):
+        return len(self.xyz)
+
+    @property
+    def surface_height(self):
+        return np.max(self.xyz[:, 2])
+
+    def select(self, mask):
+        """
+        Sheet of the sites selected by the boolean `mask`, with the same
+        periodicity
+        """
+        return Substrate(self.names[mask], self.xyz[mask], self.periodicity)
+
+    def to_compound(self, compound_dict, name='LAT'):
+        """
+        Materialize the sheet as an `mbuild.Compound`.
+
+        Parameters
+        ----------
+        compound_dict : dict
+            compound placed at each site, keyed by site name
+        name : str, default = 'LAT'
+            name of the returned compound
+
+        Returns
+        -------
+        sheet : mbuild.Compound
+        """
+        import mbuild
+
+        sheet = mbuild.Compound(name=name)
+        # Sites hold views of the rows of one private copy of the positions
+        xyz = self.xyz.copy()
+        # Name and charge of the sites that are single particles, which are
+        # built directly rather than deep cloned for every site
+        particle_sites = {
+            site_name: (site.name, site.charge)
+            for site_name, site in compound_dict.items() if not site.children}
+        particles = []
+        for site_name, pos in zip(self.names, xyz):
+            if site_name in particle_sites:
+                particle_name, charge = particle_sites[site_name]
+                particle = mbuild.Compound(name=particle_name, pos=pos,
+                                           charge=charge)
+            else:
+                particle = mbuild.clone(compound_dict[site_name])
+                particle.translate_to(pos)
+            particles.append(particle)
+        sheet.add(particles)
+        sheet.periodicity = self.periodicity.copy()
+        return sheet
+
+
+def frozen_sites(substrate, center, contact_radius, distance=None,
+                 depth=None, geometry='sphere'):
+    """
+    Mask of the sites of a sheet far from a droplet, which can be frozen or
+    replaced by an implicit wall.
+
+    Parameters
+    ----------
+    substrate : Substrate
+    center : array-like
+        x and y coordinates of the droplet axis in nm
+    contact_radius : float
+        radius of the droplet footprint in nm, see `get_contact_radius`
+    distance : float, default = None
+        sites farther than `distance` nm from the footprint are selected,
+        see `footprint_distance`
+    depth : float, default = None
+        sites deeper than `depth` nm below the top of the sheet are selected
+    geometry : str, default = 'sphere'
+        'sphere' or 'cylinder', shape of the droplet footprint
+
+    Returns
+    -------
+    mask : np.ndarray of bool, shape=(n_sites,)
+    """
+    mask = np.zeros(substrate.n_sites, dtype=bool)
+    if distance is not None:
+        mask |= footprint_distance(substrate.xyz, center, contact_radius,
+                                   substrate.periodicity, geometry) > distance
+    if depth is not None:
+        mask |= substrate.surface_height - substrate.xyz[:, 2] > depth
+    return mask
+
+
+def lattice_payload(lattice_spacing, angles, lattice_vectors, lattice_points):
+    """
+    JSON serializable description of a lattice, for hashing it by content
+
+    Returns
+    -------
+    payload : dict
+        'lattice_spacing', 'angles', 'lattice_vectors' and 'lattice_points'
+        as lists of floats
+    """
+    return {
+        'lattice_spacing': np.asarray(lattice_spacing, dtype=float).tolist(),
+        'angles': np.asarray(angles, dtype=float).tolist(),
+        'lattice_vectors': np.asarray(lattice_vectors, dtype=float).tolist(),
+        'lattice_points': {
+            name: np.asarray(points, dtype=float).tolist()
+            for name, points in lattice_points.items()},
+    }
+
+
+def substrate_key(lattice_spacing, angles, lattice_vectors, lattice_points,
+                  replicate):
+    """
+    Hash identifying a replicated lattice sheet.
+
+    Parameters
+    ----------
+    lattice_spacing : array-like, shape=(3,)
+        lattice spacing in nm
+    angles : array-like, shape=(3,)
+        lattice angles in degrees
+    lattice_vectors : array-like, shape=(3, 3)
+        lattice vectors, one per row
+    lattice_points : dict
+        fractional coordinates of the basis, keyed by compound name
+    replicate : array-like, shape=(3,)
+        number of replicates in each direction
+
+    Returns
+    -------
+    key : str
+    """
+    payload = lattice_payload(lattice_spacing, angles, lattice_vectors,
+                              lattice_points)
+    payload['replicate'] = [int(n) for n in replicate]
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class SubstrateCache(TieredCache):
+    """
+    Cache of built substrates.
+
+    Keeps the most recently used sheets in memory and, if `cache_dir` is
+    given, also stores every sheet as an npz file so that later processes
+    can load it instead of building it again.
+
+    Parameters
+    ----------
+    maxsize : int, default = 8
+        number of substrates kept in memory
+    cache_dir : str, default = None
+        directory for the on-disk tier, disabled if None
+    """
+
+    prefix = 'substrate'
+
+    def _load(self, filename):
+        with np.load(filename) as data:
+            return Substrate(data['names'], data['xyz'], data['periodicity'])
+
+    def _dump(self, substrate, f):
+        np.savez(f, names=substrate.names, xyz=substrate.xyz,
+                 periodicity=substrate.periodicity)
+
+
+SUBSTRATE_CACHE = SubstrateCache()
+
+
+def _cached(cache, key, build):
+    if cache is None:
+        return build()
+    return cache.get_or_build(key, build)
+
+
+class LatticeSheet(object):
+    """
+    Geometry of a replicated lattice sheet in an orthogonal periodic box.
+
+    Describes the sheet without generating it, so that it can be built
+    into a `Substrate` in one go, or generated in slices of x replicates
+    when the whole sheet should never be held in memory.
+
+    Parameters
+    ----------
+    lattice_spacing : array-like, shape=(3,)
+        lattice spacing in nm
+    angles : array-like, shape=(3,)
+        lattice angles in degrees
+    lattice_vectors : array-like, shape=(3, 3)
+        lattice vectors, one per row
+    lattice_points : dict
+        fractional coordinates of the basis, keyed by compound name
+    replicate : array-like, shape=(3,)
+        number of replicates in each direction
+    periodicity : array-like, shape=(3,)
+        periodic lengths of the sheet in nm, sites with negative x are
+        wrapped by periodicity[0]
+    """
+
+    def __init__(self, lattice_spacing, angles, lattice_vectors,
+                 lattice_points, replicate, periodicity):
+        self.lattice_spacing = np.asarray(lattice_spacing, dtype=np.float64)
+        self.angles = np.asarray(angles, dtype=np.float64)
+        self.lattice_vectors = np.asarray(lattice_vectors, dtype=np.float64)
+        self.lattice_points = lattice_points
+        self.replicate = [int(n) for n in replicate]
+        self.periodicity = np.asarray(periodicity, dtype=np.float64)
+
+    @property
+    def key(self):
+        return substrate_key(self.lattice_spacing, self.angles,
+                             self.lattice_vectors, self.lattice_points,
+                             self.replicate)
+
+    @property
+    def n_sites(self):
+        n_basis = sum(len(points) for points in self.lattice_points.values())
+        return n_basis * int(np.prod(self.replicate))
+
+    def positions(self, x_start=0, x_stop=None):
+        """
+        Site names and wrapped positions of x replicates `x_start` to
+        `x_stop`
+
+        Returns
+        -------
+        names : np.ndarray of str, shape=(n,)
+        xyz : np.ndarray, shape=(n, 3)
+        """
+        if x_stop is None:
+            x_stop = self.replicate[0]
+        names, xyz = lattice_positions(
+            self.lattice_spacing, self.lattice_vectors, self.lattice_points,
+            x_stop, self.replicate[1], self.replicate[2], x_start=x_start)
+        xyz[xyz[:, 0] < 0, 0] += self.periodicity[0]
+        return names, xyz
+
+    def iter_positions(self, x_chunk):
+        """
+        Yields the site names and positions `x_chunk` x replicates at a time
+        """
+        for x_start in range(0, self.replicate[0], x_chunk):
+            yield self.positions(
+                x_start, min(x_start + x_chunk, self.replicate[0]))
+
+    def build(self):
+        """
+        Generates the whole sheet
+
+        Returns
+        -------
+        substrate : Substrate
+        """
+        names, xyz = self.positions()
+        return Substrate(names, xyz, self.periodicity)
+
+
+def graphene_sheet(x, y, n_layers=3):
+    """
+    Geometry of a graphene sheet of about `x` by `y` nm
+
+    Returns
+    -------
+    sheet : LatticeSheet
+    """
+    factor = np.cos(np.pi / 6) # fixes non-cubic lattice
+    # Estimate the number of lattice repeat units
+    replicate = [int(x / GRAPHENE_SPACING[0]),
+                 int(int(y / GRAPHENE_SPACING[1]) * (1 / factor)),
+                 n_layers]
+    gamma = np.deg2rad(GRAPHENE_ANGLES[2])
+    lattice_vectors = [[1, 0, 0], [np.cos(gamma), np.sin(gamma), 0],
+                       [0, 0, 1]]
+    periodicity = np.multiply(GRAPHENE_SPACING, replicate)
+    periodicity[1] *= factor
+    return LatticeSheet(GRAPHENE_SPACING, GRAPHENE_ANGLES, lattice_vectors,
+                        {'C': GRAPHENE_BASIS}, replicate, periodicity)
+
+
+def orthogonal_cell(lattice_spacing, lattice_vectors, lattice_points,
+                    n_layers=1, max_index=12):
+    """
+    Orthogonal supercell of a triclinic lattice slab.
+
+    Finds the shortest lattice vectors along x and along y that are
+    integer combinations of the first two lattice vectors, and expresses
+    `n_layers` layers of every lattice point inside the orthogonal box they
+    span as fractional coordinates of that box, wrapped into it in one
+    vectorized operation. The supercell can then be replicated like any
+    cubic lattice.
+
+    Parameters
+    ----------
+    lattice_spacing : array-like, shape=(3,)
+        lattice spacing in nm
+    lattice_vectors : array-like, shape=(3, 3)
+        lattice vectors, one per row, the first two in the xy plane
+    lattice_points : dict
+        fractional coordinates of the basis, keyed by compound name
+    n_layers : int, default = 1
+        number of layers along the third lattice vector
+    max_index : int, default = 12
+        largest multiple of a lattice vector searched for the supercell
+
+    Returns
+    -------
+    spacing : np.ndarray, shape=(3,)
+        edge lengths of the orthogonal supercell in nm
+    points : dict
+        fractional coordinates in the supercell, keyed by compound name
+    """
+    vectors = np.asarray(lattice_vectors, dtype=np.float64).reshape(3, 3)
+    unit_vecs = vectors / np.linalg.norm(vectors, axis=1)[:, np.newaxis]
+    cell = unit_vecs * np.asarray(lattice_spacing, dtype=np.float64)[
+        :, np.newaxis]
+    scale = np.max(np.abs(cell))
+    if np.any(np.abs(cell[:2, 2]) > 1e-6 * scale) or cell[2, 2] <= 0:
+        raise ValueError(
+            'The first two lattice vectors must lie in the xy plane and ' +
+            'the third must point up along z')
+
+    index = np.arange(-max_index, max_index + 1)
+    combos = np.stack(np.meshgrid(index, index, indexing='ij'),
+                      axis=-1).reshape(-1, 2)
+    combos = combos[np.any(combos != 0, axis=1)]
+    in_plane = np.dot(combos, cell[:2, :2])
+    tol = 1e-6 * scale
+    along_x = (np.abs(in_plane[:, 1]) < tol) & (in_plane[:, 0] > tol)
+    along_y = (np.abs(in_plane[:, 0]) < tol) & (in_plane[:, 1] > tol)
+    if not np.any(along_x) or not np.any(along_y):
+        raise ValueError(
+            'No orthogonal supercell within {} lattice vectors'.format(
+                max_index))
+    x_combo = combos[along_x][np.argmin(in_plane[along_x, 0])]
+    y_combo = combos[along_y][np.argmin(in_plane[along_y, 1])]
+    supercell = np.array([x_combo, y_combo])
+
+    # Lattice translations modulo the supercell, in exact integer
+    # arithmetic: t is in the supercell lattice iff t . adj(M) = 0 mod det
+    det = int(round(np.linalg.det(supercell)))
+    adjugate = np.array([[supercell[1, 1], -supercell[0, 1]],
+                         [-supercell[1, 0], supercell[0, 0]]]) * np.sign(det)
+    det = abs(det)
+    candidates = np.stack(np.meshgrid(np.arange(det), np.arange(det),
+                                      indexing='ij'), axis=-1).reshape(-1, 2)
+    _, first = np.unique(np.mod(np.dot(candidates, adjugate), det), axis=0,
+                         return_index=True)
+    translations = candidates[np.sort(first)]
+    translations = np.concatenate([
+        np.column_stack((translations, np.full(len(translations), k)))
+        for k in range(n_layers)])
+
+    spacing = np.array([in_plane[along_x, 0].min(),
+                        in_plane[along_y, 1].min(),
+                        n_layers * cell[2, 2]])
+    points = dict()
+    for name, locations in lattice_points.items():
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+        frac = (translations[:, np.newaxis] + locations).reshape(-1, 3)
+        frac = np.round(np.dot(frac, cell) / spacing, 10)
+        frac[:, :2] = np.mod(frac[:, :2], 1)
+        points[name] = frac
+    return spacing, points
+
+
+def lattice_sheet(lattice, x, y, depth=1.5, n_layers=None):
+    """
+    Geometry of a sheet of an `mbuild.Lattice` of about `x` by `y` by
+    `depth` nm, at least one layer, or `n_layers` layers deep if given
+
+    Non-cubic lattices are first reduced to an orthogonal supercell, see
+    `orthogonal_cell`, holding every layer of the sheet, and replicated to
+    at least `x` by `y` nm.
+
+    Returns
+    -------
+    sheet : LatticeSheet
+    """
+    spacing = np.asarray(lattice.lattice_spacing, dtype=np.float64)
+    if np.all(np.asarray(lattice.angles) == 90.0):
+        if n_layers is None:
+            n_layers = max(1, int(depth / spacing[2]))
+        replicate = [int(x / spacing[0]), int(y / spacing[1]), n_layers]
+        return LatticeSheet(spacing, lattice.angles, lattice.lattice_vectors,
+                            lattice.lattice_points, replicate,
+                            spacing * replicate)
+
+    vectors = np.asarray(lattice.lattice_vectors, dtype=np.float64)
+    height = spacing[2] * vectors[2, 2] / np.linalg.norm(vectors[2])
+    if n_layers is None:
+        n_layers = max(1, int(depth / height))
+    spacing, points = orthogonal_cell(
+        lattice.lattice_spacing, vectors, lattice.lattice_points, n_layers)
+    replicate = [int(np.ceil(x / spacing[0] - 1e-9)),
+                 int(np.ceil(y / spacing[1] - 1e-9)), 1]
+    return LatticeSheet(spacing, [90.0, 90.0, 90.0], np.identity(3), points,
+                        replicate, spacing * replicate)
+
+
+def droplet_sheet(lattice, x, y, n_layers=None, depth=1.5):
+    """
+    Geometry of the sheet a droplet is built on, graphene `n_layers` deep,
+    3 by default, if `lattice` is None and otherwise see `lattice_sheet`
+
+    Returns
+    -------
+    sheet : LatticeSheet
+    """
+    if n_layers is not None and n_layers < 1:
+        raise ValueError('n_layers must be at least 1')
+    if depth <= 0:
+        raise ValueError('depth must be positive')
+    if lattice is None:
+        return graphene_sheet(x, y, 3 if n_layers is None else n_layers)
+    return lattice_sheet(lattice, x, y, depth=depth, n_layers=n_layers)
+
+
+def graphene_substrate(x, y, n_layers=3, cache=None):
+    """
+    Builds a graphene sheet as arrays.
+
+    Tiles the two-atom hexagonal basis, stacks `n_layers` layers and wraps
+    the sheet into an orthogonal periodic box in single NumPy operations.
+
+    Parameters
+    ----------
+    x : float
+        dimension of the sheet in x direction in nm
+    y : float
+        dimension of the sheet in y direction in nm
+    n_layers : int, default = 3
+        number of graphene layers
+    cache : SubstrateCache, default = None
+        cache to look the sheet up in before building it
+
+    Returns
+    -------
+    substrate : Substrate
+    """
+    sheet = graphene_sheet(x, y, n_layers)
+    return _cached(cache, sheet.key, sheet.build)
+
+
+def lattice_substrate(lattice, x, y, depth=1.5, n_layers=None, cache=None):
+    """
+    Builds a sheet of an `mbuild.Lattice` as arrays.
+
+    Parameters
+    ----------
+    lattice : mbuild.Lattice
+        lattice to replicate
+    x : float
+        dimension of the sheet in x direction in nm
+    y : float
+        dimension of the sheet in y direction in nm
+    depth : float, default = 1.5
+        thickness of the sheet in nm
+    n_layers : int, default = None
+        number of lattice layers, overrides `depth` if given
+    cache : SubstrateCache, default = None
+        cache to look the sheet up in before building it
+
+    Returns
+    -------
+    substrate : Substrate
+    """
+    sheet = lattice_sheet(lattice, x, y, depth, n_layers)
+    return _cached(cache, sheet.key, sheet.build)
+
+
+def droplet_substrate(lattice, x, y, n_layers=None, depth=1.5, cache=None):
+    """
+    Builds the sheet a droplet is built on as arrays, see `droplet_sheet`
+
+    Returns
+    -------
+    substrate : Substrate
+    """
+    sheet = droplet_sheet(lattice, x, y, n_layers=n_layers, depth=depth)
+    return _cached(cache, sheet.key, sheet.build)
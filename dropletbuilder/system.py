@@ -0,0 +1,637 @@
+import hashlib
+import inspect
+import io
+import json
+import os
+
+import numpy as np
+
+from dropletbuilder import __version__
+from dropletbuilder.fluid import FLUID_LIBRARY, compound_checksum
+from dropletbuilder.geometry import check_droplet_params, get_cut_height
+from dropletbuilder.substrate import (SUBSTRATE_CACHE, droplet_sheet,
+                                      droplet_substrate, lattice_payload)
+from dropletbuilder.utils.binary import (BINARY_EXTENSION, open_binary,
+                                         write_binary)
+from dropletbuilder.utils.cache import TieredCache
+from dropletbuilder.utils.writers import (CHUNK_SIZE, element_symbols,
+                                          particle_arrays, save_arrays,
+                                          write_lammpsdata)
+
+# Bump when the way droplets are built changes without a version change,
+# so that stale cached droplets are never returned
+DROPLET_CACHE_FORMAT = 2
+
+
+def particle_dtype(name_width=8, residue_width=8):
+    """
+    Structured dtype of one particle of a `DropletSystem`
+    """
+    return np.dtype([
+        ('xyz', np.float64, (3,)),
+        ('name', 'U{:d}'.format(name_width)),
+        ('residue_id', np.int64),
+        ('residue_name', 'U{:d}'.format(residue_width)),
+        ('charge', np.float64),
+    ])
+
+
+class DropletSystem(object):
+    """
+    Compact, array-backed droplet on a lattice.
+
+    Holds one row per particle in a NumPy structured array rather than one
+    `mbuild.Compound` per particle, at about a tenth of the memory. Use
+    `to_compound` or `to_parmed` where the full objects are needed.
+
+    Parameters
+    ----------
+    particles : np.ndarray, dtype=particle_dtype()
+        'xyz' in nm, 'name', 'residue_id', 'residue_name' and 'charge' of
+        every particle, residues numbered from 1 and stored contiguously
+    bonds : np.ndarray of int, shape=(m, 2), default = None
+        particle indices of each bond
+    groups : list of (str, int, int), default = None
+        name, start and stop particle index of each group, e.g. 'LAT' and
+        'FLD'
+    periodicity : array-like, shape=(3,), default = None
+        box lengths in nm
+    metadata : dict, default = None
+        JSON serializable properties of the build, e.g. `surface_height`
+    """
+
+    def __init__(self, particles, bonds=None, groups=None, periodicity=None,
+                 metadata=None):
+        self.particles = particles
+        if bonds is None:
+            bonds = np.zeros((0, 2), dtype=np.int64)
+        self.bonds = np.asarray(bonds, dtype=np.int64).reshape(-1, 2)
+        if groups is None:
+            groups = [('ALL', 0, len(particles))]
+        self.groups = list(groups)
+        if periodicity is None:
+            periodicity = np.zeros(3)
+        self.periodicity = np.asarray(periodicity, dtype=np.float64)
+        self.metadata = dict(metadata or {})
+
+    @classmethod
+    def from_arrays(cls, xyz, names, residue_ids, residue_names, charges=None,
+                    bonds=None, groups=None, periodicity=None):
+        """
+        Builds a system from per-particle arrays, see `particle_arrays`
+        """
+        names = np.asarray(names)
+        residue_names = np.asarray(residue_names)
+        particles = np.zeros(len(names), dtype=particle_dtype(
+            max(1, names.dtype.itemsize // 4),
+            max(1, residue_names.dtype.itemsize // 4)))
+        particles['xyz'] = xyz
+        particles['name'] = names
+        particles['residue_id'] = residue_ids
+        particles['residue_name'] = residue_names
+        if charges is not None:
+            particles['charge'] = charges
+        return cls(particles, bonds=bonds, groups=groups,
+                   periodicity=periodicity)
+
+    @classmethod
+    def from_compound(cls, compound):
+        """
+        Flattens a droplet, or any compound whose children are groups of
+        residues, into a system
+        """
+        arrays = particle_arrays(compound)
+        return cls.from_arrays(
+            arrays['xyz'], arrays['names'], arrays['residue_ids'],
+            arrays['residue_names'], charges=arrays['charges'],
+            bonds=arrays['bonds'], groups=arrays['groups'],
+            periodicity=arrays['box'])
+
+    @property
+    def n_particles(self):
+        return len(self.particles)
+
+    @property
+    def n_bonds(self):
+        return len(self.bonds)
+
+    @property
+    def xyz(self):
+        return self.particles['xyz']
+
+    @property
+    def nbytes(self):
+        return self.particles.nbytes + self.bonds.nbytes
+
+    def group(self, name):
+        """
+        Particles of the group `name`, as a view
+        """
+        for group_name, start, stop in self.groups:
+            if group_name == name:
+                return self.particles[start:stop]
+        raise KeyError('No group named {}'.format(name))
+
+    def to_arrays(self):
+        """
+        Per-particle arrays in the layout of `particle_arrays`
+        """
+        return {
+            'xyz': self.particles['xyz'],
+            'names': self.particles['name'],
+            'charges': self.particles['charge'],
+            'residue_names': self.particles['residue_name'],
+            'residue_ids': self.particles['residue_id'],
+            'bonds': self.bonds,
+            'groups': self.groups,
+            'box': self.periodicity,
+        }
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a system saved as an npz or binary .drop file, see
+        `open_binary` to map a .drop file without loading it
+        """
+        if os.path.splitext(filename)[1].lower() == BINARY_EXTENSION:
+            return open_binary(filename).to_system()
+        with np.load(filename) as data:
+            return cls(data['particles'], bonds=data['bonds'],
+                       groups=[tuple(group) for group in
+                               json.loads(str(data['groups']))],
+                       periodicity=data['periodicity'],
+                       metadata=json.loads(str(data['metadata'])))
+
+    def save(self, filename, chunk_size=CHUNK_SIZE):
+        """
+        Saves the system to an .npz file that `load` reads back in full, to
+        a binary .drop file with float32 positions that `open_binary` maps
+        without loading, or to a .gro, .xyz or LAMMPS .lammps/.data file,
+        see `save_arrays`
+        """
+        extension = os.path.splitext(filename)[1].lower()
+        if extension == BINARY_EXTENSION:
+            write_binary(filename, self.to_arrays(), metadata=self.metadata,
+                         chunk_size=chunk_size)
+            return
+        if extension != '.npz':
+            save_arrays(self.to_arrays(), filename, chunk_size=chunk_size)
+            return
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp_filename, 'wb') as f:
+            self.savez(f)
+        os.replace(tmp_filename, filename)
+
+    def savez(self, f):
+        """
+        Writes the system as npz to an open binary file, see `load`
+        """
+        np.savez(f, particles=self.particles, bonds=self.bonds,
+                 groups=json.dumps(self.groups),
+                 periodicity=self.periodicity,
+                 metadata=json.dumps(self.metadata))
+
+    def to_compound(self, name=None, compound=None):
+        """
+        Builds the full `mbuild.Compound` hierarchy of the system.
+
+        Every group is a child of the returned compound and every residue a
+        child of its group. Residues of a single particle named like the
+        residue, such as graphene sites, are added as the particle itself.
+
+        Parameters
+        ----------
+        name : str, default = None
+            name of the returned compound
+        compound : mbuild.Compound, default = None
+            empty compound to build the system into instead of a new one
+
+        Returns
+        -------
+        compound : mbuild.Compound
+        """
+        import mbuild
+
+        if compound is None:
+            compound = mbuild.Compound(name=name)
+        particles = []
+        residue_ids = self.particles['residue_id']
+        for group_name, start, stop in self.groups:
+            group = mbuild.Compound(name=group_name)
+            boundaries = start + np.flatnonzero(
+                np.diff(residue_ids[start:stop])) + 1
+            residues = []
+            for first, last in zip(np.concatenate(([start], boundaries)),
+                                   np.concatenate((boundaries, [stop]))):
+                rows = self.particles[first:last]
+                # Copied, as mbuild would otherwise keep views of the rows
+                atoms = [mbuild.Compound(name=row['name'],
+                                         pos=row['xyz'].copy(),
+                                         charge=row['charge'])
+                         for row in rows]
+                particles.extend(atoms)
+                if len(atoms) == 1 and rows[0]['name'] == rows[0][
+                        'residue_name']:
+                    residues.append(atoms[0])
+                else:
+                    residue = mbuild.Compound(name=rows[0]['residue_name'])
+                    residue.add(atoms)
+                    residues.append(residue)
+            group.add(residues)
+            compound.add(group)
+
+        for a, b in self.bonds:
+            compound.add_bond((particles[a], particles[b]))
+        compound.periodicity = self.periodicity.copy()
+        return compound
+
+    def to_parmed(self):
+        """
+        Builds a `parmed.Structure` of the system directly from the arrays,
+        without an intermediate `mbuild.Compound`.
+
+        Elements are looked up from particle names as `mbuild` does.
+
+        Returns
+        -------
+        structure : parmed.Structure
+        """
+        import parmed as pmd
+        from parmed.periodic_table import AtomicNum, Mass
+
+        elements = element_symbols(self.particles['name'])
+        structure = pmd.Structure()
+        for row in self.particles:
+            element = elements[row['name']]
+            atom = pmd.Atom(atomic_number=AtomicNum[element],
+                            name=str(row['name']), mass=Mass[element],
+                            charge=float(row['charge']))
+            atom.xx, atom.xy, atom.xz = row['xyz'] * 10
+            structure.add_atom(atom, resname=str(row['residue_name']),
+                               resnum=int(row['residue_id']))
+        atoms = structure.atoms
+        for a, b in self.bonds:
+            structure.bonds.append(pmd.Bond(atoms[int(a)], atoms[int(b)]))
+        structure.box = np.concatenate((self.periodicity * 10, [90] * 3))
+        return structure
+
+    def to_openmm(self):
+        """
+        Builds an OpenMM topology and positions of the system directly from
+        the arrays, with one chain per group, e.g. 'LAT' and 'FLD'.
+
+        Returns
+        -------
+        topology : openmm.app.Topology
+        positions : openmm.unit.Quantity, shape=(n, 3)
+            positions in nm
+        """
+        try:
+            from openmm import Vec3, app, unit
+        except ImportError:
+            from simtk.openmm import Vec3, app, unit
+
+        elements = dict()
+        for name, symbol in element_symbols(self.particles['name']).items():
+            try:
+                elements[name] = app.Element.getBySymbol(symbol)
+            except KeyError:
+                elements[name] = None
+
+        topology = app.Topology()
+        names = self.particles['name'].tolist()
+        residue_ids = self.particles['residue_id'].tolist()
+        residue_names = self.particles['residue_name'].tolist()
+        atoms = []
+        for group_name, start, stop in self.groups:
+            chain = topology.addChain(id=group_name)
+            residue_id = None
+            for i in range(start, stop):
+                if residue_ids[i] != residue_id:
+                    residue_id = residue_ids[i]
+                    residue = topology.addResidue(
+                        residue_names[i], chain, id=str(residue_id))
+                atoms.append(topology.addAtom(
+                    names[i], elements[names[i]], residue))
+        for a, b in self.bonds.tolist():
+            topology.addBond(atoms[a], atoms[b])
+        topology.setUnitCellDimensions(
+            Vec3(*self.periodicity.tolist()) * unit.nanometer)
+        positions = unit.Quantity(self.xyz.copy(), unit.nanometer)
+        return topology, positions
+
+    def to_hoomd_snapshot(self):
+        """
+        Builds a HOOMD snapshot of the system directly from the arrays.
+
+        Uses `hoomd.Snapshot` from HOOMD-blue 3 or later if installed, or
+        else a `gsd.hoomd` frame, which HOOMD reads with
+        `Simulation.create_state_from_snapshot`. Lengths are in nm and
+        positions are shifted so that the box is centered on the origin.
+        Particle types are the sorted particle names and bond types the
+        sorted pairs of bonded names, joined by '-'.
+
+        Returns
+        -------
+        snapshot : hoomd.Snapshot or gsd.hoomd.Frame
+        """
+        from parmed.periodic_table import Mass
+
+        try:
+            import hoomd
+            snapshot = hoomd.Snapshot()
+            if snapshot.communicator.rank != 0:
+                # Only the root rank holds the data of a snapshot
+                return snapshot
+        except ImportError:
+            import gsd.hoomd
+            snapshot = getattr(gsd.hoomd, 'Frame', None) or \
+                gsd.hoomd.Snapshot
+            snapshot = snapshot()
+
+        def fill(data, name, values):
+            # hoomd allocates arrays once N is set, gsd leaves them None
+            if getattr(data, name, None) is None:
+                setattr(data, name, values)
+            else:
+                getattr(data, name)[:] = values
+
+        names = self.particles['name']
+        types, typeid = np.unique(names, return_inverse=True)
+        elements = element_symbols(types)
+        snapshot.configuration.box = self.periodicity.tolist() + [0, 0, 0]
+        snapshot.particles.N = self.n_particles
+        snapshot.particles.types = types.tolist()
+        fill(snapshot.particles, 'typeid', typeid)
+        fill(snapshot.particles, 'position', self.xyz - self.periodicity / 2)
+        fill(snapshot.particles, 'charge', self.particles['charge'])
+        fill(snapshot.particles, 'mass',
+             np.array([Mass[elements[name]] for name in types])[typeid])
+
+        if self.n_bonds:
+            bond_names = np.sort(names[self.bonds], axis=1)
+            bond_types, bond_typeid = np.unique(
+                np.char.add(np.char.add(bond_names[:, 0], '-'),
+                            bond_names[:, 1]), return_inverse=True)
+            snapshot.bonds.N = self.n_bonds
+            snapshot.bonds.types = bond_types.tolist()
+            fill(snapshot.bonds, 'typeid', bond_typeid)
+            fill(snapshot.bonds, 'group', self.bonds)
+        return snapshot
+
+    def to_lammpsdata(self):
+        """
+        Writes the system as a LAMMPS data file in memory, see
+        `write_lammpsdata`
+
+        Returns
+        -------
+        stream : io.StringIO
+            data file text, positioned at its start
+        """
+        stream = io.StringIO()
+        write_lammpsdata(stream, self.xyz, self.particles['name'],
+                         self.particles['residue_id'], self.periodicity,
+                         charges=self.particles['charge'], bonds=self.bonds)
+        stream.seek(0)
+        return stream
+
+
+def molecule_template(compound):
+    """
+    Particle names, charges, positions relative to the centre and bonds of
+    `compound`, for stamping copies of it into a `DropletSystem`
+    """
+    particles = list(compound.particles())
+    index = {particle: i for i, particle in enumerate(particles)}
+    xyz = compound.xyz
+    return {
+        'xyz': xyz - np.mean(xyz, axis=0),
+        'names': np.array([particle.name for particle in particles]),
+        'charges': np.array([particle.charge or 0.0
+                             for particle in particles]),
+        'bonds': np.array([(index[a], index[b]) for a, b in compound.bonds()],
+                          dtype=np.int64).reshape(-1, 2),
+    }
+
+
+def _stamp(template, xyz, residue_name, first_residue, first_particle):
+    """
+    Per-particle arrays of copies of `template` placed at `xyz`, shape
+    (k, n, 3), numbered from `first_residue` and `first_particle`
+    """
+    n_copies, n_particles = xyz.shape[:2]
+    offsets = first_particle + np.arange(n_copies) * n_particles
+    bonds = template['bonds'][np.newaxis] + offsets[:, np.newaxis, np.newaxis]
+    return {
+        'xyz': xyz.reshape(-1, 3),
+        'names': np.tile(template['names'], n_copies),
+        'charges': np.tile(template['charges'], n_copies),
+        'residue_ids': np.repeat(
+            np.arange(first_residue, first_residue + n_copies), n_particles),
+        'residue_names': np.full(n_copies * n_particles, residue_name),
+        'bonds': bonds.reshape(-1, 2),
+    }
+
+
+def droplet_layout(radius=2, angle=90.0, fluid=None, density=None,
+                   lattice=None, lattice_compound=None, x=None, y=None,
+                   n_layers=None, depth=1.5, fluid_library=FLUID_LIBRARY):
+    """
+    Lays out a droplet on a lattice as arrays, without generating the sheet.
+
+    The sheet is chosen as in `Droplet`, see `droplet_sheet`, and the
+    droplet is carved from a tiled fluid template, see `FluidLibrary`, and
+    placed 0.3 nm above the top of the sheet. Shared by
+    `build_droplet_system` and `build_large_droplet`.
+
+    Parameters
+    ----------
+    see `Droplet`
+
+    Returns
+    -------
+    layout : dict
+        'sheet' LatticeSheet, 'site' template of a lattice site, see
+        `molecule_template`, and its residue name 'site_name',
+        'surface_height', 'molecules' positions of the droplet,
+        shape=(k, n, 3), and 'box'
+    """
+    sheet = droplet_sheet(lattice, x, y, n_layers=n_layers, depth=depth)
+    if lattice is None:
+        site = {'xyz': np.zeros((1, 3)), 'names': np.array(['C']),
+                'charges': np.zeros(1), 'bonds': np.zeros((0, 2), dtype=int)}
+        site_name = 'C'
+    else:
+        site = molecule_template(lattice_compound)
+        site_name = lattice_compound.name
+
+    # Heights only depend on the fractional z of a site, so a single slice
+    # of x replicates gives the top of the whole sheet
+    _, first_slice = sheet.positions(0, 1)
+    surface_height = np.max(first_slice[:, 2]) + np.max(site['xyz'][:, 2])
+    periodicity = sheet.periodicity
+
+    template = fluid_library.get(fluid, density)
+    if compound_checksum(fluid) != template.checksum:
+        raise ValueError('Fluid template was packed from a different compound')
+    sphere_coords = [periodicity[0] / 2, periodicity[1] / 2, radius, radius]
+    molecules = template.carve(sphere_coords,
+                               cut=get_cut_height(radius, angle))
+    if len(molecules):
+        molecules[:, :, 2] += (surface_height + 0.3 -
+                               np.min(molecules[:, :, 2]))
+    return {
+        'sheet': sheet,
+        'site': site,
+        'site_name': site_name,
+        'surface_height': surface_height,
+        'molecules': molecules,
+        'box': np.array([periodicity[0], periodicity[1], radius * 5]),
+    }
+
+
+def build_droplet_system(radius=2, angle=90.0, fluid=None, density=None,
+                         lattice=None, lattice_compound=None, x=None, y=None,
+                         n_layers=None, depth=1.5,
+                         substrate_cache=SUBSTRATE_CACHE,
+                         fluid_library=FLUID_LIBRARY):
+    """
+    Builds a droplet on a lattice as a `DropletSystem`, without building an
+    `mbuild.Compound` per particle.
+
+    The sheet is generated as arrays, see `droplet_substrate`, and the
+    droplet is carved from a tiled fluid template, see `droplet_layout`, so
+    this matches `Droplet(fill_mode='template')`. Since no compounds are
+    built, the sheet is not limited to 100 nm.
+
+    Parameters
+    ----------
+    see `Droplet`
+
+    Returns
+    -------
+    system : DropletSystem
+    """
+    x, y = check_droplet_params(
+        radius=radius, fluid=fluid, density=density, lattice=lattice,
+        lattice_compound=lattice_compound, x=x, y=y, max_size=None)
+    if isinstance(fluid, (list, set)):
+        raise ValueError(
+            'Droplet systems only support a single fluid compound')
+
+    layout = droplet_layout(
+        radius=radius, angle=angle, fluid=fluid, density=density,
+        lattice=lattice, lattice_compound=lattice_compound, x=x, y=y,
+        n_layers=n_layers, depth=depth, fluid_library=fluid_library)
+    substrate = droplet_substrate(lattice, x, y, n_layers=n_layers,
+                                  depth=depth, cache=substrate_cache)
+
+    sheet = _stamp(layout['site'],
+                   substrate.xyz[:, np.newaxis] + layout['site']['xyz'],
+                   layout['site_name'], 1, 0)
+    droplet = _stamp(molecule_template(fluid), layout['molecules'],
+                     fluid.name, substrate.n_sites + 1, len(sheet['xyz']))
+
+    n_sheet = len(sheet['xyz'])
+    arrays = {key: np.concatenate((sheet[key], droplet[key]))
+              for key in sheet}
+    return DropletSystem.from_arrays(
+        arrays['xyz'], arrays['names'], arrays['residue_ids'],
+        arrays['residue_names'], charges=arrays['charges'],
+        bonds=arrays['bonds'],
+        groups=[('LAT', 0, n_sheet), ('FLD', n_sheet, len(arrays['xyz']))],
+        periodicity=layout['box'])
+
+
+def droplet_key(radius=2, angle=90.0, fluid=None, density=None, lattice=None,
+                lattice_compound=None, x=None, y=None, fill_mode='sphere',
+                seed=12345, fluid_library=None, **options):
+    """
+    Hash identifying the droplet a `Droplet` call builds.
+
+    Covers every argument that changes the result, the topology and
+    geometry of the fluid and lattice compounds, see `compound_checksum`,
+    and the versions of dropletbuilder and mbuild. Arguments are compared
+    as `Droplet` uses them, so passing a default explicitly, e.g. `x` or
+    `n_layers=3` for graphene, gives the same key as leaving it out.
+
+    Parameters
+    ----------
+    see `Droplet`
+    options : dict
+        other JSON serializable arguments that change the result, e.g.
+        `overlap`
+
+    Returns
+    -------
+    key : str
+    """
+    import mbuild
+    from dropletbuilder.dropletbuilder import Droplet
+
+    x, y = check_droplet_params(
+        radius=radius, fluid=fluid, density=density, lattice=lattice,
+        lattice_compound=lattice_compound, x=x, y=y, max_size=None,
+        geometry=options.get('geometry', 'sphere'))
+    if lattice is None:
+        # Graphene is 3 layers deep by default and ignores depth
+        if options.get('n_layers') == 3:
+            del options['n_layers']
+        options.pop('depth', None)
+    defaults = {name: parameter.default for name, parameter in
+                inspect.signature(Droplet.__init__).parameters.items()}
+    options = {name: value for name, value in options.items()
+               if not (name in defaults and (value == defaults[name]) is True)}
+
+    # Older mbuild releases only have `mbuild.version`
+    mbuild_version = getattr(mbuild, '__version__', None) or mbuild.version
+    fluids = fluid if isinstance(fluid, (list, set)) else [fluid]
+    densities = density if isinstance(density, (list, tuple)) else [density]
+    payload = {
+        'radius': float(radius),
+        'angle': float(angle),
+        'fluid': [compound_checksum(f) for f in fluids],
+        'density': [float(d) for d in densities],
+        'x': float(x),
+        'y': float(y),
+        'fill_mode': fill_mode,
+        'seed': seed,
+        'options': options,
+        'version': [__version__, mbuild_version, DROPLET_CACHE_FORMAT],
+    }
+    if lattice is not None:
+        payload['lattice'] = lattice_payload(
+            lattice.lattice_spacing, lattice.angles, lattice.lattice_vectors,
+            lattice.lattice_points)
+        payload['lattice']['lattice_compound'] = compound_checksum(
+            lattice_compound)
+    if fill_mode == 'template' and fluid_library is not None:
+        payload['template'] = [fluid_library.box_length, fluid_library.seed]
+    return hashlib.sha1(
+        json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+class DropletCache(TieredCache):
+    """
+    Content-addressed cache of built droplets, keyed by `droplet_key`.
+
+    Keeps the most recently used droplets in memory as `DropletSystem`s
+    and, if `cache_dir` is given, also stores every droplet as an npz file
+    so that later processes return it instead of packing it again.
+
+    Parameters
+    ----------
+    maxsize : int, default = 8
+        number of droplets kept in memory
+    cache_dir : str, default = None
+        directory for the on-disk tier, disabled if None
+    """
+
+    prefix = 'droplet'
+
+    def _load(self, filename):
+        return DropletSystem.load(filename)
+
+    def _dump(self, system, f):
+        system.savez(f)
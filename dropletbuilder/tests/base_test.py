@@ -0,0 +1,58 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.utils.io_tools import get_fn
+
+
+class BaseTest:
+    @pytest.fixture(autouse=True)
+    def initdir(self, tmpdir):
+        tmpdir.chdir()
+
+    @pytest.fixture
+    def GoldLattice(self):
+        lattice_compound = mbuild.Compound(name='Au')
+        lattice_spacing = [0.40788, 0.40788, 0.40788]
+        lattice_vector = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
+        gold_locations = [[0., 0., 0.], [.5, .5, 0.], [.5, 0., .5], [0, .5, .5]]
+        basis = {lattice_compound.name: gold_locations}
+        gold_lattice = mbuild.Lattice(
+            lattice_spacing=lattice_spacing,
+            lattice_vectors=lattice_vector,
+            lattice_points=basis)
+        return gold_lattice
+
+    @pytest.fixture
+    def Droplet(self):
+        from dropletbuilder.dropletbuilder import Droplet
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        return Droplet(radius=1, angle=90.0, fluid=water, density=997)
+
+    @pytest.fixture
+    def DropletWithDims(self):
+        from dropletbuilder.dropletbuilder import Droplet
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        return Droplet(radius=1, angle=90.0, fluid=water, density=997, x=4, y=4)
+
+    @pytest.fixture
+    def Water(self):
+        return mbuild.load(get_fn('tip3p.mol2'))
+
+    @pytest.fixture
+    def WaterTemplate(self, Water):
+        from dropletbuilder.fluid import FluidTemplate, compound_checksum
+        # 10 x 10 x 10 waters on a 0.3 nm grid in a 3 nm cube
+        water_xyz = Water.xyz - Water.center
+        grid = np.stack(np.meshgrid(*[np.arange(10) * 0.3 + 0.15] * 3,
+                                    indexing='ij'), axis=-1).reshape(-1, 3)
+        xyz = (grid[:, np.newaxis] + water_xyz).reshape(-1, 3)
+        return FluidTemplate(xyz, Water.n_particles, 3.0, 997,
+                             compound_checksum(Water))
+
+    @pytest.fixture
+    def WaterLibrary(self, tmpdir, Water, WaterTemplate):
+        from dropletbuilder.fluid import FluidLibrary
+        library = FluidLibrary(template_dir=str(tmpdir.mkdir('templates')))
+        WaterTemplate.save(library._path(Water, 997))
+        return library
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+import mbuild
+
+from dropletbuilder.utils.io_tools import get_fn
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for batch droplet builds.
+"""
+
+class TestBatch(BaseTest):
+    def test_expand_grid_dict(self):
+        from dropletbuilder.batch import expand_grid
+        tasks = expand_grid({'radius': [1, 2], 'angle': [30, 90, 150]})
+        assert len(tasks) == 6
+        assert {'radius': 2, 'angle': 30} in tasks
+
+    def test_expand_grid_list(self):
+        from dropletbuilder.batch import expand_grid
+        grid = [{'radius': 1}, {'radius': 2, 'angle': 60}]
+        assert expand_grid(grid) == grid
+
+    def test_task_seed(self, Water):
+        from dropletbuilder.batch import expand_grid, task_seed
+        seeds = [task_seed(params) for params in
+                 expand_grid({'radius': [1, 2], 'fluid': [Water]})]
+        reordered = [task_seed(params) for params in
+                     expand_grid([{'radius': 3, 'fluid': Water},
+                                  {'radius': 2, 'fluid': mbuild.clone(Water)},
+                                  {'radius': 1, 'fluid': Water}])]
+        assert reordered[1:] == seeds[::-1]
+        assert len(set(reordered)) == 3
+        assert task_seed({'radius': 1}, seed=1) != task_seed({'radius': 1})
+        assert task_seed({'radius': 1, 'seed': 7}) == 7
+
+    def test_task_seed_across_processes(self, GoldLattice):
+        import subprocess
+        import sys
+        from dropletbuilder.batch import task_seed
+        code = (
+            'import mbuild\n'
+            'from dropletbuilder.batch import task_seed\n'
+            'lattice = mbuild.Lattice(\n'
+            '    lattice_spacing=[0.40788, 0.40788, 0.40788],\n'
+            '    lattice_vectors=[[1, 0, 0], [0, 1, 0], [0, 0, 1]],\n'
+            '    lattice_points={"Au": [[0., 0., 0.], [.5, .5, 0.],\n'
+            '                           [.5, 0., .5], [0, .5, .5]]})\n'
+            'print(task_seed({"lattice": lattice, "radius": 1}))\n')
+        seeds = {int(subprocess.check_output([sys.executable, '-c', code]))
+                 for _ in range(2)}
+        assert seeds == {task_seed({'lattice': GoldLattice, 'radius': 1})}
+        with pytest.raises(TypeError, match='object'):
+            task_seed({'radius': object()})
+
+    def test_seed_in_grid(self):
+        from dropletbuilder.batch import build_droplets
+        summary = build_droplets({'radius': [1], 'seed': [1, 2]}, n_workers=1,
+                                 density=997)
+        assert [row['seed'] for row in summary] == [1, 2]
+        for row in summary:
+            assert 'Fluid droplet compounds' in row['error']
+
+    def test_save_atomic_streams(self, Water, WaterLibrary):
+        from dropletbuilder.batch import save_atomic
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.utils.writers import save_droplet
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary)
+        save_atomic(droplet, 'droplet.gro', combine='all')
+        save_droplet(droplet, 'streamed.gro')
+        with open('droplet.gro') as f, open('streamed.gro') as streamed:
+            assert f.read() == streamed.read()
+        assert not [name for name in os.listdir('.') if name.startswith('.')]
+
+    def test_resume_skips_existing(self):
+        from dropletbuilder.batch import build_droplets
+        open('droplet_0.gro', 'w').close()
+        open('droplet_1.gro', 'w').close()
+        summary = build_droplets({'radius': [1, 2]}, n_workers=1)
+        assert [row['status'] for row in summary] == ['skipped', 'skipped']
+
+    def test_failed_build_recorded(self):
+        from dropletbuilder.batch import build_droplets
+        summary = build_droplets({'radius': [1]}, n_workers=1, density=997)
+        assert summary[0]['status'] == 'failed'
+        assert 'Fluid droplet compounds' in summary[0]['error']
+        assert not os.path.exists('droplet_0.gro')
+
+    def test_failed_build_recorded_in_pool(self):
+        from dropletbuilder.batch import build_droplets
+        summary = build_droplets({'radius': [1, 2]}, n_workers=2, density=997)
+        assert [row['status'] for row in summary] == ['failed', 'failed']
+
+    def test_format_summary(self):
+        from dropletbuilder.batch import build_droplets, format_summary
+        open('droplet_0.gro', 'w').close()
+        table = format_summary(build_droplets({'radius': [1]}, n_workers=1))
+        assert 'skipped' in table
+        assert 'droplet_0.gro' in table
+
+    def test_build_droplets(self):
+        from dropletbuilder.batch import build_droplets
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        summary = build_droplets(
+            {'angle': [60, 120]}, filename='droplet_{angle}.gro', n_workers=2,
+            radius=1, fluid=water, density=997)
+        for row in summary:
+            assert row['status'] == 'built'
+            assert row['n_particles'] > 0
+            assert os.path.exists(row['filename'])
@@ -0,0 +1,133 @@
+import json
+
+import pytest
+import numpy as np
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for the memory-mapped binary format.
+"""
+
+class TestBinary(BaseTest):
+    @pytest.fixture
+    def System(self, Water, WaterLibrary):
+        from dropletbuilder.system import build_droplet_system
+        system = build_droplet_system(radius=1, fluid=Water, density=997,
+                                      fluid_library=WaterLibrary)
+        system.particles['charge'][::3] = -0.834
+        system.metadata['surface_height'] = 0.67
+        return system
+
+    def test_roundtrip(self, System):
+        from dropletbuilder.system import DropletSystem
+        System.save('system.drop', chunk_size=7)
+        loaded = DropletSystem.load('system.drop')
+        assert np.allclose(loaded.xyz, System.xyz, atol=1e-6)
+        for field in ('name', 'residue_id', 'residue_name'):
+            assert np.array_equal(loaded.particles[field],
+                                  System.particles[field])
+        assert np.allclose(loaded.particles['charge'],
+                           System.particles['charge'])
+        assert np.array_equal(loaded.bonds, System.bonds)
+        assert loaded.groups == System.groups
+        assert np.allclose(loaded.periodicity, System.periodicity)
+        assert loaded.metadata == {'surface_height': 0.67}
+
+    def test_non_finite_metadata(self, System):
+        import json
+        from dropletbuilder.utils.binary import BINARY_MAGIC, open_binary
+        System.metadata.update(min_substrate_distance=np.inf,
+                               composition=[np.float32(np.nan), 3])
+        System.save('system.drop')
+        assert open_binary('system.drop').metadata == {
+            'surface_height': 0.67, 'min_substrate_distance': None,
+            'composition': [None, 3]}
+
+        def reject(constant):
+            raise ValueError(constant)
+
+        with open('system.drop', 'rb') as f:
+            f.seek(len(BINARY_MAGIC))
+            size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            json.loads(f.read(size).decode(), parse_constant=reject)
+
+    def test_open_binary(self, System):
+        from dropletbuilder.utils.binary import open_binary
+        System.save('system.drop')
+        mapped = open_binary('system.drop')
+        assert mapped.n_particles == System.n_particles
+        assert mapped.n_bonds == System.n_bonds
+        assert mapped.xyz.dtype == np.float32
+        fluid = mapped.group('FLD')
+        assert isinstance(fluid['xyz'], np.memmap)
+        assert np.allclose(fluid['xyz'], System.group('FLD')['xyz'],
+                           atol=1e-6)
+        assert set(fluid['names']) == {b'O', b'H'}
+        assert set(mapped.group('LAT')['residue_names']) == {b'C'}
+        with pytest.raises(KeyError):
+            mapped.group('SOL')
+
+    def test_plain_memmap(self, System):
+        # Readers only need numpy and the JSON header
+        System.save('system.drop')
+        with open('system.drop', 'rb') as f:
+            assert f.read(8) == b'DROPLET\x00'
+            size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            header = json.loads(f.read(size).decode())
+        column = header['columns']['xyz']
+        xyz = np.memmap('system.drop', dtype=column['dtype'], mode='r',
+                        offset=16 + size + column['offset'],
+                        shape=tuple(column['shape']))
+        assert np.allclose(xyz, System.xyz, atol=1e-6)
+        assert header['groups'] == [list(group) for group in System.groups]
+
+    def test_save_droplet(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.utils.binary import open_binary
+        from dropletbuilder.utils.writers import save_droplet
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary)
+        save_droplet(droplet, 'droplet.drop')
+        mapped = open_binary('droplet.drop')
+        assert np.allclose(mapped.xyz, droplet.xyz, atol=1e-6)
+        assert mapped.n_bonds == droplet.n_bonds
+
+    def test_writer_checks(self):
+        from dropletbuilder.utils.binary import BinaryWriter
+        with pytest.raises(ValueError, match='declared to hold 2'):
+            with BinaryWriter('short.drop', 2, [1, 1, 1]) as writer:
+                writer.write(np.zeros((1, 3)), ['C'], ['C'], [1])
+        with pytest.raises(ValueError, match='longer than 2'):
+            with BinaryWriter('long.drop', 1, [1, 1, 1],
+                              name_width=2) as writer:
+                writer.write(np.zeros((1, 3)), ['CA1'], ['C'], [1])
+
+    def test_not_binary(self):
+        from dropletbuilder.utils.binary import open_binary
+        with open('system.drop', 'w') as f:
+            f.write('Droplet\n0\n')
+        with pytest.raises(ValueError, match='not a binary droplet file'):
+            open_binary('system.drop')
+
+    def test_large_droplet(self, Water, WaterLibrary):
+        from dropletbuilder.large import build_large_droplet
+        from dropletbuilder.utils.binary import open_binary
+        build_large_droplet('droplet.gro', radius=1, fluid=Water,
+                            density=997, fluid_library=WaterLibrary)
+        stats = build_large_droplet(
+            'droplet.drop', radius=1, fluid=Water, density=997,
+            fluid_library=WaterLibrary)
+        mapped = open_binary('droplet.drop')
+        assert mapped.n_particles == stats['n_particles']
+        assert len(mapped.group('LAT')['xyz']) == stats['n_substrate']
+        assert len(mapped.group('FLD')['xyz']) == stats['n_fluid']
+        assert np.isclose(mapped.metadata['surface_height'],
+                          stats['surface_height'])
+        with open('droplet.gro') as f:
+            lines = f.read().splitlines()[2:-1]
+        gro_xyz = np.array([[float(line[20 + 8 * i:28 + 8 * i])
+                             for i in range(3)] for line in lines])
+        assert np.allclose(mapped.xyz, gro_xyz, atol=1e-3)
+        assert list(mapped.residue_ids[:3]) == [1, 2, 3]
@@ -0,0 +1,143 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.utils.io_tools import get_fn
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for spherical cap selection.
+"""
+
+class TestCap(BaseTest):
+    def test_molecule_min_z(self):
+        from dropletbuilder.cap import molecule_min_z
+        xyz = np.array([[0, 0, 1.0], [0, 0, 0.5], [0, 0, 2.0],
+                        [0, 0, 3.0], [0, 0, 2.5], [0, 0, 4.0]])
+        min_z = molecule_min_z(xyz, [2, 1, 3])
+        assert np.allclose(min_z, [0.5, 2.0, 2.5])
+
+    def test_molecule_min_z_empty(self):
+        from dropletbuilder.cap import molecule_min_z
+        assert len(molecule_min_z(np.zeros((0, 3)), [])) == 0
+
+    def test_select_cap(self):
+        from dropletbuilder.cap import select_cap
+        xyz = np.array([[0, 0, 1.0], [0, 0, 0.5], [0, 0, 2.0],
+                        [0, 0, 3.0], [0, 0, 2.5], [0, 0, 4.0]])
+        keep = select_cap(xyz, [2, 1, 3], 1.0)
+        assert np.array_equal(keep, [False, True, True])
+
+    def test_cut_height(self):
+        from dropletbuilder.geometry import get_contact_radius, get_cut_height
+        angles = np.linspace(0, 180, 19)
+        cuts = np.array([get_cut_height(2, angle) for angle in angles])
+        # Larger contact angles keep taller caps
+        assert np.all(np.diff(cuts) < 0)
+        assert np.allclose(cuts[[0, 9, 18]], [4, 2, 0])
+        radii = [get_contact_radius(2, cut) for cut in cuts]
+        assert np.allclose(radii, 2 * np.sin(np.deg2rad(angles)))
+
+    def test_trim_cap(self):
+        from dropletbuilder.cap import trim_cap
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        filled = mbuild.Compound(name='FLD')
+        for z in [0.5, 1.0, 1.5, 2.0]:
+            molecule = mbuild.clone(water)
+            molecule.translate_to([0, 0, z])
+            filled.add(molecule)
+        trimmed, n_kept, n_dropped = trim_cap(filled, 1.2)
+        assert (n_kept, n_dropped) == (2, 2)
+        assert len(trimmed.children) == 2
+        assert trimmed.n_particles == 2 * water.n_particles
+        assert trimmed.n_bonds == 2 * water.n_bonds
+        assert np.min(trimmed.xyz, axis=0)[2] >= 1.2
+
+    def test_keep_molecules_in_place(self):
+        from dropletbuilder.cap import keep_molecules
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        filled = mbuild.Compound(name='FLD')
+        for z in [0.5, 1.0, 1.5, 2.0]:
+            molecule = mbuild.clone(water)
+            molecule.translate_to([0, 0, z])
+            filled.add(molecule)
+        molecules = list(filled.children)
+        trimmed, n_kept, n_dropped = keep_molecules(
+            filled, np.array([False, True, False, True]))
+        assert trimmed is filled
+        assert (n_kept, n_dropped) == (2, 2)
+        # The kept molecules are the original objects, not clones
+        assert list(trimmed.children) == molecules[1::2]
+        assert trimmed.n_bonds == 2 * water.n_bonds
+        assert all(molecule.parent is None for molecule in molecules[::2])
+        assert trimmed.labels['Compound'] == molecules[1::2]
+        assert trimmed.labels['Compound[1]'] is molecules[3]
+        assert 'Compound[2]' not in trimmed.labels
+        # Numbered labels do not clash with later additions
+        trimmed.add(mbuild.clone(water))
+        assert trimmed.n_bonds == 3 * water.n_bonds
+
+    def test_gather_scatter_xyz(self, Water):
+        from dropletbuilder.cap import gather_xyz, scatter_xyz
+        lattice = mbuild.Compound(name='LAT')
+        lattice.add([mbuild.Compound(name='C', pos=[0.1 * i, 0.2, 0.3])
+                     for i in range(4)])
+        fluid = mbuild.Compound(name='FLD')
+        fluid.add([mbuild.clone(Water) for _ in range(2)])
+        xyz = gather_xyz([lattice, fluid])
+        assert np.allclose(xyz, np.concatenate([lattice.xyz, fluid.xyz]))
+        assert np.array_equal(gather_xyz([lattice, fluid], n_particles=10),
+                              xyz)
+        with pytest.raises(ValueError, match='do not hold 9 particles'):
+            gather_xyz([lattice, fluid], n_particles=9)
+
+        fluid_xyz = xyz[4:]
+        fluid_xyz[:, 2] += 1.0
+        scatter_xyz([fluid], fluid_xyz)
+        assert np.allclose(fluid.xyz, fluid_xyz)
+        assert np.allclose(lattice.xyz[:, 2], 0.3)
+        # Particles hold views of the buffer rather than copies
+        assert all(np.shares_memory(particle.pos, xyz)
+                   for particle in fluid.particles())
+
+    def test_n_molecules_reported(self, Droplet):
+        assert Droplet.n_molecules_kept > 0
+        assert Droplet.n_molecules_dropped > 0
+        for child in Droplet.children:
+            if child.name == 'FLD':
+                assert len(child.children) == Droplet.n_molecules_kept
+
+    def test_cap_volume(self):
+        from dropletbuilder.cap import get_cap_volume
+        sphere = 4 / 3 * np.pi * 2 ** 3
+        assert np.isclose(get_cap_volume(2, 0, 2), sphere)
+        assert np.isclose(get_cap_volume(2, -1, 2), sphere)
+        assert np.isclose(get_cap_volume(2, 2, 2), sphere / 2)
+        assert np.isclose(get_cap_volume(2, 5, 2), 0)
+
+    def test_segment_area(self):
+        from dropletbuilder.cap import get_segment_area
+        circle = np.pi * 2 ** 2
+        assert np.isclose(get_segment_area(2, 0, 2), circle)
+        assert np.isclose(get_segment_area(2, -1, 2), circle)
+        assert np.isclose(get_segment_area(2, 2, 2), circle / 2)
+        assert np.isclose(get_segment_area(2, 5, 2), 0)
+        assert np.isclose(get_segment_area(2, 1, 2) + get_segment_area(
+            2, 3, 2), circle)
+
+    def test_fill_cap_above_cut(self):
+        from dropletbuilder.cap import fill_cap
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        filled = fill_cap(water, [2, 2, 2, 1.5], cut=2.0, density=997)
+        assert len(filled.children) > 0
+        assert np.min(filled.xyz, axis=0)[2] > 2.0 - 0.01
+
+    def test_droplet_cap_fill_mode(self):
+        from dropletbuilder.dropletbuilder import Droplet
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        droplet = Droplet(radius=1, angle=90.0, fluid=water, density=997,
+                          fill_mode='cap')
+        for child in droplet.children:
+            if child.name == 'FLD':
+                assert child.n_particles > 20 and child.n_particles < 150
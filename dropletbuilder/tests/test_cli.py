@@ -0,0 +1,94 @@
+import json
+import os
+
+import pytest
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for the dropletbuilder command line entry point.
+"""
+
+class TestCli(BaseTest):
+    def write_spec(self, spec, filename='spec.json'):
+        with open(filename, 'w') as f:
+            json.dump(spec, f)
+        return filename
+
+    def test_load_spec_defaults(self):
+        from dropletbuilder.cli import load_spec
+        spec = self.write_spec({
+            'defaults': {'fluid': 'tip3p.mol2', 'density': 997, 'radius': 2},
+            'systems': [{'angle': 60, 'output': 'a.gro'},
+                        {'radius': 1, 'output': ['b.gro', 'b.mol2']}]})
+        systems = load_spec(spec)
+        assert systems[0] == {'fluid': 'tip3p.mol2', 'density': 997,
+                              'radius': 2, 'angle': 60, 'output': ['a.gro']}
+        assert systems[1]['radius'] == 1
+        assert systems[1]['output'] == ['b.gro', 'b.mol2']
+
+    def test_load_spec_yaml(self):
+        pytest.importorskip('yaml')
+        from dropletbuilder.cli import load_spec
+        with open('spec.yaml', 'w') as f:
+            f.write('systems:\n'
+                    '  - {fluid: tip3p.mol2, density: 997, output: a.gro}\n')
+        assert load_spec('spec.yaml')[0]['output'] == ['a.gro']
+
+    def test_load_spec_no_output(self):
+        from dropletbuilder.cli import load_spec
+        spec = self.write_spec({'systems': [{'fluid': 'tip3p.mol2'}]})
+        with pytest.raises(ValueError, match='no output'):
+            load_spec(spec)
+
+    def test_system_kwargs(self, GoldLattice):
+        from dropletbuilder.cli import system_kwargs
+        system = {
+            'fluid': 'tip3p.mol2', 'fluid_name': 'H2O', 'density': 997,
+            'angle': 60, 'output': ['a.gro'],
+            'lattice': {'lattice_spacing': [0.40788] * 3,
+                        'lattice_points': GoldLattice.lattice_points}}
+        kwargs = system_kwargs(system)
+        assert kwargs['fluid'].name == 'H2O'
+        assert kwargs['lattice_compound'].name == 'Au'
+        assert kwargs['angle'] == 60
+        assert 'output' not in kwargs
+        # Fluids are loaded once per process
+        assert system_kwargs(system)['fluid'] is kwargs['fluid']
+
+    def test_main(self, capsys, WaterLibrary):
+        from dropletbuilder.cli import main
+        spec = self.write_spec({
+            'defaults': {'fluid': 'tip3p.mol2', 'density': 997, 'radius': 1,
+                         'fill_mode': 'template',
+                         'template_dir': WaterLibrary.template_dir},
+            'systems': [{'angle': 60, 'output': 'a.gro'},
+                        {'angle': 120, 'output': ['b.gro', 'b.xyz']}]})
+        assert main([spec]) == 0
+        for filename in ('a.gro', 'b.gro', 'b.xyz'):
+            assert os.path.exists(filename)
+        # Written by the streaming writers, which title xyz files 'Droplet'
+        with open('b.xyz') as f:
+            assert f.read().splitlines()[1] == 'Droplet'
+        out = capsys.readouterr().out
+        assert 'a.gro built' in out
+        assert 'Total' in out
+
+        # Existing outputs are skipped unless forced
+        assert main([spec]) == 0
+        assert capsys.readouterr().out.count('skipped') == 2
+
+    def test_main_failed(self, capsys):
+        from dropletbuilder.cli import main
+        spec = self.write_spec({'systems': [
+            {'fluid': 'tip3p.mol2', 'output': 'a.gro'}]})
+        assert main([spec]) == 1
+        assert 'Fluid density must be specified' in capsys.readouterr().out
+        assert not os.path.exists('a.gro')
+
+    def test_main_bad_spec(self, capsys):
+        from dropletbuilder.cli import main
+        spec = self.write_spec({'systems': []})
+        assert main([spec]) == 2
+        assert 'lists no systems' in capsys.readouterr().err
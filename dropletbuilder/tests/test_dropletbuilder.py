@@ -4,37 +4,7 @@ import numpy as np
 import mbuild
 
 from dropletbuilder.utils.io_tools import get_fn
-
-
-class BaseTest:
-    @pytest.fixture(autouse=True)
-    def initdir(self, tmpdir):
-        tmpdir.chdir()
-
-    @pytest.fixture
-    def GoldLattice(self):
-        lattice_compound = mbuild.Compound(name='Au')
-        lattice_spacing = [0.40788, 0.40788, 0.40788]
-        lattice_vector = [[1, 0, 0], [0, 1, 0], [0, 0, 1]]
-        gold_locations = [[0., 0., 0.], [.5, .5, 0.], [.5, 0., .5], [0, .5, .5]]
-        basis = {lattice_compound.name: gold_locations}
-        gold_lattice = mbuild.Lattice(
-            lattice_spacing=lattice_spacing,
-            lattice_vectors=lattice_vector,
-            lattice_points=basis)
-        return gold_lattice
-
-    @pytest.fixture
-    def Droplet(self):
-        from dropletbuilder.dropletbuilder import Droplet
-        water = mbuild.load(get_fn('tip3p.mol2'))
-        return Droplet(radius=1, angle=90.0, fluid=water, density=997)
-
-    @pytest.fixture
-    def DropletWithDims(self):
-        from dropletbuilder.dropletbuilder import Droplet
-        water = mbuild.load(get_fn('tip3p.mol2'))
-        return Droplet(radius=1, angle=90.0, fluid=water, density=997, x=4, y=4)
+from dropletbuilder.tests.base_test import BaseTest
 
 
 """
@@ -57,6 +27,12 @@ class TestDropletBuilder(BaseTest):
         with pytest.raises(ValueError, match="Fluid density"):
             Droplet(radius=1, angle=90.0, fluid=water)
 
+    def test_init_with_bad_fill_mode(self):
+        from dropletbuilder.dropletbuilder import Droplet
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        with pytest.raises(ValueError, match="fill_mode"):
+            Droplet(radius=1, angle=90.0, fluid=water, density=997, fill_mode='box')
+
     def test_init_without_lattice_with_lattice_compound(self):
         lattice_compound = mbuild.Compound(name='Au')
         from dropletbuilder.dropletbuilder import Droplet
@@ -82,6 +58,34 @@ class TestDropletBuilder(BaseTest):
         with pytest.raises(ValueError, match="y .* at least"):
             Droplet(radius=1, angle=90.0, fluid=water, density=997, x=4, y=1)
     
+    def test_init_with_bad_geometry(self):
+        from dropletbuilder.dropletbuilder import Droplet
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        with pytest.raises(ValueError, match="geometry"):
+            Droplet(radius=1, fluid=water, density=997, geometry='cube')
+
+    def test_cylinder(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        sphere = Droplet(radius=2, angle=90.0, fluid=Water, density=997,
+                         fill_mode='template', fluid_library=WaterLibrary)
+        cylinder = Droplet(radius=2, angle=90.0, fluid=Water, density=997,
+                           fill_mode='template', fluid_library=WaterLibrary,
+                           geometry='cylinder')
+        # A thin slab along y with a sheet of about radius in y
+        assert cylinder.periodicity[1] < 0.35 * sphere.periodicity[1]
+        assert cylinder.n_particles < 0.5 * sphere.n_particles
+        fluid = [child for child in cylinder.children
+                 if child.name == 'FLD'][0]
+        xyz = fluid.xyz
+        assert np.all(xyz[:, 1] >= 0)
+        assert np.all(xyz[:, 1] <= cylinder.periodicity[1])
+        # Every molecule lies in the half cylinder about the sheet's x
+        # centre, cut through its axis at 90 degrees
+        center_z = np.min(xyz[:, 2])
+        dist = np.linalg.norm(
+            xyz[:, [0, 2]] - [cylinder.periodicity[0] / 2, center_z], axis=1)
+        assert np.all(dist <= 2.0)
+
     def test_init_with_too_large_x(self):
         from dropletbuilder.dropletbuilder import Droplet
         water = mbuild.load(get_fn('tip3p.mol2'))
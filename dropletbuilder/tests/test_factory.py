@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for building droplets at many contact angles.
+"""
+
+class TestFactory(BaseTest):
+    @pytest.fixture
+    def Factory(self, Water, WaterLibrary):
+        from dropletbuilder.factory import DropletFactory
+        return DropletFactory(radius=1, fluid=Water, density=997,
+                              fill_mode='template', fluid_library=WaterLibrary)
+
+    @pytest.mark.parametrize('angle', [60, 90, 150])
+    def test_matches_droplet(self, Factory, Water, WaterLibrary, angle):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1, angle=angle, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary)
+        built = Factory.at_angle(angle)
+        assert built.n_molecules_kept == droplet.n_molecules_kept
+        assert built.n_particles == droplet.n_particles
+        assert built.n_bonds == droplet.n_bonds
+        assert np.allclose(built.xyz, droplet.xyz)
+        assert np.allclose(built.periodicity, droplet.periodicity)
+        assert built.surface_height == pytest.approx(droplet.surface_height)
+        assert [child.name for child in built.children] == ['LAT', 'FLD']
+
+    def test_select(self, Factory):
+        from dropletbuilder.geometry import get_cut_height
+        previous = np.zeros(0, dtype=int)
+        angles = sorted((10, 60, 90, 120, 170, 180),
+                        key=lambda angle: -get_cut_height(1, angle))
+        for angle in angles:
+            kept = Factory.select(angle)
+            # Lower cuts keep a superset of the molecules
+            assert np.all(np.diff(kept) > 0)
+            assert set(previous) <= set(kept)
+            previous = kept
+        assert len(previous) == Factory.n_molecules
+
+    def test_droplets_independent(self, Factory):
+        first = Factory.at_angle(180)
+        second = Factory.at_angle(180)
+        first.translate([1, 0, 0])
+        assert not np.allclose(first.xyz, second.xyz)
+
+    def test_mixture(self, Water):
+        from dropletbuilder.factory import DropletFactory
+        with pytest.raises(ValueError, match='single fluid'):
+            DropletFactory(radius=1, fluid=[Water, Water],
+                           density=[500, 497])
@@ -0,0 +1,135 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.utils.io_tools import get_fn
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for fluid templates.
+"""
+
+class TestFluid(BaseTest):
+    @pytest.fixture
+    def GridTemplate(self, Water):
+        from dropletbuilder.fluid import FluidTemplate, compound_checksum
+        # 10 x 10 x 10 waters on a 0.3 nm grid in a 3 nm cube
+        water_xyz = Water.xyz - Water.center
+        grid = np.stack(np.meshgrid(*[np.arange(10) * 0.3 + 0.15] * 3,
+                                    indexing='ij'), axis=-1).reshape(-1, 3)
+        xyz = (grid[:, np.newaxis] + water_xyz).reshape(-1, 3)
+        return FluidTemplate(xyz, Water.n_particles, 3.0, 997,
+                             compound_checksum(Water))
+
+    def test_checksum(self, Water):
+        from dropletbuilder.fluid import compound_checksum
+        moved = mbuild.clone(Water)
+        moved.translate([1, 2, 3])
+        assert compound_checksum(moved) == compound_checksum(Water)
+        renamed = mbuild.clone(Water)
+        renamed.name = 'H2O'
+        assert compound_checksum(renamed) != compound_checksum(Water)
+
+    def test_carve_inside_sphere(self, GridTemplate):
+        sphere = [5, 5, 2, 2]
+        molecules = GridTemplate.carve(sphere, edge=0.2)
+        assert len(molecules) > 0
+        dist = np.linalg.norm(molecules - sphere[:3], axis=-1)
+        assert np.all(dist <= 1.8)
+
+    def test_carve_above_cut(self, GridTemplate):
+        full = GridTemplate.carve([5, 5, 2, 2])
+        cap = GridTemplate.carve([5, 5, 2, 2], cut=2)
+        assert np.all(cap[:, :, 2] >= 2)
+        assert 0.3 * len(full) < len(cap) < 0.7 * len(full)
+
+    def test_carve_cylinder(self, GridTemplate):
+        molecules = GridTemplate.carve([5, 5, 2, 2], cut=2,
+                                       cylinder_length=2.5)
+        assert len(molecules) > 0
+        dist = np.linalg.norm(molecules[:, :, [0, 2]] - [5, 2], axis=-1)
+        assert np.all(dist <= 1.8)
+        assert np.all(molecules[:, :, 2] >= 2)
+        assert np.all(molecules[:, :, 1] >= 0)
+        assert np.all(molecules[:, :, 1] <= 2.3)
+        # Half a cylinder of 1.8 nm radius and 2.3 nm length, minus the
+        # molecules crossing its surface
+        n_full = 33.4 * np.pi * 1.8 ** 2 / 2 * 2.3
+        assert 0.5 * n_full < len(molecules) < n_full
+
+    def test_carve_tiles_beyond_template(self, GridTemplate):
+        small = GridTemplate.carve([2, 2, 2, 1])
+        large = GridTemplate.carve([6, 6, 6, 4])
+        ratio = len(large) / len(small)
+        assert 80 < ratio < 160
+
+    def test_fill(self, Water, GridTemplate):
+        filled = GridTemplate.fill(Water, [5, 5, 2, 2], cut=2)
+        n_molecules = len(GridTemplate.carve([5, 5, 2, 2], cut=2))
+        assert len(filled.children) == n_molecules
+        assert filled.n_bonds == n_molecules * Water.n_bonds
+
+    def test_fill_with_other_compound(self, GridTemplate):
+        other = mbuild.load(get_fn('tip3p.mol2'))
+        other.name = 'H2O'
+        with pytest.raises(ValueError, match="different compound"):
+            GridTemplate.fill(other, [5, 5, 2, 2])
+
+    def test_save_load(self, GridTemplate):
+        from dropletbuilder.fluid import FluidTemplate
+        GridTemplate.save('template.npz')
+        loaded = FluidTemplate.load('template.npz')
+        assert np.allclose(loaded.xyz, GridTemplate.xyz)
+        assert loaded.checksum == GridTemplate.checksum
+        assert loaded.n_particles == GridTemplate.n_particles
+        assert loaded.box_length == GridTemplate.box_length
+
+    def test_library_loads_stored_template(self, tmpdir, Water, GridTemplate):
+        from dropletbuilder.fluid import FluidLibrary
+        library = FluidLibrary(template_dir=str(tmpdir))
+        GridTemplate.save(library._path(Water, 997))
+        template = library.get(Water, 997)
+        assert np.allclose(template.xyz, GridTemplate.xyz)
+        assert library.get(Water, 997) is template
+
+    def test_library_paths_by_checksum(self, tmpdir, Water):
+        from dropletbuilder.fluid import FluidLibrary
+        library = FluidLibrary(template_dir=str(tmpdir))
+        edited = mbuild.clone(Water)
+        edited.add(mbuild.Compound(name='X', pos=[0.5, 0, 0]))
+        assert edited.name == Water.name
+        assert library._path(edited, 997) != library._path(Water, 997)
+        assert library._path(mbuild.clone(Water), 997) == \
+            library._path(Water, 997)
+
+    def test_library_repacks_stale_template(self, tmpdir, Water, GridTemplate):
+        from dropletbuilder.fluid import FluidLibrary
+        library = FluidLibrary(template_dir=str(tmpdir))
+        GridTemplate.checksum = 'stale'
+        GridTemplate.save(library._path(Water, 997))
+        with pytest.warns(UserWarning, match="stale"):
+            template = library.get(Water, 997)
+        assert template.checksum != 'stale'
+
+    def test_library_paths_by_density(self, tmpdir, Water):
+        from dropletbuilder.fluid import FluidLibrary
+        library = FluidLibrary(template_dir=str(tmpdir))
+        assert library._path(Water, 997.123) != library._path(Water, 997.1234)
+        assert library._path(Water, 997) == library._path(Water, 997.0)
+
+    def test_library_repacks_other_density(self, tmpdir, Water, GridTemplate):
+        from dropletbuilder.fluid import FluidLibrary
+        library = FluidLibrary(template_dir=str(tmpdir))
+        GridTemplate.save(library._path(Water, 1000))
+        with pytest.warns(UserWarning, match="stale"):
+            template = library.get(Water, 1000)
+        assert template.density == 1000
+
+    def test_droplet_template_fill_mode(self, Water):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1, angle=90.0, fluid=Water, density=997,
+                          fill_mode='template')
+        for child in droplet.children:
+            if child.name == 'FLD':
+                assert child.n_particles > 20 and child.n_particles < 150
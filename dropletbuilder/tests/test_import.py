@@ -0,0 +1,47 @@
+import subprocess
+import sys
+
+import pytest
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for lazy package imports.
+"""
+
+def loaded_modules(code):
+    """
+    Runs `code` in a fresh interpreter and returns the modules it loaded
+    """
+    output = subprocess.check_output([
+        sys.executable, '-c',
+        code + '\nimport sys\nprint(" ".join(sorted(sys.modules)))'])
+    return set(output.decode().splitlines()[-1].split())
+
+
+class TestImport(BaseTest):
+    def test_import_does_not_load_mbuild(self):
+        modules = loaded_modules('import dropletbuilder')
+        assert 'dropletbuilder' in modules
+        assert 'mbuild' not in modules
+
+    def test_light_names_do_not_load_mbuild(self):
+        modules = loaded_modules(
+            'from dropletbuilder import (BuildProfiler, FluidLibrary, '
+            'SubstrateCache, build_droplets, build_large_droplet)\n'
+            'from dropletbuilder.geometry import check_droplet_params\n'
+            'check_droplet_params(radius=1, fluid="water", density=997)')
+        assert 'mbuild' not in modules
+
+    def test_droplet_loads_mbuild(self):
+        modules = loaded_modules('from dropletbuilder import Droplet')
+        assert 'mbuild' in modules
+
+    def test_lazy_attributes(self):
+        import dropletbuilder
+        from dropletbuilder.dropletbuilder import Droplet
+        assert dropletbuilder.Droplet is Droplet
+        assert 'Droplet' in dir(dropletbuilder)
+        with pytest.raises(AttributeError):
+            dropletbuilder.NotAName
@@ -0,0 +1,92 @@
+import tracemalloc
+
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for large droplet builds.
+"""
+
+class TestLarge(BaseTest):
+    def test_build_large_droplet(self, Water, WaterLibrary):
+        from dropletbuilder.large import build_large_droplet
+        from dropletbuilder.substrate import graphene_substrate
+        stats = build_large_droplet(
+            'droplet.gro', radius=1, fluid=Water, density=997,
+            fluid_library=WaterLibrary)
+        loaded = mbuild.load('droplet.gro')
+        substrate = graphene_substrate(4, 4)
+        assert loaded.n_particles == stats['n_particles']
+        assert stats['n_substrate'] == substrate.n_sites
+        assert stats['n_fluid'] == 3 * stats['n_molecules'] > 0
+        assert np.isclose(stats['surface_height'], substrate.surface_height)
+        xyz = loaded.xyz
+        assert np.allclose(xyz[:substrate.n_sites], substrate.xyz, atol=1e-3)
+        fluid_z = xyz[substrate.n_sites:, 2]
+        assert np.min(fluid_z) > stats['surface_height'] + 0.29
+
+    def test_chunked_matches_whole(self, Water, WaterLibrary):
+        from dropletbuilder.large import build_large_droplet
+        build_large_droplet('whole.gro', radius=1, fluid=Water, density=997,
+                            fluid_library=WaterLibrary)
+        build_large_droplet('chunked.gro', radius=1, fluid=Water, density=997,
+                            fluid_library=WaterLibrary, chunk_size=50)
+        whole = mbuild.load('whole.gro')
+        chunked = mbuild.load('chunked.gro')
+        assert np.allclose(np.sort(whole.xyz, axis=0),
+                           np.sort(chunked.xyz, axis=0))
+
+    def test_matches_droplet_system(self, Water, WaterLibrary, GoldLattice):
+        from dropletbuilder.large import build_large_droplet
+        from dropletbuilder.system import build_droplet_system
+        for lattice, compound, n_layers in (
+                (None, None, 2), (GoldLattice, mbuild.Compound(name='Au'), 1)):
+            kwargs = dict(radius=1, fluid=Water, density=997,
+                          n_layers=n_layers, lattice=lattice,
+                          lattice_compound=compound,
+                          fluid_library=WaterLibrary)
+            stats = build_large_droplet('droplet.xyz', **kwargs)
+            system = build_droplet_system(substrate_cache=None, **kwargs)
+            xyz = np.loadtxt('droplet.xyz', skiprows=2, usecols=(1, 2, 3))
+            assert system.n_particles == stats['n_particles']
+            assert len(system.group('LAT')) == stats['n_substrate']
+            assert np.allclose(xyz, system.xyz * 10, atol=1e-3)
+
+    def test_custom_lattice(self, Water, WaterLibrary, GoldLattice):
+        from dropletbuilder.large import build_large_droplet
+        stats = build_large_droplet(
+            'droplet.xyz', radius=1, fluid=Water, density=997,
+            lattice=GoldLattice, lattice_compound=mbuild.Compound(name='Au'),
+            fluid_library=WaterLibrary)
+        with open('droplet.xyz') as f:
+            lines = f.read().splitlines()
+        assert int(lines[0]) == stats['n_particles'] == len(lines) - 2
+        assert stats['n_substrate'] == 4 * 9 * 9 * 3
+
+    def test_bad_extension(self, Water):
+        from dropletbuilder.large import build_large_droplet
+        with pytest.raises(ValueError, match="gro or .xyz"):
+            build_large_droplet('droplet.pdb', radius=1, fluid=Water,
+                                density=997)
+
+    def test_droplet_points_to_large_mode(self, Water):
+        from dropletbuilder.dropletbuilder import Droplet
+        with pytest.raises(ValueError, match="build_large_droplet"):
+            Droplet(radius=1, fluid=Water, density=997, x=150)
+
+    def test_peak_memory_below_sheet(self, Water, WaterLibrary):
+        from dropletbuilder.large import build_large_droplet, estimate_memory
+        WaterLibrary.get(Water, 997)
+        tracemalloc.start()
+        stats = build_large_droplet(
+            'droplet.gro', radius=1, fluid=Water, density=997, x=60, y=60,
+            fluid_library=WaterLibrary, chunk_size=10000)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # Holding the sheet positions alone would take 24 bytes per atom
+        assert peak < 24 * stats['n_substrate']
+        assert peak < estimate_memory(stats['n_fluid'], chunk_size=10000)
@@ -0,0 +1,77 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for mixture droplets.
+"""
+
+class TestMixture(BaseTest):
+    def test_mixture_counts(self, Water):
+        from dropletbuilder.cap import get_compound_mass
+        from dropletbuilder.mixture import mixture_counts
+        mass = get_compound_mass(Water)
+        counts = mixture_counts([Water, Water], [500, 250], 10)
+        assert counts.tolist() == [int(500 / mass * 10 * .60224),
+                                   int(250 / mass * 10 * .60224)]
+
+    def test_mixture_counts_length(self, Water):
+        from dropletbuilder.mixture import mixture_counts
+        with pytest.raises(ValueError, match="equal length"):
+            mixture_counts([Water, Water], [997], 10)
+
+    def test_molecule_centers(self):
+        from dropletbuilder.mixture import molecule_centers
+        xyz = np.array([[0, 0, 0.], [0, 0, 2.], [1, 1, 1.]])
+        centers = molecule_centers(xyz, [2, 1])
+        assert np.allclose(centers, [[0, 0, 1], [1, 1, 1]])
+
+    def test_rebalance(self):
+        from dropletbuilder.mixture import rebalance
+        # 6 of species 0 and 3 of species 1 kept, target ratio 1:1
+        species = np.array([0] * 6 + [1] * 4)
+        keep = np.array([True] * 9 + [False])
+        distance = np.array([5, 0, 4, 1, 3, 2, 0, 1, 2, 3], dtype=float)
+        balanced = rebalance(species, keep, [10, 10], distance)
+        assert np.bincount(species[balanced]).tolist() == [3, 3]
+        # the species 0 molecules closest to the centre are kept
+        assert np.flatnonzero(balanced[:6]).tolist() == [1, 3, 5]
+        assert not balanced[9]
+
+    def test_rebalance_missing_species(self):
+        from dropletbuilder.mixture import rebalance
+        species = np.array([0, 0, 1])
+        keep = np.array([True, True, False])
+        balanced = rebalance(species, keep, [1, 1], np.zeros(3))
+        assert np.array_equal(balanced, keep)
+
+    def test_trim_mixture(self, Water):
+        from dropletbuilder.mixture import trim_mixture
+        filled = mbuild.Compound()
+        for z in [1.5, 2.0, 2.5, 3.0, 0.5, 2.2, 2.8]:
+            molecule = mbuild.clone(Water)
+            molecule.translate_to([0, 0, z])
+            filled.add(molecule)
+        # 4 then 3 molecules of two species filled in a 4:3 ratio
+        trimmed, n_kept, n_dropped, composition = trim_mixture(
+            filled, 1.2, [4, 3], [0, 0, 2])
+        assert composition.tolist() == [3, 2]
+        assert (n_kept, n_dropped) == (5, 2)
+        assert len(trimmed.children) == 5
+
+    def test_mismatched_density(self, Water):
+        from dropletbuilder.dropletbuilder import Droplet
+        with pytest.raises(ValueError, match="equal length"):
+            Droplet(radius=1, fluid=[Water, Water], density=997)
+
+    def test_mixture_droplet(self, Water):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1.5, fluid=[Water, Water],
+                          density=[665, 332], fill_mode='cap')
+        n_water, n_other = droplet.composition
+        assert n_water > 0 and n_other > 0
+        assert abs(n_water / n_other - 2) < 0.5
+        assert sum(droplet.composition) == droplet.n_molecules_kept
@@ -0,0 +1,93 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for fluid-substrate overlap checks.
+"""
+
+class TestOverlap(BaseTest):
+    def test_nearest_distances_brute_force(self):
+        from dropletbuilder.overlap import nearest_distances
+        rng = np.random.RandomState(0)
+        box = np.array([3.0, 2.0])
+        reference = rng.uniform(0, 1, (200, 3)) * [3, 2, 0.5]
+        xyz = rng.uniform(-1, 1, (50, 3)) * [4, 3, 1] + [0, 0, 0.8]
+        delta = xyz[:, np.newaxis] - reference[np.newaxis]
+        delta[:, :, :2] -= box * np.round(delta[:, :, :2] / box)
+        expected = np.min(np.linalg.norm(delta, axis=-1), axis=1)
+        assert np.allclose(nearest_distances(xyz, reference, box), expected)
+
+    def test_nearest_distances_across_boundary(self):
+        from dropletbuilder.overlap import nearest_distances
+        distances = nearest_distances([[0.05, 1.0, 0.0]], [[3.95, 1.0, 0.0]],
+                                      [4.0, 4.0, 10.0])
+        assert np.isclose(distances[0], 0.1)
+
+    def fluid(self, water, heights):
+        filled = mbuild.Compound(name='FLD')
+        for x, z in heights:
+            molecule = mbuild.clone(water)
+            molecule.translate_to([x, 1.0, z])
+            filled.add(molecule)
+        return filled
+
+    def test_resolve_overlap_report(self, Water):
+        from dropletbuilder.overlap import resolve_overlap
+        substrate = np.array([[0.5, 1.0, 0.0], [1.5, 1.0, 0.0]])
+        fluid = self.fluid(Water, [(0.5, 0.15), (1.5, 0.6)])
+        fluid, offset, min_distance, overlapping = resolve_overlap(
+            fluid, substrate, [2.0, 2.0], cutoff=0.2)
+        assert offset == 0.0
+        assert overlapping.tolist() == [True, False]
+        assert min_distance < 0.2
+        assert len(fluid.children) == 2
+
+    def test_resolve_overlap_remove(self, Water):
+        from dropletbuilder.overlap import resolve_overlap
+        substrate = np.array([[0.5, 1.0, 0.0], [1.5, 1.0, 0.0]])
+        fluid = self.fluid(Water, [(0.5, 0.15), (1.5, 0.6)])
+        fluid, _, min_distance, _ = resolve_overlap(
+            fluid, substrate, [2.0, 2.0], cutoff=0.2, mode='remove')
+        assert len(fluid.children) == 1
+        assert min_distance >= 0.2
+
+    def test_resolve_overlap_nudge(self, Water):
+        from dropletbuilder.overlap import nearest_distances, resolve_overlap
+        substrate = np.array([[0.5, 1.0, 0.0], [1.5, 1.0, 0.0]])
+        fluid = self.fluid(Water, [(0.5, 0.15), (1.5, 0.6)])
+        fluid, offset, min_distance, _ = resolve_overlap(
+            fluid, substrate, [2.0, 2.0], cutoff=0.2, mode='nudge')
+        assert offset > 0
+        assert len(fluid.children) == 2
+        distances = nearest_distances(fluid.xyz + [0, 0, offset], substrate,
+                                      [2.0, 2.0])
+        assert np.min(distances) >= 0.2 - 1e-6
+
+    def test_bad_overlap_mode(self, Water):
+        from dropletbuilder.dropletbuilder import Droplet
+        with pytest.raises(ValueError, match="overlap must be one of"):
+            Droplet(radius=1, fluid=Water, density=997, overlap='shift')
+
+    def test_droplet_overlap_report(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary,
+                          overlap='report')
+        assert droplet.min_substrate_distance >= 0.3 - 1e-6
+        assert droplet.n_molecules_overlapping == 0
+
+    def test_droplet_overlap_remove(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary,
+                          overlap='remove', overlap_cutoff=0.35)
+        assert droplet.n_molecules_overlapping > 0
+        assert droplet.min_substrate_distance >= 0.35
+        assert droplet.composition == [droplet.n_molecules_kept]
+        for child in droplet.children:
+            if child.name == 'FLD':
+                assert len(child.children) == droplet.n_molecules_kept
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from dropletbuilder.utils.io_tools import get_fn
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for cached force field typing.
+"""
+
+class NameTyper(object):
+    """
+    Minimal force field that types each atom by its name and gives every
+    bond one parameter, counting how often it is applied
+    """
+    def __init__(self):
+        self.n_applied = 0
+
+    def apply(self, structure):
+        import parmed
+        self.n_applied += 1
+        for atom in structure.atoms:
+            atom.type = 'T' + atom.name
+        bond_type = parmed.BondType(100.0, 1.0)
+        structure.bond_types.append(bond_type)
+        for bond in structure.bonds:
+            bond.type = bond_type
+        return structure
+
+
+class TestParametrize(BaseTest):
+    @pytest.fixture
+    def TemplateDroplet(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        return Droplet(radius=1, angle=90.0, fluid=Water, density=997,
+                       fill_mode='template', fluid_library=WaterLibrary)
+
+    def test_topology_key(self, Water):
+        import mbuild
+        from dropletbuilder.parametrize import topology_key
+        moved = mbuild.clone(Water)
+        moved.translate([1, 2, 3])
+        assert topology_key(moved) == topology_key(Water)
+        moved.name = 'H2O'
+        assert topology_key(moved) != topology_key(Water)
+
+    def test_molecule_runs(self, TemplateDroplet):
+        from dropletbuilder.parametrize import molecule_runs
+        runs = [(child.name, n) for child, _, n in
+                molecule_runs(TemplateDroplet)]
+        assert runs == [('LAT', TemplateDroplet.children[0].n_particles),
+                        ('FLD', TemplateDroplet.n_molecules_kept)]
+
+    def test_apply_forcefield(self, TemplateDroplet):
+        from dropletbuilder.parametrize import TypingCache, apply_forcefield
+        lattice_ff, fluid_ff = NameTyper(), NameTyper()
+        cache = TypingCache()
+        structure = apply_forcefield(
+            TemplateDroplet, {'LAT': lattice_ff, 'FLD': fluid_ff},
+            cache=cache)
+        # One carbon and one water typed, however many copies there are
+        assert lattice_ff.n_applied == 1
+        assert fluid_ff.n_applied == 1
+        assert len(cache) == 2
+
+        particles = list(TemplateDroplet.particles())
+        assert len(structure.atoms) == len(particles)
+        assert [atom.type for atom in structure.atoms] == \
+            ['T' + particle.name for particle in particles]
+        assert len(structure.bonds) == TemplateDroplet.n_bonds
+        assert all(bond.type is not None for bond in structure.bonds)
+        assert len(structure.residues) == len(particles) - \
+            2 * TemplateDroplet.n_molecules_kept
+        assert np.allclose(structure.coordinates, TemplateDroplet.xyz * 10)
+        assert np.allclose(structure.box[:3],
+                           np.asarray(TemplateDroplet.periodicity) * 10)
+
+        # Typed molecules are reused by later droplets
+        apply_forcefield(TemplateDroplet,
+                         {'LAT': lattice_ff, 'FLD': fluid_ff}, cache=cache)
+        assert lattice_ff.n_applied == 1
+        assert fluid_ff.n_applied == 1
+
+    def test_missing_forcefield(self, TemplateDroplet):
+        from dropletbuilder.parametrize import TypingCache, apply_forcefield
+        with pytest.raises(ValueError, match='No force field given for'):
+            apply_forcefield(TemplateDroplet, {'FLD': NameTyper()},
+                             cache=TypingCache())
+
+    def test_matches_foyer(self, TemplateDroplet):
+        foyer = pytest.importorskip('foyer')
+        from dropletbuilder.parametrize import TypingCache, apply_forcefield
+        gph = foyer.Forcefield(get_fn('graphene.xml'))
+        tip3p = foyer.Forcefield(get_fn('tip3p.xml'))
+        structure = apply_forcefield(
+            TemplateDroplet, {'LAT': gph, 'FLD': tip3p}, cache=TypingCache())
+        lattice, fluid = TemplateDroplet.children
+        residue = fluid.children[0].name
+        reference = (gph.apply(lattice.to_parmed(residues='C')) +
+                     tip3p.apply(fluid.to_parmed(residues=residue)))
+        assert [atom.type for atom in structure.atoms] == \
+            [atom.type for atom in reference.atoms]
+        assert [atom.charge for atom in structure.atoms] == \
+            [atom.charge for atom in reference.atoms]
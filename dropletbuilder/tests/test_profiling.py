@@ -0,0 +1,125 @@
+import json
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for build profiling.
+"""
+
+# Stage peaks are unknown when tracemalloc already traces and cannot reset
+# its peak
+needs_stage_peaks = pytest.mark.skipif(
+    tracemalloc.is_tracing() and not hasattr(tracemalloc, 'reset_peak'),
+    reason='tracemalloc is already tracing')
+
+
+class TestProfiling(BaseTest):
+    @needs_stage_peaks
+    def test_stage_records(self):
+        from dropletbuilder.utils.profiling import BuildProfiler
+        profiler = BuildProfiler()
+        with profiler.stage('allocate', lambda: 7):
+            block = np.ones(1000000)
+        del block
+        record, = profiler.stages
+        assert record['stage'] == 'allocate'
+        assert record['seconds'] >= 0
+        assert record['peak_bytes'] >= 8000000
+        assert record['n_particles'] == 7
+
+    def test_stage_while_tracing(self):
+        from dropletbuilder.utils.profiling import BuildProfiler
+        profiler = BuildProfiler()
+        tracemalloc.start()
+        try:
+            block = np.ones(1000000)
+            del block
+            with profiler.stage('small'):
+                block = np.ones(1000)
+        finally:
+            tracemalloc.stop()
+        peak_bytes = profiler.stages[0]['peak_bytes']
+        if hasattr(tracemalloc, 'reset_peak'):
+            assert 8000 <= peak_bytes < 8000000
+        else:
+            assert peak_bytes is None
+
+    def test_stage_without_memory(self):
+        from dropletbuilder.utils.profiling import BuildProfiler
+        profiler = BuildProfiler(trace_memory=False)
+        with profiler.stage('noop'):
+            pass
+        assert profiler.stages[0]['peak_bytes'] is None
+        assert profiler.stages[0]['n_particles'] is None
+        assert profiler.report()['peak_bytes'] is None
+
+    def test_stage_callback(self):
+        from dropletbuilder.utils.profiling import BuildProfiler
+        records = []
+        profiler = BuildProfiler(trace_memory=False, callback=records.append)
+        with profiler.stage('first'):
+            assert records == []
+        with profiler.stage('second', lambda: 3):
+            pass
+        assert records == profiler.stages
+        assert records[1]['n_particles'] == 3
+
+    def test_report_jsonl(self):
+        from dropletbuilder.utils.profiling import BuildProfiler
+        profiler = BuildProfiler(jsonl='stats.jsonl', label='v1')
+        with profiler.stage('a'):
+            pass
+        with profiler.stage('b'):
+            pass
+        profiler.report()
+        profiler.report()
+        with open('stats.jsonl') as f:
+            lines = [json.loads(line) for line in f]
+        assert [line['stage'] for line in lines] == ['a', 'b', 'a', 'b']
+        assert all(line['label'] == 'v1' for line in lines)
+
+    def test_droplet_build_stats(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.utils.profiling import BuildProfiler
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary,
+                          profile=BuildProfiler(jsonl='stats.jsonl'))
+        stats = droplet.build_stats
+        stages = [record['stage'] for record in stats['stages']]
+        assert stages == ['substrate', 'sheet', 'fill', 'trim', 'gather',
+                          'place']
+        assert stats['stages'][-1]['n_particles'] == droplet.n_particles
+        assert stats['total_seconds'] > 0
+        with open('stats.jsonl') as f:
+            assert len(f.readlines()) == 6
+
+    @needs_stage_peaks
+    def test_placement_peak_memory(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.utils.profiling import BuildProfiler
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary,
+                          profile=BuildProfiler())
+        stages = {record['stage']: record
+                  for record in droplet.build_stats['stages']}
+        # One float64 copy of every position in the system
+        one_copy = droplet.n_particles * 3 * 8
+        assert stages['gather']['n_particles'] == droplet.n_particles
+        assert stages['gather']['peak_bytes'] < 1.25 * one_copy
+        assert stages['place']['peak_bytes'] < 0.5 * one_copy
+        # Fluid particles keep views of a fluid-only array, so no copy of
+        # the substrate positions outlives the build
+        fluid = droplet.children[-1]
+        buffer = next(fluid.particles()).pos.base
+        assert buffer.shape == (fluid.n_particles, 3)
+
+    def test_droplet_not_profiled(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          fill_mode='template', fluid_library=WaterLibrary)
+        assert droplet.build_stats is None
@@ -0,0 +1,145 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for the asynchronous build service.
+"""
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class TestService(BaseTest):
+    @pytest.fixture
+    def Kwargs(self, Water, WaterLibrary):
+        return dict(radius=1, fluid=Water, density=997, fill_mode='template',
+                    fluid_library=WaterLibrary)
+
+    def test_build(self, Kwargs):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.service import BuildService
+
+        records = []
+
+        async def build():
+            async with BuildService(max_workers=1) as service:
+                return await service.build(
+                    angle=60, progress=records.append, filename='drop.gro',
+                    **Kwargs)
+
+        system = run(build())
+        droplet = Droplet(angle=60, **Kwargs)
+        assert np.allclose(system.xyz, droplet.xyz)
+        assert system.metadata['n_molecules_kept'] == droplet.n_molecules_kept
+        assert [record['stage'] for record in records] == \
+            ['substrate', 'sheet', 'fill', 'trim', 'gather', 'place',
+             'write']
+        with open('drop.gro') as f:
+            assert len(f.readlines()) == system.n_particles + 3
+
+    def test_deduplicate(self, Kwargs):
+        from dropletbuilder.service import BuildService
+
+        async def build():
+            async with BuildService(max_workers=2) as service:
+                first = service.build(**Kwargs)
+                second = service.build(**Kwargs)
+                other = service.build(angle=60, **Kwargs)
+                results = await asyncio.gather(first, second, other)
+                assert service.n_pending == 0
+                return results
+
+        first, second, other = run(build())
+        assert first is second
+        assert other is not first
+
+    def test_priority(self, Kwargs):
+        from dropletbuilder.service import BuildService
+        finished = []
+
+        async def build(service, priority):
+            await service.build(priority=priority, angle=90 + priority * 10,
+                                **Kwargs)
+            finished.append(priority)
+
+        async def build_all():
+            async with BuildService(max_workers=1) as service:
+                await asyncio.gather(*[build(service, priority)
+                                       for priority in (5, 1, 3)])
+
+        run(build_all())
+        assert finished == [1, 3, 5]
+
+    def test_cancel_queued(self, Kwargs):
+        from dropletbuilder.service import BuildService
+        records = []
+
+        async def build():
+            async with BuildService(max_workers=1) as service:
+                running = asyncio.ensure_future(service.build(**Kwargs))
+                queued = asyncio.ensure_future(service.build(
+                    angle=60, progress=records.append, **Kwargs))
+                await asyncio.sleep(0)
+                assert service.n_pending == 2
+                queued.cancel()
+                with pytest.raises(asyncio.CancelledError):
+                    await queued
+                assert service.n_pending == 1
+                await running
+
+        run(build())
+        assert records == []
+
+    def test_invalid_request(self, Kwargs):
+        from dropletbuilder.service import build_droplet_async, BuildService
+
+        async def build():
+            service = BuildService(max_workers=1)
+            try:
+                await build_droplet_async(service=service, radius=1,
+                                          density=997)
+            finally:
+                await service.close()
+
+        with pytest.raises(ValueError, match='Fluid droplet compounds'):
+            run(build())
+
+    def test_profile_rejected(self, Kwargs):
+        from dropletbuilder.service import BuildService
+
+        async def build():
+            async with BuildService(max_workers=1) as service:
+                await service.build(profile=True, **Kwargs)
+
+        with pytest.raises(ValueError, match='progress'):
+            run(build())
+
+    def test_default_service_per_loop(self, Kwargs):
+        from dropletbuilder import service as service_module
+
+        async def build():
+            await service_module.build_droplet_async(**Kwargs)
+            return service_module.default_service()
+
+        async def current():
+            return service_module.default_service()
+
+        first = run(build())
+        try:
+            second = run(current())
+            # The service of the closed loop is stopped, not leaked
+            assert second is not first
+            assert first._loop is None
+            assert not first._listener.is_alive()
+            assert first.n_pending == 0
+        finally:
+            service_module._DEFAULT_SERVICE = None
@@ -0,0 +1,290 @@
+import numpy as np
+import mbuild
+import pytest
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for array-backed substrates.
+"""
+
+class TestSubstrate(BaseTest):
+    def test_lattice_positions_match_populate(self, GoldLattice):
+        from dropletbuilder.substrate import lattice_positions
+        lat = GoldLattice.populate(
+            compound_dict={'Au': mbuild.Compound(name='Au')}, x=3, y=2, z=2)
+        names, xyz = lattice_positions(
+            GoldLattice.lattice_spacing, GoldLattice.lattice_vectors,
+            GoldLattice.lattice_points, x=3, y=2, z=2)
+        assert np.allclose(xyz, lat.xyz)
+        assert np.all(names == 'Au')
+
+    def test_graphene_matches_populate(self):
+        from dropletbuilder.substrate import graphene_substrate
+        lattice = mbuild.Lattice(
+            lattice_spacing=[0.2456, 0.2456, 0.335],
+            angles=[90.0, 90.0, 120.0],
+            lattice_points={'C': [[0, 0, 0], [2 / 3, 1 / 3, 0]]})
+        factor = np.cos(np.pi / 6)
+        lat = lattice.populate(
+            compound_dict={'C': mbuild.Compound(name='C')},
+            x=int(4 / 0.2456), y=int(4 / 0.2456) * (1 / factor), z=3)
+        for particle in lat.particles():
+            if particle.xyz[0][0] < 0:
+                particle.xyz[0][0] += lat.periodicity[0]
+        lat.periodicity[1] *= factor
+
+        substrate = graphene_substrate(4, 4)
+        assert np.allclose(substrate.xyz, lat.xyz)
+        assert np.allclose(substrate.periodicity, lat.periodicity)
+
+    def test_graphene_in_box(self):
+        from dropletbuilder.substrate import graphene_substrate
+        substrate = graphene_substrate(5, 6)
+        assert np.all(substrate.xyz[:, :2] >= 0)
+        assert np.all(substrate.xyz[:, :2] <= substrate.periodicity[:2])
+        assert abs(substrate.periodicity[0] - 5) < 0.5
+        assert abs(substrate.periodicity[1] - 6) < 0.5
+
+    def test_graphene_layers(self):
+        from dropletbuilder.substrate import graphene_substrate
+        one = graphene_substrate(4, 4, n_layers=1)
+        three = graphene_substrate(4, 4)
+        assert three.n_sites == 3 * one.n_sites
+        assert np.isclose(three.surface_height, 2 * 0.335)
+
+    def test_to_compound(self):
+        from dropletbuilder.substrate import graphene_substrate
+        substrate = graphene_substrate(4, 4)
+        sheet = substrate.to_compound({'C': mbuild.Compound(name='C')})
+        assert sheet.name == 'LAT'
+        assert sheet.n_particles == substrate.n_sites
+        assert np.allclose(sheet.xyz, substrate.xyz)
+        assert np.allclose(sheet.periodicity, substrate.periodicity)
+
+    def test_lattice_substrate_matches_populate(self, GoldLattice):
+        from dropletbuilder.substrate import lattice_substrate
+        lat = GoldLattice.populate(
+            compound_dict={'Au': mbuild.Compound(name='Au')},
+            x=int(4 / 0.40788), y=int(4 / 0.40788), z=int(1.5 / 0.40788))
+        substrate = lattice_substrate(GoldLattice, 4, 4)
+        assert np.allclose(substrate.xyz, lat.xyz)
+        assert np.allclose(substrate.periodicity, lat.periodicity)
+
+    def test_substrate_key(self, GoldLattice):
+        from dropletbuilder.substrate import substrate_key
+        args = (GoldLattice.lattice_spacing, GoldLattice.angles,
+                GoldLattice.lattice_vectors, GoldLattice.lattice_points)
+        key = substrate_key(*args, [2, 2, 2])
+        assert key == substrate_key(*args, [2, 2, 2])
+        assert key != substrate_key(*args, [2, 2, 3])
+        # Lattices differing only in their vectors build different sheets
+        assert key != substrate_key(
+            GoldLattice.lattice_spacing, GoldLattice.angles,
+            [[1, 0, 0], [0, 1, 0], [0.5, 0, 1]], GoldLattice.lattice_points,
+            [2, 2, 2])
+
+    def test_cache_hit(self):
+        from dropletbuilder.substrate import SubstrateCache, graphene_substrate
+        cache = SubstrateCache()
+        first = graphene_substrate(4, 4, cache=cache)
+        assert graphene_substrate(4, 4, cache=cache) is first
+        assert graphene_substrate(4, 5, cache=cache) is not first
+        assert len(cache) == 2
+
+    def test_cache_lru_eviction(self):
+        from dropletbuilder.substrate import SubstrateCache, graphene_substrate
+        cache = SubstrateCache(maxsize=2)
+        first = graphene_substrate(4, 4, cache=cache)
+        graphene_substrate(4, 5, cache=cache)
+        graphene_substrate(4, 4, cache=cache)
+        graphene_substrate(4, 6, cache=cache)
+        assert len(cache) == 2
+        assert graphene_substrate(4, 4, cache=cache) is first
+
+    def test_cache_on_disk(self, tmpdir):
+        from dropletbuilder.substrate import SubstrateCache, graphene_substrate
+        built = graphene_substrate(
+            4, 4, cache=SubstrateCache(cache_dir=str(tmpdir)))
+        assert len(tmpdir.listdir()) == 1
+        loaded = graphene_substrate(
+            4, 4, cache=SubstrateCache(cache_dir=str(tmpdir)))
+        assert loaded is not built
+        assert np.allclose(loaded.xyz, built.xyz)
+        assert np.allclose(loaded.periodicity, built.periodicity)
+        assert np.all(loaded.names == built.names)
+
+    def test_to_compound_does_not_alias_cache(self):
+        from dropletbuilder.substrate import SubstrateCache, graphene_substrate
+        cache = SubstrateCache()
+        substrate = graphene_substrate(4, 4, cache=cache)
+        sheet = substrate.to_compound({'C': mbuild.Compound(name='C')})
+        sheet.xyz += [0, 0, 1]
+        for particle in sheet.particles():
+            particle.pos += 1.0
+        assert np.allclose(graphene_substrate(4, 4, cache=cache).xyz,
+                           graphene_substrate(4, 4).xyz)
+
+    def test_to_compound_sites(self, Water):
+        from dropletbuilder.substrate import Substrate
+        substrate = Substrate(['Na', 'W', 'Na'],
+                              [[0, 0, 0], [1, 1, 1], [2, 2, 2]], [3, 3, 3])
+        sheet = substrate.to_compound(
+            {'Na': mbuild.Compound(name='NA', charge=1.0), 'W': Water})
+        sodium, water, _ = sheet.children
+        assert (sodium.name, sodium.charge) == ('NA', 1.0)
+        assert np.allclose(sodium.pos, [0, 0, 0])
+        assert water.n_particles == Water.n_particles
+        assert np.allclose(water.center, [1, 1, 1])
+        assert sheet.n_bonds == Water.n_bonds
+
+    def test_orthogonal_cell_hexagonal(self):
+        from dropletbuilder.substrate import orthogonal_cell
+        gamma = np.deg2rad(120)
+        vectors = [[1, 0, 0], [np.cos(gamma), np.sin(gamma), 0], [0, 0, 1]]
+        spacing, points = orthogonal_cell(
+            [0.25, 0.25, 0.4], vectors, {'Co': [[0, 0, 0], [1/3, 2/3, 0.5]]},
+            n_layers=2)
+        assert np.allclose(spacing, [0.25, 0.25 * np.sqrt(3), 0.8])
+        # 2 cells per supercell, 2 basis sites and 2 layers
+        assert points['Co'].shape == (8, 3)
+        assert np.all(points['Co'] >= 0) and np.all(points['Co'] < 1)
+        assert len(np.unique(np.round(points['Co'], 6), axis=0)) == 8
+
+    def test_orthogonal_cell_rejects_tilted_plane(self):
+        import pytest
+        from dropletbuilder.substrate import orthogonal_cell
+        with pytest.raises(ValueError, match="xy plane"):
+            orthogonal_cell([1, 1, 1], [[1, 0, 1], [0, 1, 0], [0, 0, 1]],
+                            {'A': [[0, 0, 0]]})
+
+    def test_triangular_sheet_is_periodic(self):
+        from scipy.spatial import cKDTree
+        from dropletbuilder.substrate import lattice_substrate
+        lattice = mbuild.Lattice(
+            lattice_spacing=[0.25, 0.25, 0.4], angles=[90.0, 90.0, 120.0],
+            lattice_points={'Co': [[0, 0, 0]]})
+        substrate = lattice_substrate(lattice, 4, 4, depth=0.4)
+        assert np.all(substrate.periodicity[:2] >= 4)
+        box = [substrate.periodicity[0], substrate.periodicity[1], 10]
+        tree = cKDTree(substrate.xyz, boxsize=box)
+        # every site has six neighbours at the lattice spacing, including
+        # across the periodic boundaries
+        distances, _ = tree.query(substrate.xyz, k=8)
+        assert np.allclose(distances[:, 1:7], 0.25)
+        assert np.all(distances[:, 7] > 0.26)
+
+    def test_tilted_stacking(self):
+        from dropletbuilder.substrate import lattice_substrate
+        lattice = mbuild.Lattice(
+            lattice_spacing=[0.3, 0.3, 0.5], angles=[60.0, 90.0, 90.0],
+            lattice_points={'A': [[0, 0, 0]]})
+        substrate = lattice_substrate(lattice, 3, 3, depth=1.5)
+        xyz = substrate.xyz
+        assert np.all(xyz[:, :2] >= 0)
+        assert np.all(xyz[:, :2] < substrate.periodicity[:2])
+        layers = np.unique(np.round(xyz[:, 2], 6))
+        assert len(layers) == int(1.5 / (0.5 * np.sin(np.pi / 3)))
+        assert substrate.n_sites == len(layers) * 10 * 10
+
+    def test_droplet_on_hexagonal_lattice(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        lattice = mbuild.Lattice(
+            lattice_spacing=[0.25, 0.25, 0.4], angles=[90.0, 90.0, 120.0],
+            lattice_points={'Co': [[0, 0, 0], [1/3, 2/3, 0.5]]})
+        droplet = Droplet(radius=1, fluid=Water, density=997,
+                          lattice=lattice,
+                          lattice_compound=mbuild.Compound(name='Co'),
+                          fill_mode='template', fluid_library=WaterLibrary)
+        assert droplet.periodicity[0] >= 4 and droplet.periodicity[1] >= 4
+        for child in droplet.children:
+            if child.name == 'FLD':
+                assert child.n_particles > 0
+
+    def test_lattice_substrate_n_layers(self, GoldLattice):
+        from dropletbuilder.substrate import lattice_substrate
+        substrate = lattice_substrate(GoldLattice, 4, 4, n_layers=1)
+        assert len(np.unique(np.round(substrate.xyz[:, 2], 6))) == 2
+        # n_layers overrides the layers fitting in depth, int(3 / 0.408)
+        deep = lattice_substrate(GoldLattice, 4, 4, depth=3.0)
+        assert deep.n_sites == lattice_substrate(
+            GoldLattice, 4, 4, depth=1.5, n_layers=7).n_sites
+
+    def test_footprint_distance(self):
+        from dropletbuilder.geometry import footprint_distance
+        xyz = np.array([[5, 5, 0], [6, 5, 0], [8, 5, 0], [0.5, 5, 0]])
+        distance = footprint_distance(xyz, [5, 5], 1.5, [10, 10, 10])
+        # The last point is nearest to the droplet through the boundary
+        assert np.allclose(distance, [0, 0, 1.5, 3])
+        distance = footprint_distance(xyz + [0, 3, 0], [5, 5], 1.5,
+                                      [10, 10, 10], geometry='cylinder')
+        assert np.allclose(distance, [0, 0, 1.5, 3])
+
+    def test_frozen_sites(self):
+        from dropletbuilder.geometry import footprint_distance
+        from dropletbuilder.substrate import frozen_sites, graphene_substrate
+        substrate = graphene_substrate(8, 8)
+        center = substrate.periodicity[:2] / 2
+        mask = frozen_sites(substrate, center, 1.5, distance=1.0)
+        distance = footprint_distance(substrate.xyz, center, 1.5,
+                                      substrate.periodicity)
+        assert np.array_equal(mask, distance > 1.0)
+        mask = frozen_sites(substrate, center, 1.5, depth=0.1)
+        assert np.all(substrate.xyz[~mask, 2] == substrate.surface_height)
+        assert np.count_nonzero(~mask) == substrate.n_sites // 3
+
+    def test_droplet_frozen_group(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        kwargs = dict(radius=1, fluid=Water, density=997, x=8, y=8,
+                      fill_mode='template', fluid_library=WaterLibrary)
+        full = Droplet(**kwargs)
+        frozen = Droplet(freeze_distance=0.5, freeze_depth=0.1, **kwargs)
+        names = [child.name for child in frozen.children]
+        assert names == ['LAT', 'FRZ', 'FLD']
+        lattice, wall, fluid = frozen.children
+        assert wall.n_particles == frozen.n_sites_frozen
+        assert lattice.n_particles + wall.n_particles == \
+            full.children[0].n_particles
+        assert lattice.n_particles < wall.n_particles
+        assert frozen.surface_height == full.surface_height
+        assert np.allclose(fluid.xyz, full.children[1].xyz)
+
+        removed = Droplet(freeze_distance=0.5, freeze_depth=0.1,
+                          frozen='remove', **kwargs)
+        assert [child.name for child in removed.children] == ['LAT', 'FLD']
+        assert removed.n_particles == frozen.n_particles - wall.n_particles
+
+    def test_droplet_n_layers(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        droplet = Droplet(radius=1, fluid=Water, density=997, n_layers=1,
+                          fill_mode='template', fluid_library=WaterLibrary)
+        lattice = droplet.children[0]
+        assert len(np.unique(np.round(lattice.xyz[:, 2], 6))) == 1
+
+    def test_droplet_bad_layers(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.system import build_droplet_system
+        kwargs = dict(radius=1, fluid=Water, density=997,
+                      fill_mode='template', fluid_library=WaterLibrary)
+        with pytest.raises(ValueError, match='n_layers'):
+            Droplet(n_layers=0, **kwargs)
+        with pytest.raises(ValueError, match='n_layers'):
+            build_droplet_system(radius=1, fluid=Water, density=997,
+                                 n_layers=0, fluid_library=WaterLibrary)
+        with pytest.raises(ValueError, match='depth'):
+            Droplet(depth=0, **kwargs)
+        # A droplet at 0 degrees touches the sheet at a single point
+        with pytest.raises(ValueError, match='Every substrate site'):
+            Droplet(angle=0, freeze_distance=0, frozen='remove', **kwargs)
+
+    def test_droplet_shallow_depth(self, Water, WaterLibrary, GoldLattice):
+        from dropletbuilder.dropletbuilder import Droplet
+        # Thinner than one 0.408 nm layer of gold
+        droplet = Droplet(radius=1, fluid=Water, density=997, depth=0.3,
+                          lattice=GoldLattice,
+                          lattice_compound=mbuild.Compound(name='Au'),
+                          fill_mode='template', fluid_library=WaterLibrary)
+        lattice = droplet.children[0]
+        assert lattice.n_particles > 0
+        assert len(np.unique(np.round(lattice.xyz[:, 2], 6))) == 2
@@ -0,0 +1,185 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for array-backed droplet systems.
+"""
+
+class TestSystem(BaseTest):
+    @pytest.fixture
+    def System(self, Water, WaterLibrary):
+        from dropletbuilder.system import build_droplet_system
+        return build_droplet_system(radius=1, fluid=Water, density=997,
+                                    fluid_library=WaterLibrary)
+
+    @pytest.fixture
+    def TemplateDroplet(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        return Droplet(radius=1, fluid=Water, density=997,
+                       fill_mode='template', fluid_library=WaterLibrary)
+
+    def test_matches_template_droplet(self, System, TemplateDroplet):
+        from dropletbuilder.utils.writers import particle_arrays
+        arrays = particle_arrays(TemplateDroplet)
+        assert System.n_particles == TemplateDroplet.n_particles
+        assert System.n_bonds == TemplateDroplet.n_bonds
+        assert np.allclose(System.xyz, arrays['xyz'])
+        assert np.array_equal(System.particles['name'], arrays['names'])
+        assert np.array_equal(System.particles['residue_id'],
+                              arrays['residue_ids'])
+        assert np.array_equal(System.particles['residue_name'],
+                              arrays['residue_names'])
+        assert sorted(map(sorted, System.bonds.tolist())) == \
+            sorted(map(sorted, arrays['bonds'].tolist()))
+        assert System.groups == arrays['groups']
+        assert np.allclose(System.periodicity, TemplateDroplet.periodicity)
+
+    def test_from_compound(self, TemplateDroplet):
+        system = TemplateDroplet.to_system()
+        assert system.n_particles == TemplateDroplet.n_particles
+        assert len(system.group('FLD')) == 3 * len(
+            [c for c in TemplateDroplet.children if c.name == 'FLD'][0]
+            .children)
+        with pytest.raises(KeyError):
+            system.group('SOL')
+
+    def test_compact(self, System):
+        # A few dozen bytes per particle rather than about a kilobyte
+        assert System.nbytes < 100 * System.n_particles
+
+    def test_to_compound(self, System):
+        compound = System.to_compound()
+        assert compound.n_particles == System.n_particles
+        assert compound.n_bonds == System.n_bonds
+        assert np.allclose(compound.xyz, System.xyz)
+        assert np.allclose(compound.periodicity, System.periodicity)
+        assert sorted(child.name for child in compound.children) == \
+            ['FLD', 'LAT']
+        roundtrip = type(System).from_compound(compound)
+        assert np.array_equal(roundtrip.particles, System.particles)
+
+    def test_to_parmed(self, System, TemplateDroplet):
+        structure = System.to_parmed()
+        assert len(structure.atoms) == System.n_particles
+        assert len(structure.bonds) == System.n_bonds
+        assert len(structure.residues) == System.particles['residue_id'][-1]
+        assert np.allclose(structure.coordinates, System.xyz * 10)
+        reference = TemplateDroplet.to_parmed()
+        assert [a.atomic_number for a in structure.atoms] == \
+            [a.atomic_number for a in reference.atoms]
+
+    def test_save(self, System):
+        System.save('system.gro')
+        loaded = mbuild.load('system.gro')
+        assert loaded.n_particles == System.n_particles
+        assert np.allclose(loaded.xyz, System.xyz, atol=1e-3)
+
+    def test_to_lammpsdata(self, System):
+        System.save('system.lammps')
+        with open('system.lammps') as f:
+            assert System.to_lammpsdata().read() == f.read()
+
+    def test_to_openmm(self, System):
+        pytest.importorskip('openmm')
+        topology, positions = System.to_openmm()
+        assert topology.getNumAtoms() == System.n_particles
+        assert topology.getNumBonds() == System.n_bonds
+        assert [chain.id for chain in topology.chains()] == ['LAT', 'FLD']
+        assert topology.getNumResidues() == \
+            len(np.unique(System.particles['residue_id']))
+        assert np.allclose(positions.value_in_unit(positions.unit),
+                           System.xyz)
+
+    def test_to_hoomd_snapshot(self, System):
+        try:
+            import hoomd  # noqa: F401
+        except ImportError:
+            pytest.importorskip('gsd.hoomd')
+        snapshot = System.to_hoomd_snapshot()
+        assert snapshot.particles.N == System.n_particles
+        assert snapshot.particles.types == ['C', 'H', 'O']
+        assert np.allclose(snapshot.particles.position,
+                           System.xyz - System.periodicity / 2)
+        assert snapshot.bonds.N == System.n_bonds
+        assert snapshot.bonds.types == ['H-O']
+        assert np.allclose(snapshot.configuration.box[:3],
+                           System.periodicity)
+
+    def test_gold_lattice(self, Water, WaterLibrary, GoldLattice):
+        from dropletbuilder.system import build_droplet_system
+        system = build_droplet_system(
+            radius=1, fluid=Water, density=997, lattice=GoldLattice,
+            lattice_compound=mbuild.Compound(name='Au'),
+            fluid_library=WaterLibrary)
+        assert len(system.group('LAT')) == 4 * 9 * 9 * 3
+        assert set(system.group('LAT')['name']) == {'Au'}
+
+    def test_npz_roundtrip(self, System):
+        from dropletbuilder.system import DropletSystem
+        System.metadata['surface_height'] = 0.67
+        System.save('system.npz')
+        loaded = DropletSystem.load('system.npz')
+        assert np.array_equal(loaded.particles, System.particles)
+        assert np.array_equal(loaded.bonds, System.bonds)
+        assert loaded.groups == System.groups
+        assert loaded.metadata == {'surface_height': 0.67}
+
+    def test_droplet_key(self, Water):
+        from dropletbuilder.system import droplet_key
+        key = droplet_key(radius=1, fluid=Water, density=997)
+        assert key == droplet_key(radius=1, fluid=Water, density=997)
+        assert key != droplet_key(radius=1, fluid=Water, density=997,
+                                  seed=1)
+        assert key != droplet_key(radius=1, fluid=Water, density=1000)
+        moved = mbuild.clone(Water)
+        list(moved.particles())[0].pos += 0.01
+        assert key != droplet_key(radius=1, fluid=moved, density=997)
+        # Defaults passed explicitly build the same droplet
+        assert key == droplet_key(radius=1.0, fluid=Water, density=997.0,
+                                  x=4, y=4, n_layers=3, overlap=None,
+                                  geometry='sphere')
+        assert key != droplet_key(radius=1, fluid=Water, density=997, x=5)
+
+    def test_output_cache(self, tmpdir, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.system import DropletCache
+        cache = DropletCache(cache_dir=str(tmpdir.mkdir('droplets')))
+        kwargs = dict(radius=1, fluid=Water, density=997,
+                      fill_mode='template', fluid_library=WaterLibrary,
+                      output_cache=cache)
+        built = Droplet(profile=True, **kwargs)
+        assert len(cache) == 1
+        assert 'fill' in [s['stage'] for s in built.build_stats['stages']]
+
+        # Fresh cache on the same directory, as in a later process
+        kwargs['output_cache'] = DropletCache(cache_dir=cache.cache_dir)
+        cached = Droplet(profile=True, **kwargs)
+        assert [s['stage'] for s in cached.build_stats['stages']] == \
+            ['cache']
+        assert np.allclose(cached.xyz, built.xyz)
+        assert cached.n_bonds == built.n_bonds
+        assert np.allclose(cached.periodicity, built.periodicity)
+        assert cached.surface_height == built.surface_height
+        assert cached.n_molecules_kept == built.n_molecules_kept
+        assert cached.composition == built.composition
+        assert sorted(child.name for child in cached.children) == \
+            ['FLD', 'LAT']
+
+    def test_output_cache_hits_are_copies(self, Water, WaterLibrary):
+        from dropletbuilder.dropletbuilder import Droplet
+        from dropletbuilder.system import DropletCache
+        kwargs = dict(radius=1, fluid=Water, density=997,
+                      fill_mode='template', fluid_library=WaterLibrary,
+                      output_cache=DropletCache())
+        built = Droplet(**kwargs)
+        first = Droplet(**kwargs)
+        for particle in first.particles():
+            particle.pos += 1.0
+        first.composition.append(7)
+        second = Droplet(**kwargs)
+        assert np.allclose(second.xyz, built.xyz)
+        assert second.composition == built.composition
@@ -0,0 +1,91 @@
+import pytest
+import numpy as np
+import mbuild
+
+from dropletbuilder.utils.io_tools import get_fn
+from dropletbuilder.tests.base_test import BaseTest
+
+
+"""
+Unit Tests for streaming writers.
+"""
+
+class TestWriters(BaseTest):
+    @pytest.fixture
+    def System(self):
+        water = mbuild.load(get_fn('tip3p.mol2'))
+        water.name = 'H2O'
+        lattice = mbuild.Compound(name='LAT')
+        lattice.add([mbuild.Compound(name='C', pos=[0.1 * i, 0.2, 0.3])
+                     for i in range(4)])
+        fluid = mbuild.Compound(name='FLD')
+        for z in [1.0, 1.5]:
+            molecule = mbuild.clone(water)
+            molecule.translate_to([0.5, 0.5, z])
+            fluid.add(molecule)
+        system = mbuild.Compound()
+        system.add([lattice, fluid])
+        system.periodicity = [2.0, 2.0, 3.0]
+        return system
+
+    def test_particle_arrays(self, System):
+        from dropletbuilder.utils.writers import particle_arrays
+        arrays = particle_arrays(System)
+        assert np.allclose(arrays['xyz'], System.xyz)
+        assert arrays['groups'] == [('LAT', 0, 4), ('FLD', 4, 10)]
+        assert list(arrays['residue_ids']) == [1, 2, 3, 4, 5, 5, 5, 6, 6, 6]
+        assert list(arrays['residue_names'][3:5]) == ['C', 'H2O']
+        assert len(arrays['bonds']) == System.n_bonds
+        assert np.allclose(arrays['box'], [2.0, 2.0, 3.0])
+
+    @pytest.mark.parametrize('chunk_size', [1, 3, 1000])
+    def test_write_gro(self, System, chunk_size):
+        from dropletbuilder.utils.writers import save_droplet
+        save_droplet(System, 'system.gro', chunk_size=chunk_size)
+        loaded = mbuild.load('system.gro')
+        assert loaded.n_particles == System.n_particles
+        assert np.allclose(loaded.xyz, System.xyz, atol=1e-3)
+        with open('system.gro') as f:
+            lines = f.read().splitlines()
+        assert len(lines) == System.n_particles + 3
+        assert lines[-1].split() == ['2.00000', '2.00000', '3.00000']
+
+    def test_write_gro_matches_mbuild(self, System):
+        from dropletbuilder.utils.writers import save_droplet
+        save_droplet(System, 'streamed.gro')
+        System.save('mbuild.gro', overwrite=True, combine='all')
+        streamed = mbuild.load('streamed.gro')
+        reference = mbuild.load('mbuild.gro')
+        assert np.allclose(streamed.xyz, reference.xyz, atol=1e-3)
+
+    def test_write_xyz(self, System):
+        from dropletbuilder.utils.writers import save_droplet
+        save_droplet(System, 'system.xyz', chunk_size=4)
+        with open('system.xyz') as f:
+            lines = f.read().splitlines()
+        assert int(lines[0]) == System.n_particles
+        assert len(lines) == System.n_particles + 2
+        xyz = np.array([line.split()[1:] for line in lines[2:]], dtype=float)
+        assert np.allclose(xyz, System.xyz * 10, atol=1e-3)
+
+    def test_write_lammpsdata(self, System):
+        from dropletbuilder.utils.writers import save_droplet
+        save_droplet(System, 'system.lammps', chunk_size=4)
+        with open('system.lammps') as f:
+            text = f.read()
+        assert '10 atoms' in text
+        assert '4 bonds' in text
+        assert '3 atom types' in text
+        masses = text.split('Masses\n\n')[1].split('\n\n')[0]
+        assert masses.splitlines() == ['1 12.0107 # C', '2 1.0079 # H',
+                                       '3 15.9994 # O']
+        atoms = text.split('Atoms # full\n\n')[1].split('\n\nBonds')[0]
+        atoms = np.array([line.split() for line in atoms.splitlines()],
+                         dtype=float)
+        assert len(atoms) == System.n_particles
+        assert np.allclose(atoms[:, 4:], System.xyz * 10, atol=1e-3)
+
+    def test_unsupported_extension(self, System):
+        from dropletbuilder.utils.writers import save_droplet
+        with pytest.raises(ValueError, match="Unsupported"):
+            save_droplet(System, 'system.pdb')
@@ -0,0 +1,3 @@
+"""
+Helpers and reference files shipped with dropletbuilder
+"""
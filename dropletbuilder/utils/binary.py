@@ -0,0 +1,327 @@
+"""
+Memory-mappable binary container for droplet systems, '.drop' files.
+
+A file is the magic bytes `BINARY_MAGIC`, the length of a JSON header as a
+little-endian uint64, the header itself and then one contiguous column per
+array, each starting on an `ALIGNMENT` byte boundary:
+
+- 'xyz' float32 (n, 3) positions in nm
+- 'names' and 'residue_names' fixed width ASCII (n,)
+- 'residue_ids' int32 (n,) numbered from 1
+- 'charges' float32 (n,)
+- 'bonds' int32 (m, 2) particle indices
+
+The header holds the dtype, shape and offset of every column, relative to
+the end of the header, along with the groups, periodicity and metadata of
+the system. Columns can therefore be opened with `numpy.memmap` by any
+reader, and `open_binary` does so without loading them.
+"""
+import json
+import math
+
+import numpy as np
+
+from dropletbuilder.utils.writers import CHUNK_SIZE
+
+BINARY_EXTENSION = '.drop'
+BINARY_MAGIC = b'DROPLET\x00'
+# Bump when the layout of the file changes
+BINARY_FORMAT = 1
+ALIGNMENT = 64
+
+COLUMNS = ('xyz', 'names', 'residue_names', 'residue_ids', 'charges', 'bonds')
+
+
+def _align(n_bytes):
+    return -(-n_bytes // ALIGNMENT) * ALIGNMENT
+
+
+def _str_width(values):
+    values = np.asarray(values)
+    return max(1, int(np.max(np.char.str_len(values)))) if values.size else 1
+
+
+def _finite_json(value):
+    # JSON has no infinity or NaN, so they are stored as null
+    if isinstance(value, dict):
+        return {key: _finite_json(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_finite_json(item) for item in value]
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    return value
+
+
+def _column_dtypes(name_width, residue_width):
+    return {
+        'xyz': np.dtype('<f4'),
+        'names': np.dtype('S{:d}'.format(name_width)),
+        'residue_names': np.dtype('S{:d}'.format(residue_width)),
+        'residue_ids': np.dtype('<i4'),
+        'charges': np.dtype('<f4'),
+        'bonds': np.dtype('<i4'),
+    }
+
+
+class BinaryWriter(object):
+    """
+    Writes a '.drop' file incrementally, for systems generated in chunks
+    that are never held in memory at once.
+
+    The file is laid out up front, so the number of particles, the groups
+    and the bonds must be known when it is opened. Chunks are cast and
+    written straight to their place in each column.
+
+    Parameters
+    ----------
+    filename : str
+    n_particles : int
+        total number of particles that will be written
+    box : array-like, shape=(3,)
+        box lengths in nm
+    groups : list of (str, int, int), default = None
+        name, start and stop particle index of each group
+    bonds : np.ndarray of int, shape=(m, 2), default = None
+        particle indices of each bond
+    metadata : dict, default = None
+        JSON serializable properties of the system, infinite and NaN values
+        are stored as None
+    name_width : int, default = 8
+        longest particle name, in characters
+    residue_width : int, default = 8
+        longest residue name, in characters
+    """
+
+    def __init__(self, filename, n_particles, box, groups=None, bonds=None,
+                 metadata=None, name_width=8, residue_width=8):
+        if n_particles >= 2 ** 31:
+            raise ValueError('Binary files hold fewer than 2**31 particles')
+        if bonds is None:
+            bonds = np.zeros((0, 2), dtype=np.int64)
+        bonds = np.asarray(bonds).reshape(-1, 2)
+        if groups is None:
+            groups = [('ALL', 0, n_particles)]
+
+        self.n_particles = n_particles
+        self.n_written = 0
+        self._dtypes = _column_dtypes(name_width, residue_width)
+        shapes = {
+            'xyz': [n_particles, 3],
+            'names': [n_particles],
+            'residue_names': [n_particles],
+            'residue_ids': [n_particles],
+            'charges': [n_particles],
+            'bonds': list(bonds.shape),
+        }
+        columns = dict()
+        offset = 0
+        for name in COLUMNS:
+            columns[name] = {'dtype': self._dtypes[name].str,
+                             'shape': shapes[name], 'offset': offset}
+            offset = _align(offset + self._dtypes[name].itemsize *
+                            int(np.prod(shapes[name])))
+        header = json.dumps({
+            'format': BINARY_FORMAT,
+            'n_particles': n_particles,
+            'n_bonds': len(bonds),
+            'periodicity': [float(length) for length in box],
+            'groups': [[name, int(start), int(stop)]
+                       for name, start, stop in groups],
+            'metadata': _finite_json(metadata or {}),
+            'columns': columns,
+        }, allow_nan=False).encode()
+        prefix = len(BINARY_MAGIC) + 8
+        header += b' ' * (_align(prefix + len(header)) - prefix - len(header))
+        self._offsets = {name: prefix + len(header) + column['offset']
+                         for name, column in columns.items()}
+
+        self._file = open(filename, 'wb')
+        self._file.write(BINARY_MAGIC)
+        self._file.write(np.uint64(len(header)).astype('<u8').tobytes())
+        self._file.write(header)
+        self._file.truncate(prefix + len(header) + offset)
+        self._write_column('bonds', 0, bonds)
+
+    def _write_column(self, name, start, values):
+        dtype = self._dtypes[name]
+        values = np.asarray(values)
+        if dtype.kind == 'S' and len(values) and \
+                _str_width(values) > dtype.itemsize:
+            raise ValueError('{} longer than {} characters'.format(
+                name, dtype.itemsize))
+        row_bytes = dtype.itemsize * int(np.prod(values.shape[1:]))
+        self._file.seek(self._offsets[name] + start * row_bytes)
+        self._file.write(np.ascontiguousarray(values, dtype=dtype).tobytes())
+
+    def write(self, xyz, names, residue_names, residue_ids, charges=None):
+        """
+        Writes one chunk of particles, positions in nm
+        """
+        start = self.n_written
+        if start + len(xyz) > self.n_particles:
+            raise ValueError('Wrote more than the {} particles the binary '
+                             'file was declared to hold'.format(
+                                 self.n_particles))
+        self._write_column('xyz', start, xyz)
+        self._write_column('names', start, names)
+        self._write_column('residue_names', start, residue_names)
+        self._write_column('residue_ids', start, residue_ids)
+        if charges is not None:
+            self._write_column('charges', start, charges)
+        self.n_written += len(xyz)
+
+    def close(self):
+        self._file.close()
+        if self.n_written != self.n_particles:
+            raise ValueError('Wrote {} particles to a binary file declared '
+                             'to hold {}'.format(self.n_written,
+                                                 self.n_particles))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+def write_binary(filename, arrays, metadata=None, chunk_size=CHUNK_SIZE):
+    """
+    Writes per-particle arrays to a '.drop' file, `chunk_size` particles at
+    a time.
+
+    Parameters
+    ----------
+    filename : str
+    arrays : dict
+        per-particle arrays, see `particle_arrays`
+    metadata : dict, default = None
+        JSON serializable properties of the system
+    chunk_size : int, default = CHUNK_SIZE
+    """
+    n = len(arrays['xyz'])
+    with BinaryWriter(filename, n, arrays['box'], groups=arrays['groups'],
+                      bonds=arrays['bonds'], metadata=metadata,
+                      name_width=_str_width(arrays['names']),
+                      residue_width=_str_width(arrays['residue_names'])
+                      ) as writer:
+        for start in range(0, n, chunk_size):
+            stop = min(start + chunk_size, n)
+            writer.write(arrays['xyz'][start:stop],
+                         arrays['names'][start:stop],
+                         arrays['residue_names'][start:stop],
+                         arrays['residue_ids'][start:stop],
+                         charges=arrays['charges'][start:stop])
+
+
+class BinaryDroplet(object):
+    """
+    Droplet system in a '.drop' file, with its columns memory mapped.
+
+    Nothing is read until it is used, and slicing a column, or taking a
+    `group`, reads only the pages it covers. Names are left as ASCII bytes
+    so that they stay mapped; `to_arrays` and `to_system` decode them.
+
+    Parameters
+    ----------
+    filename : str
+    mode : str, default = 'r'
+        'r' for read only columns, 'r+' to edit them in place, 'c' for
+        copy on write, see `numpy.memmap`
+
+    Attributes
+    ----------
+    xyz, names, residue_names, residue_ids, charges, bonds : np.memmap
+        columns, see the module docstring
+    groups : list of (str, int, int)
+    periodicity : np.ndarray, shape=(3,)
+    metadata : dict
+    """
+
+    def __init__(self, filename, mode='r'):
+        with open(filename, 'rb') as f:
+            if f.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+                raise ValueError('{} is not a binary droplet file'.format(
+                    filename))
+            header_size = int(np.frombuffer(f.read(8), dtype='<u8')[0])
+            header = json.loads(f.read(header_size).decode())
+        if header['format'] > BINARY_FORMAT:
+            raise ValueError(
+                '{} was written in binary format {}, upgrade dropletbuilder '
+                'to read it'.format(filename, header['format']))
+
+        self.filename = filename
+        self.groups = [tuple(group) for group in header['groups']]
+        self.periodicity = np.array(header['periodicity'])
+        self.metadata = header['metadata']
+        data_start = len(BINARY_MAGIC) + 8 + header_size
+        buffer = np.memmap(filename, dtype=np.uint8, mode=mode)
+        for name, column in header['columns'].items():
+            dtype = np.dtype(column['dtype'])
+            start = data_start + column['offset']
+            stop = start + dtype.itemsize * int(np.prod(column['shape']))
+            setattr(self, name, buffer[start:stop].view(dtype).reshape(
+                column['shape']))
+
+    @property
+    def n_particles(self):
+        return len(self.xyz)
+
+    @property
+    def n_bonds(self):
+        return len(self.bonds)
+
+    def group(self, name):
+        """
+        Columns of the particles of the group `name`, as memory mapped views
+
+        Returns
+        -------
+        columns : dict
+            'xyz', 'names', 'residue_names', 'residue_ids' and 'charges'
+        """
+        for group_name, start, stop in self.groups:
+            if group_name == name:
+                return {column: getattr(self, column)[start:stop]
+                        for column in COLUMNS if column != 'bonds'}
+        raise KeyError('No group named {}'.format(name))
+
+    def to_arrays(self):
+        """
+        Per-particle arrays in the layout of `particle_arrays`, read into
+        memory
+        """
+        return {
+            'xyz': np.asarray(self.xyz, dtype=np.float64),
+            'names': np.char.decode(self.names, 'ascii'),
+            'charges': np.asarray(self.charges, dtype=np.float64),
+            'residue_names': np.char.decode(self.residue_names, 'ascii'),
+            'residue_ids': np.asarray(self.residue_ids, dtype=np.int64),
+            'bonds': np.asarray(self.bonds, dtype=np.int64),
+            'groups': list(self.groups),
+            'box': self.periodicity,
+        }
+
+    def to_system(self):
+        """
+        Reads the whole file into a `DropletSystem`
+        """
+        from dropletbuilder.system import DropletSystem
+
+        arrays = self.to_arrays()
+        system = DropletSystem.from_arrays(
+            arrays['xyz'], arrays['names'], arrays['residue_ids'],
+            arrays['residue_names'], charges=arrays['charges'],
+            bonds=arrays['bonds'], groups=arrays['groups'],
+            periodicity=arrays['box'])
+        system.metadata = dict(self.metadata)
+        return system
+
+
+def open_binary(filename, mode='r'):
+    """
+    Opens a '.drop' file without reading its columns, see `BinaryDroplet`
+    """
+    return BinaryDroplet(filename, mode=mode)
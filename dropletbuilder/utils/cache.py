@@ -0,0 +1,94 @@
+import os
+from collections import OrderedDict
+
+
+class TieredCache(object):
+    """
+    Cache with a least recently used in-memory tier and an optional
+    on-disk tier of one npz file per key.
+
+    Subclasses set `prefix`, the start of every file name, and implement
+    `_load` and `_dump` for the values they hold.
+
+    Parameters
+    ----------
+    maxsize : int, default = 8
+        number of values kept in memory
+    cache_dir : str, default = None
+        directory for the on-disk tier, disabled if None
+    """
+
+    prefix = 'value'
+
+    def __init__(self, maxsize=8, cache_dir=None):
+        self.maxsize = maxsize
+        self.cache_dir = cache_dir
+        self._values = OrderedDict()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, '{}-{}.npz'.format(
+            self.prefix, key))
+
+    def _load(self, filename):
+        """
+        Reads a value from the npz file `filename`
+        """
+        raise NotImplementedError
+
+    def _dump(self, value, f):
+        """
+        Writes `value` as npz to the open binary file `f`
+        """
+        raise NotImplementedError
+
+    def get(self, key):
+        """
+        Return the value stored under `key`, or None if missing
+        """
+        if key in self._values:
+            self._values.move_to_end(key)
+            return self._values[key]
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            value = self._load(self._path(key))
+            self._remember(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        """
+        Store `value` under `key` in every enabled tier
+        """
+        self._remember(key, value)
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Write to a temporary file first so concurrent builds never
+            # read a partially written file
+            tmp_path = '{}.{}.tmp'.format(self._path(key), os.getpid())
+            with open(tmp_path, 'wb') as f:
+                self._dump(value, f)
+            os.replace(tmp_path, self._path(key))
+
+    def get_or_build(self, key, build):
+        """
+        Return the value stored under `key`, calling `build` on a miss
+        """
+        value = self.get(key)
+        if value is None:
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+        Empty the in-memory tier
+        """
+        self._values.clear()
+
+    def _remember(self, key, value):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        while len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
+
+    def __len__(self):
+        return len(self._values)
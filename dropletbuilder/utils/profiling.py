@@ -0,0 +1,152 @@
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def max_rss():
+    """
+    High-water mark of the resident set size of this process in bytes, or
+    None where the `resource` module is unavailable
+    """
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux reports kilobytes
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class BuildProfiler(object):
+    """
+    Records wall time, memory and particle counts for each named stage of a
+    build.
+
+    Each stage is timed with `time.perf_counter`. With `trace_memory`,
+    allocations are traced with `tracemalloc` and `peak_bytes` is the peak
+    of memory allocated during the stage, above what was held when it
+    started. If tracemalloc was already tracing, its peak is reset for the
+    stage on Python 3.9+, and `peak_bytes` is None on older versions, where
+    the peak cannot be reset. Tracing slows pure Python code down
+    noticeably, so disable it when only timings are needed.
+    `max_rss_bytes` is the process-wide high-water mark after the stage,
+    which only grows between stages.
+
+    Parameters
+    ----------
+    trace_memory : bool, default = True
+        trace allocations of each stage with tracemalloc
+    jsonl : str, default = None
+        file each finished build appends one JSON line per stage to
+    label : str, default = None
+        label stored with every JSON line, e.g. a version or commit
+    callback : callable, default = None
+        called with the record of each stage as it finishes, e.g. to
+        report progress
+
+    Attributes
+    ----------
+    stages : list of dict
+        'stage', 'seconds', 'peak_bytes', 'max_rss_bytes' and
+        'n_particles' of each stage in the order they ran
+    """
+
+    def __init__(self, trace_memory=True, jsonl=None, label=None,
+                 callback=None):
+        self.trace_memory = trace_memory
+        self.jsonl = jsonl
+        self.label = label
+        self.callback = callback
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, count=None):
+        """
+        Profiles the body of a `with` block as stage `name`.
+
+        Parameters
+        ----------
+        name : str
+        count : callable, default = None
+            called after the stage to get its number of particles
+        """
+        started_tracing = False
+        trace_peak = False
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started_tracing = trace_peak = True
+            elif hasattr(tracemalloc, 'reset_peak'):
+                # Python 3.9+, otherwise the peak of the tracing already
+                # running may predate the stage
+                tracemalloc.reset_peak()
+                trace_peak = True
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            peak_bytes = None
+            if trace_peak:
+                peak_bytes = max(
+                    0, tracemalloc.get_traced_memory()[1] - baseline)
+            if started_tracing:
+                tracemalloc.stop()
+        self.stages.append({
+            'stage': name,
+            'seconds': seconds,
+            'peak_bytes': peak_bytes,
+            'max_rss_bytes': max_rss(),
+            'n_particles': count() if count is not None else None,
+        })
+        if self.callback is not None:
+            self.callback(self.stages[-1])
+
+    def report(self):
+        """
+        Summarizes the stages and, if `jsonl` is set, appends them to it
+
+        Returns
+        -------
+        stats : dict
+            'total_seconds', 'peak_bytes' of the largest stage and 'stages'
+        """
+        peaks = [s['peak_bytes'] for s in self.stages
+                 if s['peak_bytes'] is not None]
+        stats = {
+            'total_seconds': sum(s['seconds'] for s in self.stages),
+            'peak_bytes': max(peaks) if peaks else None,
+            'stages': list(self.stages),
+        }
+        if self.jsonl is not None:
+            self.write_jsonl(self.jsonl)
+        return stats
+
+    def write_jsonl(self, filename):
+        """
+        Appends one JSON line per stage to `filename`
+        """
+        timestamp = time.time()
+        with open(filename, 'a') as f:
+            for record in self.stages:
+                line = dict(record, label=self.label, timestamp=timestamp)
+                f.write(json.dumps(line, sort_keys=True) + '\n')
+
+
+class NullProfiler(object):
+    """
+    Stand-in for `BuildProfiler` that records nothing
+    """
+
+    @contextmanager
+    def stage(self, name, count=None):
+        yield
+
+    def report(self):
+        return None
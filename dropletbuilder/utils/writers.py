@@ -0,0 +1,354 @@
+import os
+
+import numpy as np
+
+
+CHUNK_SIZE = 100000
+BUFFER_SIZE = 1 << 20
+# Extensions `save_arrays` and `save_droplet` write
+STREAMED_EXTENSIONS = ('.gro', '.xyz', '.lammps', '.data', '.drop')
+
+
+def particle_arrays(compound):
+    """
+    Flattens a droplet into per-particle arrays in one pass over its
+    particles, without building a ParmEd structure.
+
+    Every child of `compound` (e.g. 'LAT' and 'FLD') is a group, and every
+    child of a group is a residue named after that child.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+
+    Returns
+    -------
+    arrays : dict
+        'xyz' (n, 3) positions in nm, 'names' (n,) particle names,
+        'charges' (n,), 'residue_names' (n,), 'residue_ids' (n,) numbered
+        from 1, 'bonds' (m, 2) particle indices, 'groups' list of
+        (name, start, stop) particle ranges and 'box' (3,) periodicity
+    """
+    names = []
+    charges = []
+    residue_names = []
+    residue_ids = []
+    groups = []
+    index = dict()
+    residue_id = 0
+    for group in compound.children:
+        start = len(names)
+        for residue in (group.children or [group]):
+            residue_id += 1
+            for particle in residue.particles():
+                index[particle] = len(names)
+                names.append(particle.name)
+                charges.append(particle.charge or 0.0)
+                residue_names.append(residue.name)
+                residue_ids.append(residue_id)
+        groups.append((group.name, start, len(names)))
+
+    bonds = np.array([(index[a], index[b]) for a, b in compound.bonds()],
+                     dtype=np.int64).reshape(-1, 2)
+    return {
+        'xyz': compound.xyz,
+        'names': np.array(names),
+        'charges': np.array(charges, dtype=np.float64),
+        'residue_names': np.array(residue_names),
+        'residue_ids': np.array(residue_ids, dtype=np.int64),
+        'bonds': bonds,
+        'groups': groups,
+        'box': np.array(compound.periodicity, dtype=np.float64),
+    }
+
+
+def _chunks(n, chunk_size):
+    for start in range(0, n, chunk_size):
+        yield start, min(start + chunk_size, n)
+
+
+class GroWriter(object):
+    """
+    Writes a GROMACS .gro file incrementally, for systems generated in
+    chunks that are never held in memory at once.
+
+    Particles and residues are numbered in the order they are written.
+    The total number of particles must be known up front for the header.
+
+    Parameters
+    ----------
+    filename : str
+    n_particles : int
+        total number of particles that will be written
+    box : array-like, shape=(3,)
+        box lengths in nm
+    title : str, default = 'Droplet'
+    """
+
+    def __init__(self, filename, n_particles, box, title='Droplet'):
+        self.n_particles = n_particles
+        self.box = box
+        self.n_written = 0
+        self._file = open(filename, 'w', buffering=BUFFER_SIZE)
+        self._file.write('{}\n{:d}\n'.format(title, n_particles))
+
+    def write(self, xyz, names, residue_names, residue_ids):
+        """
+        Writes one chunk of particles, positions in nm
+        """
+        start = self.n_written
+        self._file.write(''.join(
+            '{:5d}{:<5.5s}{:>5.5s}{:5d}{:8.3f}{:8.3f}{:8.3f}\n'.format(
+                resid % 100000, resname, name, (i + 1) % 100000, *pos)
+            for i, resid, resname, name, pos in zip(
+                range(start, start + len(xyz)), residue_ids, residue_names,
+                names, xyz)))
+        self.n_written += len(xyz)
+
+    def close(self):
+        if self.n_written != self.n_particles:
+            self._file.close()
+            raise ValueError('Wrote {} particles to a .gro file declared to '
+                             'hold {}'.format(self.n_written, self.n_particles))
+        self._file.write('{:10.5f}{:10.5f}{:10.5f}\n'.format(*self.box))
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+
+
+class XyzWriter(object):
+    """
+    Writes an .xyz file with positions in angstroms incrementally.
+
+    Parameters
+    ----------
+    filename : str
+    n_particles : int
+        total number of particles that will be written
+    title : str, default = 'Droplet'
+    """
+
+    def __init__(self, filename, n_particles, title='Droplet'):
+        self._file = open(filename, 'w', buffering=BUFFER_SIZE)
+        self._file.write('{:d}\n{}\n'.format(n_particles, title))
+
+    def write(self, xyz, names, residue_names=None, residue_ids=None):
+        """
+        Writes one chunk of particles, positions in nm
+        """
+        self._file.write(''.join(
+            '{} {:.4f} {:.4f} {:.4f}\n'.format(name, *pos)
+            for name, pos in zip(names, np.asarray(xyz) * 10)))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def write_gro(filename, xyz, names, residue_names, residue_ids, box,
+              title='Droplet', chunk_size=CHUNK_SIZE):
+    """
+    Writes a GROMACS .gro file, formatting `chunk_size` particles at a time.
+
+    Parameters
+    ----------
+    filename : str
+    xyz : np.ndarray, shape=(n, 3)
+        positions in nm
+    names : np.ndarray of str, shape=(n,)
+    residue_names : np.ndarray of str, shape=(n,)
+    residue_ids : np.ndarray of int, shape=(n,)
+    box : array-like, shape=(3,)
+        box lengths in nm
+    title : str, default = 'Droplet'
+    chunk_size : int, default = CHUNK_SIZE
+    """
+    with GroWriter(filename, len(xyz), box, title=title) as writer:
+        for start, stop in _chunks(len(xyz), chunk_size):
+            writer.write(xyz[start:stop], names[start:stop],
+                         residue_names[start:stop], residue_ids[start:stop])
+
+
+def write_xyz(filename, xyz, names, title='Droplet', chunk_size=CHUNK_SIZE):
+    """
+    Writes an .xyz file with positions in angstroms, formatting
+    `chunk_size` particles at a time.
+
+    Parameters
+    ----------
+    filename : str
+    xyz : np.ndarray, shape=(n, 3)
+        positions in nm
+    names : np.ndarray of str, shape=(n,)
+    title : str, default = 'Droplet'
+    chunk_size : int, default = CHUNK_SIZE
+    """
+    with XyzWriter(filename, len(xyz), title=title) as writer:
+        for start, stop in _chunks(len(xyz), chunk_size):
+            writer.write(xyz[start:stop], names[start:stop])
+
+
+def element_symbols(names):
+    """
+    Element symbol of each unique particle name, looked up as `mbuild` does
+
+    Returns
+    -------
+    elements : dict
+        symbol keyed by particle name, 'EP' if no element matches
+    """
+    from parmed.periodic_table import AtomicNum, element_by_name
+
+    elements = dict()
+    for name in np.unique(names):
+        if name.capitalize() in AtomicNum:
+            elements[name] = name.capitalize()
+        else:
+            elements[name] = element_by_name(name.capitalize())
+    return elements
+
+
+def write_lammpsdata(filename, xyz, names, residue_ids, box, charges=None,
+                     bonds=None, title='Droplet', chunk_size=CHUNK_SIZE):
+    """
+    Writes a LAMMPS data file for `atom_style full` in real units,
+    formatting `chunk_size` atoms or bonds at a time.
+
+    Atom types are numbered by sorted particle name and bond types by the
+    sorted pair of bonded particle names. The mass of each atom type is that
+    of its element, see `element_symbols`, and 0 for particles matching no
+    element.
+
+    Parameters
+    ----------
+    filename : str or file-like
+        file name, or an open text stream such as `io.StringIO` to write to
+    xyz : np.ndarray, shape=(n, 3)
+        positions in nm
+    names : np.ndarray of str, shape=(n,)
+    residue_ids : np.ndarray of int, shape=(n,)
+        molecule id of each atom
+    box : array-like, shape=(3,)
+        box lengths in nm
+    charges : np.ndarray, shape=(n,), default = None
+    bonds : np.ndarray of int, shape=(m, 2), default = None
+        atom indices of each bond
+    title : str, default = 'Droplet'
+    chunk_size : int, default = CHUNK_SIZE
+    """
+    n = len(xyz)
+    if charges is None:
+        charges = np.zeros(n)
+    if bonds is None:
+        bonds = np.zeros((0, 2), dtype=np.int64)
+
+    from parmed.periodic_table import Mass
+
+    atom_type_names, atom_types = np.unique(names, return_inverse=True)
+    elements = element_symbols(atom_type_names)
+    bond_names = np.sort(names[bonds], axis=1) if len(bonds) else []
+    bond_type_names = sorted(set(map(tuple, bond_names)))
+    bond_type_index = {pair: i for i, pair in enumerate(bond_type_names)}
+
+    def write(f):
+        f.write('{}\n\n'.format(title))
+        f.write('{:d} atoms\n{:d} bonds\n\n'.format(n, len(bonds)))
+        f.write('{:d} atom types\n'.format(len(atom_type_names)))
+        if len(bonds):
+            f.write('{:d} bond types\n'.format(len(bond_type_names)))
+        f.write('\n')
+        for dim, length in zip('xyz', np.multiply(box, 10)):
+            f.write('0.0 {0:.6f} {1}lo {1}hi\n'.format(length, dim))
+
+        f.write('\nMasses\n\n')
+        for i, name in enumerate(atom_type_names):
+            f.write('{:d} {:.4f} # {}\n'.format(
+                i + 1, Mass.get(elements[name], 0.0), name))
+
+        f.write('\nAtoms # full\n\n')
+        for start, stop in _chunks(n, chunk_size):
+            f.write(''.join(
+                '{:d} {:d} {:d} {:.6f} {:.4f} {:.4f} {:.4f}\n'.format(
+                    i + 1, resid, atom_type + 1, q, *pos)
+                for i, resid, atom_type, q, pos in zip(
+                    range(start, stop), residue_ids[start:stop],
+                    atom_types[start:stop], charges[start:stop],
+                    xyz[start:stop] * 10)))
+
+        if len(bonds):
+            f.write('\nBonds\n\n')
+            for start, stop in _chunks(len(bonds), chunk_size):
+                f.write(''.join(
+                    '{:d} {:d} {:d} {:d}\n'.format(
+                        i + 1, bond_type_index[tuple(pair)] + 1, a + 1, b + 1)
+                    for i, pair, (a, b) in zip(
+                        range(start, stop), bond_names[start:stop],
+                        bonds[start:stop])))
+
+    if hasattr(filename, 'write'):
+        write(filename)
+    else:
+        with open(filename, 'w', buffering=BUFFER_SIZE) as f:
+            write(f)
+
+
+def save_arrays(arrays, filename, chunk_size=CHUNK_SIZE):
+    """
+    Saves per-particle arrays to a .gro, .xyz, LAMMPS .lammps/.data or
+    binary .drop file with the streaming writers, chosen by the extension
+    of `filename`.
+
+    Parameters
+    ----------
+    arrays : dict
+        per-particle arrays, see `particle_arrays`
+    filename : str
+    chunk_size : int, default = CHUNK_SIZE
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension == '.gro':
+        write_gro(filename, arrays['xyz'], arrays['names'],
+                  arrays['residue_names'], arrays['residue_ids'],
+                  arrays['box'], chunk_size=chunk_size)
+    elif extension == '.xyz':
+        write_xyz(filename, arrays['xyz'], arrays['names'],
+                  chunk_size=chunk_size)
+    elif extension in ('.lammps', '.data'):
+        write_lammpsdata(filename, arrays['xyz'], arrays['names'],
+                         arrays['residue_ids'], arrays['box'],
+                         charges=arrays['charges'], bonds=arrays['bonds'],
+                         chunk_size=chunk_size)
+    elif extension == '.drop':
+        from dropletbuilder.utils.binary import write_binary
+        write_binary(filename, arrays, chunk_size=chunk_size)
+    else:
+        raise ValueError(
+            'Unsupported file extension {}, use .gro, .xyz, .lammps, .data '
+            'or .drop'.format(extension))
+
+
+def save_droplet(compound, filename, chunk_size=CHUNK_SIZE):
+    """
+    Saves a droplet to a .gro, .xyz, LAMMPS .lammps/.data or binary .drop
+    file with the streaming writers, chosen by the extension of `filename`.
+
+    Parameters
+    ----------
+    compound : mbuild.Compound
+        droplet, or any compound whose children are groups of residues
+    filename : str
+    chunk_size : int, default = CHUNK_SIZE
+    """
+    save_arrays(particle_arrays(compound), filename, chunk_size=chunk_size)
@@ -1,4 +1,5 @@
 from dropletbuilder.dropletbuilder import Droplet
+from dropletbuilder.parametrize import apply_forcefield
 import mbuild
 from mbuild.examples.alkane.alkane import Alkane 
 from dropletbuilder.utils.io_tools import get_fn
@@ -27,16 +28,9 @@ system = Droplet(radius=3, angle=90, fluid=hexane, density=655,
 AU = Forcefield(get_fn('heinz2008.xml'))
 OPLSAA = Forcefield(name='oplsaa')
 
-for child in system.children:
-    if child.name == 'LAT':
-        lattice_pmd = AU.apply(child.to_parmed(residues='Au'))
-    elif child.name == 'FLD':
-        hex_pmd = OPLSAA.apply(child.to_parmed(residues='HEX'))
-    else:
-        continue
-
 periodicity = system.periodicity
-system = lattice_pmd + hex_pmd
+# type one molecule of each kind and stamp its parameters onto every copy
+system = apply_forcefield(system, {'LAT': AU, 'FLD': OPLSAA})
 system.box[2] = periodicity[2] * 100
 system.save('hexane_gold_drop.gro', overwrite=True, combine='all')
 system.save('hexane_gold_drop.top', overwrite=True, combine='all')
@@ -1,4 +1,5 @@
 from dropletbuilder.dropletbuilder import Droplet
+from dropletbuilder.parametrize import apply_forcefield
 import mbuild
 from dropletbuilder.utils.io_tools import get_fn
 from foyer import Forcefield
@@ -14,16 +15,9 @@ system = Droplet(radius=2, angle=110.0, fluid=water, density=997)
 GPH = Forcefield(get_fn('graphene.xml'))
 TIP3P = Forcefield(get_fn('tip3p.xml'))
 
-for child in system.children:
-    if child.name == 'LAT':
-        lattice_pmd = GPH.apply(child.to_parmed(residues='C'))
-    elif child.name == 'FLD':
-        water_pmd = TIP3P.apply(child.to_parmed(residues='H2O'))
-    else:
-        continue
-
 periodicity = system.periodicity
-system = lattice_pmd + water_pmd 
+# type one molecule of each kind and stamp its parameters onto every copy
+system = apply_forcefield(system, {'LAT': GPH, 'FLD': TIP3P})
 system.box[2] = periodicity[2] * 100
 system.save('water_graphene_drop.gro', overwrite=True, combine='all')
 system.save('water_graphene_drop.top', overwrite=True, combine='all')
\ No newline at end of file
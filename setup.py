@@ -2,7 +2,7 @@
 dropletbuilder
 Droplet on graphene builder
 """
-from setuptools import setup
+from setuptools import find_packages, setup
 
 short_description = __doc__.split("\n")
 
@@ -24,18 +24,19 @@ setup(
     license='MIT',
 
     # Which Python importable modules should be included when your package is installed
-    packages=['dropletbuilder', "dropletbuilder.tests"],
+    packages=find_packages(),
 
     # Optional include package data to ship with your package
     # Comment out this line to prevent the files from being packaged with your software
     # Extend/modify the list to include/exclude other items as need be
-    package_data={'dropletbuilder': ["data/*.dat"]
+    package_data={'dropletbuilder': ["data/*.dat"],
+                  'dropletbuilder.utils': ["*.xml", "*.mol2"],
                   },
 
     # Additional entries you may want simply uncomment the lines you want and fill in the data
     # author_email='me@place.org',      # Author email
     # url='http://www.my_package.com',  # Website
-    # install_requires=[],              # Required packages, pulls from pip if needed; do not use for Conda deployment
+    install_requires=['numpy', 'scipy', 'mbuild>0.8.3'],
     # platforms=['Linux',
     #            'Mac OS-X',
     #            'Unix',
@@ -45,10 +46,13 @@ setup(
     # Manual control if final package is compressible or not, set False to prevent the .egg from being made
     # zip_safe=False,
 
-    # entry_points={
+    entry_points={
+        'console_scripts': [
+            "dropletbuilder = dropletbuilder.cli:main",
+        ],
     #     'mbuild.plugins':[
     #         "GrapheneDroplet = dropletbuilder.dropletbuilder:GrapheneDroplet",
     #     ],
-    # }
+    }
 
 )